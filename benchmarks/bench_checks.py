@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline end-to-end benchmark of UnlockChecker against local stand-in upstreams
+
+Every request a check makes is redirected to the stand-in server of its host
+(see upstreams.py), so the full flows run - IP lookup, all service checks,
+body parsing - without touching the network. Each execution path runs in a
+fresh child process, so its wall time and memory are not mixed with the
+servers' or with the other paths':
+
+    serial    run_services() with one worker
+    threaded  run_services() with the worker pool (--workers)
+    async     aget_ip_info() + acheck()
+    fleet     --fleet-size async checkers at once, as --proxies does per proxy
+
+Usage:
+    python benchmarks/bench_checks.py
+    python benchmarks/bench_checks.py --latency 150 --jitter 50 --failure-rate 0.05 --runs 5
+    python benchmarks/bench_checks.py --modes async,fleet --fleet-size 50 --json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from upstreams import FAILURE_MODES, LatencyProfile, Upstreams  # noqa: E402
+
+MODES = ('serial', 'threaded', 'async', 'fleet')
+
+
+def make_checker_class(addresses: Dict[str, str]):
+    """UnlockChecker subclass sending each probe to the stand-in of its host"""
+    import unlockcheck
+
+    def redirect(probe):
+        parts = urlsplit(probe.url)
+        address = addresses.get(parts.hostname) or addresses['*']
+        url = f"http://{address}{parts.path or '/'}" + (f"?{parts.query}" if parts.query else '')
+        return unlockcheck.Probe(probe.method, url, probe.classify, probe.until, probe.max_bytes, **probe.kwargs)
+
+    class BenchChecker(unlockcheck.UnlockChecker):
+        def _send(self, probe, cancelled=None):
+            return super()._send(redirect(probe), cancelled)
+
+        async def _asend(self, probe):
+            return await super()._asend(redirect(probe))
+
+        async def adns_unlock(self, services=None):
+            # Raw UDP to real resolvers; keep the benchmark offline
+            return dict.fromkeys(unlockcheck.SERVICE_KEYS if services is None else services)
+
+    return BenchChecker
+
+
+def run_mode(mode: str, addresses: Dict[str, str], workers: int, fleet_size: int,
+             services: Optional[List[str]]) -> Dict:
+    """Child side: run one execution path once and measure it"""
+    tracemalloc.start()
+    checker_class = make_checker_class(addresses)
+    results = []
+
+    async def one_async():
+        checker = checker_class()
+        try:
+            await checker.aget_ip_info()
+            return await checker.acheck_all(services)
+        finally:
+            await checker.aclose()
+
+    async def fleet():
+        batches = await asyncio.gather(*(one_async() for _ in range(fleet_size)))
+        return [result for batch in batches for result in batch]
+
+    started = time.perf_counter()
+    # The blocking API reports progress on stdout; keep it out of the measurement output
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode in ('serial', 'threaded'):
+            checker = checker_class(max_workers=1 if mode == 'serial' else workers)
+            try:
+                checker.get_ip_info()
+                results = checker.run_services(services)
+            finally:
+                checker.close()
+        elif mode == 'async':
+            results = asyncio.run(one_async())
+        else:
+            results = asyncio.run(fleet())
+    wall = time.perf_counter() - started
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    statuses = {}
+    for result in results:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+    return {
+        'wall': wall,
+        'peak_traced_mb': peak / 2 ** 20,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'statuses': statuses,
+    }
+
+
+def spawn(mode: str, upstreams: Upstreams, args) -> Dict:
+    """Parent side: run one measurement in a child process and add the request count"""
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', mode,
+        '--addresses', json.dumps(upstreams.addresses),
+        '--workers', str(args.workers), '--fleet-size', str(args.fleet_size),
+    ]
+    if args.services:
+        command += ['--services', args.services]
+    upstreams.counter.reset()
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{completed.stderr}")
+    measurement = json.loads(completed.stdout.strip().splitlines()[-1])
+    counts = upstreams.counter.reset()
+    measurement['requests'] = sum(counts.values())
+    measurement['per_host'] = counts
+    return measurement
+
+
+def summarize(mode: str, runs: List[Dict]) -> Dict:
+    walls = [run['wall'] for run in runs]
+    statuses = {}
+    for run in runs:
+        for status, count in run['statuses'].items():
+            statuses[status] = statuses.get(status, 0) + count
+    return {
+        'mode': mode,
+        'runs': len(runs),
+        'wall_median': statistics.median(walls),
+        'wall_min': min(walls),
+        'wall_max': max(walls),
+        'requests_mean': statistics.mean(run['requests'] for run in runs),
+        'peak_traced_mb': max(run['peak_traced_mb'] for run in runs),
+        'max_rss_mb': max(run['max_rss_mb'] for run in runs),
+        'statuses': statuses,
+        'unknown_host_requests': sum(run['per_host'].get('*', 0) for run in runs),
+    }
+
+
+def print_table(summaries: List[Dict], args):
+    print(f"latency {args.latency:.0f}±{args.jitter:.0f} ms, failure rate {args.failure_rate:.0%} "
+          f"({','.join(args.failure_modes)}), {args.runs} run(s) per mode")
+    print(f"{'mode':<10}{'wall med':>10}{'min':>9}{'max':>9}{'requests':>10}{'peak MB':>9}{'RSS MB':>9}  outcomes")
+    for summary in summaries:
+        outcomes = ' '.join(f"{status}={count}" for status, count in sorted(summary['statuses'].items()))
+        print(f"{summary['mode']:<10}{summary['wall_median']:>9.2f}s{summary['wall_min']:>8.2f}s"
+              f"{summary['wall_max']:>8.2f}s{summary['requests_mean']:>10.1f}{summary['peak_traced_mb']:>9.1f}"
+              f"{summary['max_rss_mb']:>9.1f}  {outcomes}")
+    if any(summary['unknown_host_requests'] for summary in summaries):
+        print("warning: some requests went to hosts without a stand-in (see upstreams.build_catalogue)")
+    print("peak MB = peak Python heap (tracemalloc), RSS MB = peak resident set of the child process")
+
+
+def parse_host_latency(values: List[str]) -> Dict[str, float]:
+    overrides = {}
+    for value in values:
+        host, _, ms = value.rpartition('=')
+        if not host:
+            raise argparse.ArgumentTypeError(f"expected HOST=MS, got {value!r}")
+        overrides[host] = float(ms) / 1000
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline UnlockChecker benchmark with local mock upstreams')
+    parser.add_argument('--modes', default=','.join(MODES),
+                        help=f'Comma-separated execution paths to measure (default: {",".join(MODES)})')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per mode (default: 3)')
+    parser.add_argument('--latency', type=float, default=80, help='Mean upstream latency in ms (default: 80)')
+    parser.add_argument('--jitter', type=float, default=20, help='Latency standard deviation in ms (default: 20)')
+    parser.add_argument('--host-latency', action='append', default=[], metavar='HOST=MS',
+                        help='Mean latency for hosts containing HOST (repeatable), e.g. netflix=300')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='Fraction of requests that fail (default: 0)')
+    parser.add_argument('--failure-modes', default=','.join(FAILURE_MODES),
+                        help=f'How requests fail: {", ".join(FAILURE_MODES)} (default: all)')
+    parser.add_argument('--stall', type=float, default=2.0, help='Extra seconds of a stalled response (default: 2)')
+    parser.add_argument('--page-scale', type=float, default=1.0, help='Multiplier on HTML page sizes (default: 1)')
+    parser.add_argument('--workers', type=int, default=12, help='Worker pool size of the threaded mode (default: 12)')
+    parser.add_argument('--fleet-size', type=int, default=20, help='Checkers run at once in fleet mode (default: 20)')
+    parser.add_argument('--services', help='Comma-separated service keys (default: all)')
+    parser.add_argument('--seed', type=int, help='Seed for latency and failure draws')
+    parser.add_argument('--json', action='store_true', help='Print the summaries as JSON')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--addresses', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    services = args.services.split(',') if args.services else None
+    if args.child:
+        measurement = run_mode(args.child, json.loads(args.addresses), args.workers, args.fleet_size, services)
+        print(json.dumps(measurement))
+        return
+
+    modes = args.modes.split(',')
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+    args.failure_modes = args.failure_modes.split(',')
+    if set(args.failure_modes) - set(FAILURE_MODES):
+        parser.error(f"failure modes must be among {', '.join(FAILURE_MODES)}")
+    try:
+        host_latency = parse_host_latency(args.host_latency)
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    profile = LatencyProfile(args.latency / 1000, args.jitter / 1000, args.failure_rate, args.failure_modes,
+                             args.stall, host_latency, args.seed)
+    summaries = []
+    with Upstreams(profile, args.page_scale) as upstreams:
+        for mode in modes:
+            runs = [spawn(mode, upstreams, args) for _ in range(args.runs)]
+            summaries.append(summarize(mode, runs))
+
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print_table(summaries, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cold-start budget of the unlockcheck CLI
+
+Imports unlockcheck in fresh interpreters under `python -X importtime` and
+fails (exit status 1) when startup regresses:
+
+    import    cumulative import time of unlockcheck, dependencies included
+    self      time spent in unlockcheck's own module body
+    lazy      modules that must not be loaded by the import itself
+              (colorama only loads for a colored table, http.server for --daemon)
+
+The wall time of `python -m unlockcheck --help` is reported alongside; `-m`
+reuses the cached bytecode, whereas running the file as a script compiles it
+on every start.
+
+Usage:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 15 --import-budget 200 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+LAZY_MODULES = ('colorama', 'http.server')
+
+
+def measure_import() -> Dict:
+    """One fresh interpreter: import times of unlockcheck (µs) and the modules it loaded"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import unlockcheck'],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import failed:\n{completed.stderr}")
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        own, cumulative, name = (field.strip() for field in line[len('import time:'):].split('|'))
+        if own.isdigit():
+            modules[name] = (int(own), int(cumulative))
+    own, cumulative = modules['unlockcheck']
+    return {'self_ms': own / 1000, 'import_ms': cumulative / 1000, 'modules': set(modules)}
+
+
+def measure_cli() -> float:
+    """Wall time of `python -m unlockcheck --help` in seconds"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'unlockcheck', '--help'], cwd=ROOT,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the cold-start budget of unlockcheck')
+    parser.add_argument('--runs', type=int, default=7, help='Fresh interpreters per measurement (default: 7)')
+    parser.add_argument('--import-budget', type=float, default=250,
+                        help='Median cumulative import time allowed, in ms (default: 250)')
+    parser.add_argument('--self-budget', type=float, default=15,
+                        help="Median time allowed in unlockcheck's own module body, in ms (default: 15)")
+    parser.add_argument('--json', action='store_true', help='Print the measurements as JSON')
+    args = parser.parse_args()
+
+    # The first run compiles and caches the bytecode; it is not what a user's second start costs
+    measure_import()
+    imports = [measure_import() for _ in range(args.runs)]
+    cli = [measure_cli() for _ in range(args.runs)]
+
+    summary = {
+        'import_ms': statistics.median(run['import_ms'] for run in imports),
+        'self_ms': statistics.median(run['self_ms'] for run in imports),
+        'cli_help_ms': statistics.median(cli) * 1000,
+        'eager_lazy_modules': sorted(set(LAZY_MODULES) & set().union(*(run['modules'] for run in imports))),
+    }
+    failures: List[str] = []
+    if summary['import_ms'] > args.import_budget:
+        failures.append(f"import {summary['import_ms']:.1f} ms > budget {args.import_budget:.0f} ms")
+    if summary['self_ms'] > args.self_budget:
+        failures.append(f"module body {summary['self_ms']:.1f} ms > budget {args.self_budget:.0f} ms")
+    if summary['eager_lazy_modules']:
+        failures.append(f"loaded at import: {', '.join(summary['eager_lazy_modules'])}")
+    summary['failures'] = failures
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"import {summary['import_ms']:.1f} ms (budget {args.import_budget:.0f}), "
+              f"module body {summary['self_ms']:.1f} ms (budget {args.self_budget:.0f}), "
+              f"`-m unlockcheck --help` {summary['cli_help_ms']:.0f} ms, median of {args.runs}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
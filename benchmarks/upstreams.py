@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-ins for every upstream UnlockChecker talks to
+
+Each upstream host gets its own HTTP server on a separate loopback address
+(127.0.0.2, 127.0.0.3, ...), so per-host pacing and connection reuse behave
+as they do against the real services. Responses mimic what an unblocked
+Japanese exit IP gets back: same status codes, the markers the checks look
+for, realistic page sizes, gzip on the wire when the client accepts it.
+"""
+
+import gzip
+import json
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+EXIT_IP = "203.0.113.7"
+COUNTRY = "JP"
+ASN = 2914
+
+# Simulated failures, see LatencyProfile
+FAILURE_MODES = ('status', 'reset', 'stall')
+
+Reply = Tuple[int, str, bytes]  # status, content type, body
+
+
+def html_page(title: str, size: int, marker: str = '', marker_at: float = 0.5, seed: int = 0) -> bytes:
+    """
+    An HTML page of about `size` bytes: markup-like filler with `marker` placed
+    at `marker_at` of the page (filler compresses like real markup, not like zeros)
+    """
+    rng = random.Random(f"{title}:{seed}")
+    words = ['div', 'class', 'span', 'data-uia', 'href', 'script', 'button', 'nav', 'item',
+             'container', 'row', 'col', 'title', 'card', 'player', 'menu', 'link', 'icon']
+    chunks = []
+    length = 0
+    while length < size:
+        chunk = (f'<{rng.choice(words)} class="{rng.choice(words)}-{rng.randrange(10000)}" '
+                 f'id="{rng.getrandbits(48):012x}">{rng.choice(words)} {rng.choice(words)}</{rng.choice(words)}>\n')
+        chunks.append(chunk)
+        length += len(chunk)
+    filler = ''.join(chunks)
+    cut = int(len(filler) * marker_at)
+    page = (f"<!DOCTYPE html><html><head><title>{title}</title></head><body>\n"
+            f"{filler[:cut]}{marker}{filler[cut:]}</body></html>")
+    return page.encode('utf-8')
+
+
+def json_reply(data, status: int = 200) -> Reply:
+    return status, 'application/json', json.dumps(data).encode('utf-8')
+
+
+def build_catalogue(scale: float = 1.0) -> Dict[str, Callable[[str, str], Reply]]:
+    """
+    host -> handler(method, path) returning (status, content type, body)
+    scale: multiplier on the size of the HTML pages
+    """
+    def page(title, size, marker='', marker_at=0.5):
+        body = html_page(title, int(size * scale), marker, marker_at)
+        return lambda method, path: (200, 'text/html; charset=utf-8', body)
+
+    ip_api = {
+        'status': 'success', 'country': 'Japan', 'countryCode': COUNTRY, 'region': '13',
+        'regionName': 'Tokyo', 'city': 'Tokyo', 'isp': 'NTT America, Inc.', 'org': 'NTT Communications',
+        'as': f'AS{ASN} NTT America, Inc.', 'hosting': True, 'proxy': False, 'mobile': False,
+        'query': EXIT_IP,
+    }
+
+    def disney_api(method, path):
+        if path.startswith('/devices'):
+            return json_reply({'assertion': 'eyJhbGciOiJFUzI1NiJ9.bench.assertion', 'grant_type': 'device'})
+        if path.startswith('/token'):
+            return json_reply({'access_token': 'eyJhbGciOiJFUzI1NiJ9.bench.token', 'token_type': 'bearer',
+                               'expires_in': 14400})
+        if path.startswith('/graph/'):
+            return json_reply({'data': {'getCurrentLocation': {'countryCode': COUNTRY},
+                                        'inSupportedLocation': True}})
+        return json_reply({'errors': [{'code': 'not.found'}]}, 404)
+
+    return {
+        # IP information providers
+        'api64.ipify.org': lambda method, path: (200, 'text/plain', EXIT_IP.encode('ascii')),
+        'ipapi.co': lambda method, path: json_reply({
+            'ip': EXIT_IP, 'country_name': 'Japan', 'country_code': COUNTRY, 'region': 'Tokyo',
+            'city': 'Tokyo', 'org': 'NTT America, Inc.', 'asn': f'AS{ASN}', 'timezone': 'Asia/Tokyo',
+        }),
+        'ipinfo.io': lambda method, path: json_reply({
+            'ip': EXIT_IP, 'country': COUNTRY, 'region': 'Tokyo', 'city': 'Tokyo',
+            'org': f'AS{ASN} NTT America, Inc.', 'timezone': 'Asia/Tokyo',
+        }),
+        'ip-api.com': lambda method, path: json_reply(ip_api),
+        'api.hackertarget.com': lambda method, path: (
+            200, 'text/plain', f'"{ASN}","NTT-LTD-{ASN}, US"'.encode('ascii')
+        ),
+        'api.bgpview.io': lambda method, path: json_reply({
+            'status': 'ok', 'data': {'asn': ASN, 'name': 'NTT-LTD-2914', 'country_code': 'US'},
+        }),
+
+        # Streaming services
+        'www.netflix.com': page('Netflix', 600_000, f'"currentCountry":"{COUNTRY}"', 0.35),
+        'disney.api.edge.bamgrid.com': disney_api,
+        'www.disneyplus.com': page('Disney+ | Disneyplus', 250_000),
+        'www.youtube.com': page('YouTube Premium - subscribe', 700_000),
+        'www.tiktok.com': page('TikTok - Make Your Day', 300_000, f'"region":"{COUNTRY}"', 0.2),
+        'spclient.wg.spotify.com': lambda method, path: json_reply({
+            'status': 311, 'country': COUNTRY, 'is_country_launched': True,
+        }),
+        'www.spotify.com': page('Spotify - Web Player', 150_000),
+
+        # AI services
+        'api.openai.com': lambda method, path: json_reply({
+            'error': {'message': 'You didn\'t provide an API key.', 'type': 'invalid_request_error'},
+        }, 401),
+        'chatgpt.com': page('ChatGPT', 200_000),
+        'claude.ai': page('Claude - sign in', 150_000),
+        'api.anthropic.com': lambda method, path: json_reply({
+            'type': 'error', 'error': {'type': 'authentication_error', 'message': 'x-api-key header is required'},
+        }, 401),
+        'generativelanguage.googleapis.com': lambda method, path: json_reply({
+            'error': {'code': 403, 'status': 'PERMISSION_DENIED',
+                      'message': 'Method doesn\'t allow unregistered callers.'},
+        }, 403),
+        'gemini.google.com': page('Gemini - chat with gemini - sign in', 400_000),
+        'www.gstatic.com': lambda method, path: (200, 'image/svg+xml', b'<svg xmlns="http://www.w3.org/2000/svg"/>'),
+        'aistudio.google.com': page('Google AI Studio - sign in', 300_000),
+
+        # Others
+        'scholar.google.com': page('Google Scholar', 60_000),
+        'imgur.com': page('Imgur: The magic of the Internet', 200_000),
+        'i.imgur.com': page('imgur', 2_000),
+        'www.reddit.com': page('Reddit - Dive into anything', 500_000),
+    }
+
+
+class LatencyProfile:
+    """
+    How the stand-ins misbehave: base latency with gaussian jitter, per-host
+    overrides, and a failure rate split over FAILURE_MODES
+    (status = 503 page, reset = TCP reset before any byte, stall = `stall` extra seconds)
+    """
+
+    def __init__(self, latency: float = 0.08, jitter: float = 0.02, failure_rate: float = 0.0,
+                 failure_modes: Tuple[str, ...] = FAILURE_MODES, stall: float = 2.0,
+                 host_latency: Optional[Dict[str, float]] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_modes = tuple(failure_modes)
+        self.stall = stall
+        self.host_latency = dict(host_latency or {})
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, host: str) -> float:
+        base = next((value for pattern, value in self.host_latency.items() if pattern in host), self.latency)
+        with self._lock:
+            return max(0.0, self._random.gauss(base, self.jitter)) if self.jitter else base
+
+    def failure(self) -> Optional[str]:
+        if not self.failure_rate or not self.failure_modes:
+            return None
+        with self._lock:
+            if self._random.random() >= self.failure_rate:
+                return None
+            return self._random.choice(self.failure_modes)
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _serve(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        server = self.server
+        server.record()
+
+        profile = server.profile
+        failure = profile.failure()
+        time.sleep(profile.delay(server.host))
+        if failure == 'reset':
+            # SO_LINGER 0: close() sends RST instead of FIN
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.close_connection = True
+            return
+        if failure == 'stall':
+            time.sleep(profile.stall)
+
+        if failure == 'status':
+            status, content_type, body = 503, 'text/html', b'<html><body>Service Unavailable</body></html>'
+        elif server.handler is None:
+            status, content_type, body = 404, 'text/plain', b'no stand-in for this host'
+        else:
+            status, content_type, body = server.handler(self.command, self.path)
+
+        encoded = body
+        if len(body) > 1024 and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            encoded = server.compressed(self.path, body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(encoded)))
+        if encoded is not body:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(encoded)
+
+    do_GET = do_POST = do_HEAD = _serve
+
+
+class UpstreamServer(ThreadingHTTPServer):
+    """Stand-in for one upstream host"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host: str, address: str, handler, profile: LatencyProfile, counter: 'RequestCounter'):
+        super().__init__((address, 0), UpstreamHandler)
+        self.host = host
+        self.handler = handler
+        self.profile = profile
+        self.counter = counter
+        self._gzip_cache = {}
+
+    def record(self):
+        self.counter.add(self.host)
+
+    def handle_error(self, request, client_address):
+        # Clients hang up mid-body on purpose (early-exit reads); anything else is a bug here
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+    def compressed(self, path: str, body: bytes) -> bytes:
+        # Pages are static, compress each one once
+        key = (path, len(body))
+        if key not in self._gzip_cache:
+            self._gzip_cache[key] = gzip.compress(body, 6)
+        return self._gzip_cache[key]
+
+
+class RequestCounter:
+    """Thread-safe request tally per upstream host"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, host: str):
+        with self._lock:
+            self.counts[host] = self.counts.get(host, 0) + 1
+
+    def reset(self) -> Dict[str, int]:
+        """Return the counts so far and start over"""
+        with self._lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+
+class Upstreams:
+    """
+    All stand-in servers, started on consecutive loopback addresses
+    Unknown hosts are sent to a catch-all server answering 404 (counted as '*')
+    Usage:
+        with Upstreams(LatencyProfile(latency=0.1)) as upstreams:
+            upstreams.addresses  # {'www.netflix.com': '127.0.0.2:41234', ...}
+    """
+
+    def __init__(self, profile: Optional[LatencyProfile] = None, scale: float = 1.0):
+        self.profile = profile or LatencyProfile()
+        self.counter = RequestCounter()
+        self.servers: List[UpstreamServer] = []
+        catalogue = build_catalogue(scale)
+        for index, (host, handler) in enumerate([*catalogue.items(), ('*', None)]):
+            self.servers.append(UpstreamServer(host, f"127.0.0.{index + 2}", handler, self.profile, self.counter))
+
+    @property
+    def addresses(self) -> Dict[str, str]:
+        return {server.host: '%s:%d' % server.server_address for server in self.servers}
+
+    def start(self):
+        for server in self.servers:
+            threading.Thread(target=server.serve_forever, name=f"upstream-{server.host}", daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
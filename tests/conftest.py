@@ -0,0 +1,6 @@
+"""unlockcheck is a single module at the repository root"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,87 @@
+"""acheck(): one result per service, DNS unlock classification and the run deadline"""
+
+import asyncio
+import time
+
+import pytest
+
+import unlockcheck
+from unlockcheck import CheckResult, UnlockChecker, UnlockTypeUpdate
+
+# Seconds each stand-in check takes
+DURATIONS = {'netflix': 0.05, 'claude': 0.3, 'spotify': 0.6}
+
+
+@pytest.fixture
+def checker(monkeypatch):
+    """Checks and DNS unlock detection replaced by timed stand-ins; dns_delay sets the latter's duration"""
+    async def acheck_one(self, key, name, method, sink):
+        await asyncio.sleep(DURATIONS[key])
+        return CheckResult(key, name, "success", "JP", "", DURATIONS[key])
+
+    async def adns_unlock(self, services=None):
+        await asyncio.sleep(self.dns_delay)
+        return {'netflix': 'dns', 'claude': 'native', 'spotify': None}
+
+    monkeypatch.setattr(UnlockChecker, '_acheck_one', acheck_one)
+    monkeypatch.setattr(UnlockChecker, 'adns_unlock', adns_unlock)
+    checker = UnlockChecker()
+    checker.dns_delay = 0.2
+    yield checker
+    checker.close()
+
+
+def collect(checker, **kwargs):
+    """(seconds since start, item) for everything acheck() yields"""
+    async def run():
+        started = time.monotonic()
+        return [(time.monotonic() - started, item)
+                async for item in checker.acheck(list(DURATIONS), **kwargs)]
+    return asyncio.run(run())
+
+
+def test_each_service_is_yielded_once_with_its_unlock_type(checker):
+    items = collect(checker)
+    assert [item.service for _, item in items] == ['netflix', 'claude', 'spotify']
+    assert all(isinstance(item, CheckResult) for _, item in items)
+    assert [item.unlock_type for _, item in items] == ['dns', 'native', None]
+    # netflix finished first but waited for the DNS classification
+    assert items[0][0] >= checker.dns_delay
+
+
+def test_services_dns_cannot_classify_are_not_held_back(checker, monkeypatch):
+    monkeypatch.delitem(unlockcheck.SERVICE_HOSTS, 'netflix')
+    elapsed, first = collect(checker)[0]
+    assert first.service == 'netflix' and first.unlock_type is None
+    assert elapsed < checker.dns_delay
+
+
+def test_unlock_updates_stream_results_then_classify_them(checker):
+    items = [item for _, item in collect(checker, unlock_updates=True)]
+    assert items == [
+        CheckResult('netflix', 'Netflix', "success", "JP", "", DURATIONS['netflix']),
+        UnlockTypeUpdate('netflix', 'dns'),
+        CheckResult('claude', 'Claude', "success", "JP", "", DURATIONS['claude'], unlock_type='native'),
+        CheckResult('spotify', 'Spotify', "success", "JP", "", DURATIONS['spotify']),
+    ]
+
+
+def test_deadline_times_out_pending_checks_and_releases_held_results(checker):
+    checker.dns_delay = 1.0
+    started = time.monotonic()
+    items = {item.service: item for _, item in collect(checker, deadline=0.4)}
+    assert time.monotonic() - started < 0.6
+    assert sorted(items) == ['claude', 'netflix', 'spotify']
+    # DNS detection did not finish in time: results go out unclassified
+    assert (items['netflix'].status, items['netflix'].unlock_type) == ("success", None)
+    assert (items['spotify'].status, items['spotify'].detail) == ("error", "Timeout")
+
+
+def test_acheck_all_returns_services_in_services_order(checker):
+    results = asyncio.run(checker.acheck_all(['spotify', 'netflix', 'claude']))
+    assert [result.service for result in results] == ['netflix', 'claude', 'spotify']
+
+
+def test_unknown_services_are_rejected(checker):
+    with pytest.raises(ValueError, match='hbo'):
+        asyncio.run(checker.acheck_all(['netflix', 'hbo']))
@@ -0,0 +1,39 @@
+"""AsyncHTTPClient against a local server that answers with a canned response"""
+
+import asyncio
+
+import pytest
+import requests
+
+from unlockcheck import AsyncHTTPClient
+
+
+async def fetch(response: bytes):
+    async def handle(reader, writer):
+        await reader.readuntil(b'\r\n\r\n')
+        writer.write(response)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    client = AsyncHTTPClient()
+    try:
+        return await client.request('GET', f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/")
+    finally:
+        client.close()
+        server.close()
+        await server.wait_closed()
+
+
+def test_reads_status_headers_and_body():
+    response = asyncio.run(fetch(b'HTTP/1.1 100 Continue\r\n\r\n'
+                                 b'HTTP/1.1 403 Forbidden\r\nContent-Length: 7\r\nX-Test: a\r\n\r\nblocked'))
+    assert response.status_code == 403
+    assert response.headers['x-test'] == 'a'
+    assert response.text == 'blocked'
+
+
+@pytest.mark.parametrize('status_line', [b'HTTP/1.1\r\n', b'SSH-2.0-OpenSSH_9.6\r\n', b'HTTP/1.1 2OO OK\r\n'])
+def test_bad_status_line_is_a_connection_error(status_line):
+    with pytest.raises(requests.exceptions.ConnectionError, match='bad status line'):
+        asyncio.run(fetch(status_line + b'\r\n'))
@@ -0,0 +1,149 @@
+"""--daemon: what a poll re-checks, and the metrics it serves"""
+
+import json
+import re
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import unlockcheck
+from unlockcheck import SERVICE_KEYS, CheckResult, MonitorDaemon, UnlockChecker
+
+SAMPLE = re.compile(r'^([a-z_]+)(?:\{((?:[a-z_]+="(?:[^"\\]|\\.)*",?)*)\})? (-?[0-9.]+)$')
+LABEL = re.compile(r'([a-z_]+)="((?:[^"\\]|\\.)*)"')
+
+
+def samples(text: str, metric: str):
+    """(labels, value) of every sample of the metric; fails on lines that are not valid exposition format"""
+    found = []
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        if match.group(1) == metric:
+            found.append((dict(LABEL.findall(match.group(2) or '')), float(match.group(3))))
+    return found
+
+
+class StubChecker(UnlockChecker):
+    """Exit IP, system resolvers and check results set by the test; run_services() calls are recorded"""
+
+    def __init__(self):
+        super().__init__()
+        self.exit_ip = '203.0.113.9'
+        self.resolvers = ['192.0.2.53']
+        self.outcomes = {key: ("success", "JP", "") for key in SERVICE_KEYS}
+        self.runs = []
+
+    def get_exit_ip(self):
+        return self.exit_ip
+
+    def get_ip_info(self):
+        self.ip_info = {'ip': self.exit_ip, 'country_code': 'JP', 'registration_country_code': 'US'}
+        return self.ip_info
+
+    def run_services(self, services=None, deadline=None):
+        self.runs.append(list(services))
+        return [CheckResult(key, name, *self.outcomes[key], 0.25)
+                for key, name, _ in unlockcheck.SERVICES if key in services]
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    checker = StubChecker()
+    monkeypatch.setattr(unlockcheck.DNSStub, 'system_nameservers', staticmethod(lambda: list(checker.resolvers)))
+    yield MonitorDaemon(checker, listen='127.0.0.1:0')
+    checker.close()
+
+
+def test_a_poll_rechecks_only_what_is_due(daemon):
+    checker = daemon.checker
+    checker.outcomes['claude'] = ("error", "N/A", "Timeout")
+    daemon.poll()
+    assert checker.runs == [SERVICE_KEYS]
+
+    # Nothing expired yet: the sentinel lookup only
+    daemon.poll()
+    assert len(checker.runs) == 1
+
+    daemon.expires['claude'] = 0
+    daemon.poll()
+    assert checker.runs[-1] == ['claude']
+    assert daemon.counters == {'polls': 3, 'runs': 2, 'ip_changes': 0, 'sentinel_failures': 0}
+
+
+def test_a_new_exit_ip_or_resolver_rechecks_everything(daemon):
+    checker = daemon.checker
+    daemon.poll()
+    checker.exit_ip = '198.51.100.7'
+    daemon.poll()
+    assert checker.runs[-1] == SERVICE_KEYS and daemon.ip == '198.51.100.7'
+    assert daemon.counters['ip_changes'] == 1
+
+    checker.resolvers = ['198.51.100.53']
+    daemon.poll()
+    assert len(checker.runs) == 3 and checker.runs[-1] == SERVICE_KEYS
+
+
+def test_a_failed_sentinel_lookup_keeps_the_last_results(daemon):
+    daemon.poll()
+    daemon.checker.exit_ip = None
+    daemon.poll()
+    assert daemon.counters['sentinel_failures'] == 1
+    assert daemon.ip == '203.0.113.9' and len(daemon.results) == len(SERVICE_KEYS)
+
+
+def test_metrics_labels(daemon):
+    checker = daemon.checker
+    checker.outcomes['netflix'] = ("partial", "JP", "Originals Only")
+    checker.outcomes['claude'] = ("failed", "N/A", 'Says "no"\nback\\slash')
+    checker.outcomes['spotify'] = ("error", "N/A", "Timeout")
+    daemon.poll()
+    text = daemon.render_metrics()
+
+    assert samples(text, 'unlockcheck_exit_ip_info') == [
+        ({'ip': '203.0.113.9', 'country': 'JP', 'registered': 'US'}, 1)
+    ]
+    status = {labels['service']: (labels, value) for labels, value in samples(text, 'unlockcheck_service_status')}
+    assert sorted(status) == sorted(SERVICE_KEYS)
+    assert status['netflix'] == ({'service': 'netflix', 'name': 'Netflix'}, 0.5)
+    assert status['claude'][1] == 0 and status['spotify'][1] == -1 and status['tiktok'][1] == 1
+
+    info = {labels['service']: labels for labels, value in samples(text, 'unlockcheck_service_info')}
+    assert info['netflix'] == {'service': 'netflix', 'status': 'partial', 'region': 'JP', 'detail': 'Originals Only'}
+    assert info['claude']['detail'] == 'Says \\"no\\"\\nback\\\\slash'
+
+    assert samples(text, 'unlockcheck_check_duration_seconds')[0][1] == 0.25
+    assert samples(text, 'unlockcheck_polls_total') == [({}, 1)]
+
+
+def test_the_status_series_stays_the_same_when_the_detail_changes(daemon):
+    checker = daemon.checker
+    daemon.poll()
+    before = [labels for labels, _ in samples(daemon.render_metrics(), 'unlockcheck_service_status')]
+    checker.outcomes['netflix'] = ("failed", "N/A", "Region Restricted")
+    daemon.expires['netflix'] = 0
+    daemon.poll()
+    after = [labels for labels, _ in samples(daemon.render_metrics(), 'unlockcheck_service_status')]
+    assert before == after
+
+
+def test_metrics_and_results_are_served_over_http(daemon):
+    daemon.poll()
+    server = daemon._server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert len(samples(response.read().decode(), 'unlockcheck_service_status')) == len(SERVICE_KEYS)
+        with urllib.request.urlopen(f"{base}/", timeout=5) as response:
+            assert json.load(response)['ip'] == '203.0.113.9'
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,100 @@
+"""Per-service deadlines from latency history, and checks that run out of time"""
+
+import time
+
+import pytest
+
+from unlockcheck import (
+    LATENCY_DEADLINE_FACTOR, LATENCY_HISTORY, LATENCY_MIN_SAMPLES, SERVICE_DEADLINE_CEILING,
+    SERVICE_DEADLINE_FLOOR, DiskCache, UnlockChecker
+)
+
+
+@pytest.fixture
+def checker():
+    checker = UnlockChecker()
+    yield checker
+    checker.close()
+
+
+def test_the_ceiling_applies_until_enough_samples_are_known(checker):
+    for _ in range(LATENCY_MIN_SAMPLES - 1):
+        checker.record_latency('netflix', 0.5)
+    assert checker.service_deadline('netflix') == SERVICE_DEADLINE_CEILING
+    checker.record_latency('netflix', 0.5)
+    assert checker.service_deadline('netflix') == SERVICE_DEADLINE_FLOOR
+
+
+def test_deadline_is_p95_times_the_factor_within_floor_and_ceiling(checker):
+    durations = [1.0] * 18 + [3.0, 30.0]
+    for seconds in durations:
+        checker.record_latency('claude', seconds)
+    # p95 of 20 samples is the 19th smallest: the single 30 s outlier is ignored
+    assert checker.service_deadline('claude') == min(SERVICE_DEADLINE_CEILING, 3.0 * LATENCY_DEADLINE_FACTOR)
+
+    for seconds in [SERVICE_DEADLINE_CEILING] * LATENCY_HISTORY:
+        checker.record_latency('tiktok', seconds)
+    assert checker.service_deadline('tiktok') == SERVICE_DEADLINE_CEILING
+
+
+def test_history_keeps_the_last_samples_only(checker):
+    for i in range(LATENCY_HISTORY + 5):
+        checker.record_latency('reddit', i)
+    assert checker.latency_history('reddit') == list(range(5, LATENCY_HISTORY + 5))
+
+
+def test_history_is_kept_on_disk_with_a_cache(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache.sqlite3'))
+    first = UnlockChecker(cache=cache)
+    for _ in range(LATENCY_MIN_SAMPLES):
+        first.record_latency('imgur', 4.0)
+    first.close()
+    second = UnlockChecker(cache=cache)
+    assert second.service_deadline('imgur') == min(SERVICE_DEADLINE_CEILING, 4.0 * LATENCY_DEADLINE_FACTOR)
+    second.close()
+    cache.close()
+
+
+def test_check_end_is_the_sooner_of_the_service_and_run_deadlines():
+    assert UnlockChecker._check_end(100.0, 10.0) == 110.0
+    assert UnlockChecker._check_end(100.0, 10.0, 105.0) == 105.0
+    assert UnlockChecker._check_end(100.0, 10.0, 120.0) == 110.0
+
+
+@pytest.mark.parametrize('outcome, past_deadline, expected, recorded', [
+    (("error", "N/A", "Network Error"), True, ("error", "N/A", "Timeout"), False),
+    (("error", "N/A", "Network Error"), False, ("error", "N/A", "Network Error"), False),
+    (("failed", "N/A", "Blocked"), True, ("failed", "N/A", "Blocked"), True),
+    (("success", "JP", ""), False, ("success", "JP", ""), True),
+])
+def test_finish_check(checker, outcome, past_deadline, expected, recorded):
+    started = time.monotonic()
+    end = started - 1 if past_deadline else started + 60
+    result = checker._finish_check('netflix', 'Netflix', outcome, started, end, [])
+    assert (result.status, result.region, result.detail) == expected
+    assert bool(checker.latency_history('netflix')) == recorded
+
+
+def slow_check(seconds):
+    def check(self):
+        time.sleep(seconds)
+        return "error", "N/A", "Network Error"
+    return check
+
+
+def test_a_check_overrunning_its_service_deadline_is_a_timeout(checker, monkeypatch):
+    monkeypatch.setattr(UnlockChecker, 'check_spotify', slow_check(0.15))
+    monkeypatch.setattr(UnlockChecker, 'service_deadline', lambda self, service: 0.1)
+    result = checker._check_service('spotify', 'Spotify', 'check_spotify')
+    assert (result.status, result.detail) == ("error", "Timeout")
+
+
+def test_checks_still_running_at_the_run_deadline_are_timeouts(checker, monkeypatch):
+    monkeypatch.setattr(UnlockChecker, 'check_spotify', slow_check(1.0))
+    monkeypatch.setattr(UnlockChecker, 'check_scholar', lambda self: ("success", "JP", ""))
+    monkeypatch.setattr(UnlockChecker, 'dns_unlock', lambda self, services=None: {})
+    started = time.monotonic()
+    results = {result.service: result for result in checker.run_services(['spotify', 'scholar'], deadline=0.2)}
+    assert time.monotonic() - started < 0.9
+    assert (results['spotify'].status, results['spotify'].detail) == ("error", "Timeout")
+    assert results['scholar'].status == "success"
@@ -0,0 +1,89 @@
+"""DiskCache: TTLs, periodic sweeps and per-namespace LRU budgets"""
+
+import time
+
+import pytest
+
+import unlockcheck
+from unlockcheck import DiskCache
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make(**kwargs):
+        cache = DiskCache(str(tmp_path / 'cache.sqlite3'), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def rows(cache, namespace=None):
+    query, args = "SELECT namespace, key FROM entries", ()
+    if namespace is not None:
+        query, args = query + " WHERE namespace = ?", (namespace,)
+    return sorted(cache._connect().execute(query, args).fetchall())
+
+
+def test_round_trip_and_expiry(make_cache):
+    cache = make_cache()
+    cache.set('ip_info', '203.0.113.9', {'country_code': 'JP', 'asn': 'AS64500'}, 60)
+    cache.set('asn_country', '64500', 'US', -1)
+    assert cache.get('ip_info', '203.0.113.9') == {'country_code': 'JP', 'asn': 'AS64500'}
+    # Expired rows may still be on disk until the next sweep, but are never returned
+    assert cache.get('asn_country', '64500') is None
+    assert cache.get('ip_info', '198.51.100.1') is None
+
+
+def test_expired_rows_are_swept_periodically_not_on_every_write(make_cache, monkeypatch):
+    monkeypatch.setattr(unlockcheck, 'CACHE_PURGE_INTERVAL', 4)
+    cache = make_cache()
+    cache.set('result', 'old', ['success', 'US', ''], -1)
+    for index in range(2):
+        cache.set('result', f"new{index}", ['success', 'US', ''], 60)
+    assert ('result', 'old') in rows(cache)
+    cache.set('result', 'new2', ['success', 'US', ''], 60)
+    assert rows(cache) == [('result', 'new0'), ('result', 'new1'), ('result', 'new2')]
+
+
+def test_each_namespace_keeps_its_own_lru_budget(make_cache, monkeypatch):
+    monkeypatch.setattr(unlockcheck, 'CACHE_PURGE_INTERVAL', 1)
+    cache = make_cache(max_entries=3, namespace_entries={'latency': 1})
+    for index in range(3):
+        cache.set('ip_info', f"ip{index}", {}, 60)
+        time.sleep(0.01)
+    # Reading ip0 makes ip1 the least recently used
+    assert cache.get('ip_info', 'ip0') == {}
+    for index in range(5):
+        cache.set('result', f"r{index}", [], 60)
+        time.sleep(0.01)
+    cache.set('latency', 'netflix', [1.0], 60)
+    cache.set('latency', 'claude', [2.0], 60)
+    cache.set('ip_info', 'ip3', {}, 60)
+
+    assert rows(cache, 'result') == [('result', 'r2'), ('result', 'r3'), ('result', 'r4')]
+    assert rows(cache, 'latency') == [('latency', 'claude')]
+    assert rows(cache, 'ip_info') == [('ip_info', 'ip0'), ('ip_info', 'ip2'), ('ip_info', 'ip3')]
+
+
+def test_budgets_and_expiry_are_applied_when_the_database_is_opened(make_cache):
+    cache = make_cache()
+    for index in range(4):
+        cache.set('ip_info', f"ip{index}", {}, 60 if index else -1)
+        time.sleep(0.01)
+    cache.close()
+    reopened = make_cache(max_entries=2)
+    assert rows(reopened) == [('ip_info', 'ip2'), ('ip_info', 'ip3')]
+
+
+def test_unusable_database_turns_the_cache_off(tmp_path):
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_text('')
+    cache = DiskCache(str(blocker / 'cache.sqlite3'))
+    cache.set('result', 'key', ['success', 'US', ''], 60)
+    assert cache.get('result', 'key') is None
+    assert cache._disabled
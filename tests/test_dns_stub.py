@@ -0,0 +1,61 @@
+"""DNSStub: parsing replies with compressed names"""
+
+import struct
+
+import pytest
+
+from unlockcheck import DNSStub
+
+
+def pointer(offset: int) -> bytes:
+    return struct.pack('>H', 0xC000 | offset)
+
+
+def record(owner: bytes, rtype: int, rdata: bytes) -> bytes:
+    return owner + struct.pack('>HHIH', rtype, 1, 300, len(rdata)) + rdata
+
+
+def cname_chain_reply(txid: int = 0x1234, rcode: int = 0) -> bytes:
+    """
+    www.example.com A: www.example.com CNAME cdn.example.com CNAME
+    edge.cdn.example.com A 198.51.100.7 (and AAAA 2001:db8::7), every owner
+    and target name after the question compressed onto an earlier one
+    """
+    reply = DNSStub().build_query(txid, 'WWW.Example.com', 'A')
+    reply = reply[:2] + struct.pack('>HHH', 0x8180 | rcode, 1, 4) + reply[8:]
+    example = 12 + len(b'\x03www')
+    # www -> cdn.example.com
+    reply += record(pointer(12), 5, b'\x03cdn' + pointer(example))
+    cdn = len(reply) - len(b'\x03cdn') - 2
+    # cdn.example.com -> edge.cdn.example.com
+    reply += record(pointer(cdn), 5, b'\x04edge' + pointer(cdn))
+    edge = len(reply) - len(b'\x04edge') - 2
+    reply += record(pointer(edge), 1, bytes([198, 51, 100, 7]))
+    reply += record(pointer(edge), 28, bytes.fromhex('20010db8000000000000000000000007'))
+    return reply
+
+
+def test_compressed_cname_chain_is_flattened():
+    txid, qname, qtype, answers = DNSStub.parse_response(cname_chain_reply())
+    assert (txid, qname, qtype) == (0x1234, 'www.example.com', DNSStub.TYPES['A'])
+    assert answers == ['198.51.100.7', '2001:db8::7']
+
+
+def test_read_name_follows_nested_pointers():
+    reply = cname_chain_reply()
+    edge = reply.index(b'\x04edge')
+    # Names keep their case; only the question name is lowercased for matching
+    assert DNSStub._read_name(reply, edge) == ('edge.cdn.Example.com', edge + 7)
+    # A name that is only a pointer ends right after the two pointer bytes
+    assert DNSStub._read_name(reply + pointer(edge), len(reply)) == ('edge.cdn.Example.com', len(reply) + 2)
+
+
+def test_error_rcode_has_no_answers():
+    txid, qname, _, answers = DNSStub.parse_response(cname_chain_reply(txid=7, rcode=3))
+    assert (txid, qname, answers) == (7, 'www.example.com', [])
+
+
+def test_compression_loop_is_rejected():
+    looped = bytes(12) + pointer(14) + pointer(12)
+    with pytest.raises(ValueError):
+        DNSStub._read_name(looped, 12)
@@ -0,0 +1,84 @@
+"""IPBatchLookup: ip-api.com /batch calls shared by concurrent callers"""
+
+import asyncio
+import time
+from json import dumps
+
+import unlockcheck
+from unlockcheck import IPBatchLookup, ProbeResponse
+
+
+class BatchAPI:
+    """Stand-in for the AsyncHTTPClient IPBatchLookup posts to"""
+
+    def __init__(self, delay: float = 0.0, headers=None):
+        self.delay = delay
+        self.headers = headers or {}
+        self.batches = []
+        self.deadlines = []
+        self.sent_at = []
+
+    async def request(self, method, url, json=None, timeout=None):
+        self.batches.append(list(json))
+        self.deadlines.append(unlockcheck._deadline.get())
+        self.sent_at.append(time.monotonic())
+        await asyncio.sleep(self.delay)
+        records = [{'status': 'success', 'query': ip, 'countryCode': 'JP'} for ip in json if ip != '192.0.2.1']
+        return ProbeResponse(200, url, self.headers, dumps(records).encode())
+
+    def close(self):
+        pass
+
+
+def lookup_all(batch: IPBatchLookup, ips, deadlines=None):
+    """Look every IP up concurrently, each caller with its own deadline (seconds, None for none)"""
+    async def one(ip, deadline):
+        unlockcheck._deadline.set(None if deadline is None else time.monotonic() + deadline)
+        return await batch.lookup(ip)
+
+    async def run():
+        return await asyncio.gather(*(one(ip, deadline) for ip, deadline in zip(ips, deadlines or [None] * len(ips))))
+    return asyncio.run(run())
+
+
+def test_lookups_within_the_window_share_one_call():
+    api = BatchAPI()
+    records = lookup_all(IPBatchLookup(api, window=0.05), ['203.0.113.1', '203.0.113.2', '192.0.2.1', '203.0.113.1'])
+    assert api.batches == [['203.0.113.1', '203.0.113.2', '192.0.2.1']]
+    assert [record and record['query'] for record in records] == ['203.0.113.1', '203.0.113.2', None, '203.0.113.1']
+
+
+def test_a_full_batch_goes_out_without_waiting_for_the_window():
+    api = BatchAPI()
+    started = time.monotonic()
+    lookup_all(IPBatchLookup(api, window=5, size=2), ['203.0.113.1', '203.0.113.2', '203.0.113.3', '203.0.113.4'])
+    assert api.batches == [['203.0.113.1', '203.0.113.2'], ['203.0.113.3', '203.0.113.4']]
+    assert time.monotonic() - started < 1
+
+
+def test_calls_ignore_the_flushing_callers_deadline_and_each_caller_keeps_its_own():
+    api = BatchAPI(delay=0.2)
+    started = time.monotonic()
+    records = lookup_all(IPBatchLookup(api, window=0.01), ['203.0.113.1', '203.0.113.2'], [0.05, None])
+    assert api.deadlines == [None]
+    assert records[0] is None
+    assert records[1]['query'] == '203.0.113.2'
+    assert time.monotonic() - started >= 0.2
+
+
+def test_an_exhausted_quota_delays_the_next_call_by_x_ttl():
+    api = BatchAPI(headers={'X-Rl': '0', 'X-Ttl': '1'})
+    batch = IPBatchLookup(api, window=0.01)
+
+    async def run():
+        first = await batch.lookup('203.0.113.1')
+        # A caller whose deadline ends before the quota resets gives up in time
+        unlockcheck._deadline.set(time.monotonic() + 0.1)
+        hurried = await batch.lookup('203.0.113.2')
+        unlockcheck._deadline.set(None)
+        patient = await batch.lookup('203.0.113.3')
+        return first, hurried, patient
+
+    first, hurried, patient = asyncio.run(run())
+    assert first['query'] == '203.0.113.1' and hurried is None and patient['query'] == '203.0.113.3'
+    assert api.sent_at[1] - api.sent_at[0] >= 0.9
@@ -0,0 +1,85 @@
+"""get_ip_info: provider race and the on-disk IP cache, against canned provider answers"""
+
+import asyncio
+import time
+
+import pytest
+
+from unlockcheck import DiskCache, ProbeResponse, UnlockChecker
+
+IP = '203.0.113.9'
+# Seconds each provider takes to answer
+DELAYS = {'api64.ipify.org': 0.01, 'ipapi.co': 0.05, 'ipinfo.io': 0.3, 'ip-api.com': 0.1, 'api.hackertarget.com': 0.01}
+ANSWERS = {
+    'api64.ipify.org': IP,
+    'ipapi.co': f'{{"ip": "{IP}", "country_code": "JP", "country_name": "Japan", "org": "Example"}}',
+    'ip-api.com': f'{{"status": "success", "query": "{IP}", "countryCode": "JP", "country": "Japan",'
+                  f' "as": "AS64500 Example", "hosting": true}}',
+    'api.hackertarget.com': '"64500","EXAMPLE, US"',
+}
+
+
+@pytest.fixture
+def provider_calls(monkeypatch):
+    calls = []
+
+    async def asend(self, probe):
+        host = probe.url.split('/')[2]
+        calls.append(host)
+        await asyncio.sleep(DELAYS[host])
+        answer = ANSWERS.get(host)
+        return ProbeResponse(200 if answer else 503, probe.url, {}, (answer or '').encode())
+
+    monkeypatch.setattr(UnlockChecker, '_asend', asend)
+    return calls
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache.sqlite3'))
+    yield cache
+    cache.close()
+
+
+def lookup(cache=None) -> dict:
+    checker = UnlockChecker(cache=cache)
+    try:
+        return asyncio.run(checker.aget_ip_info())
+    finally:
+        checker.close()
+
+
+def test_cache_miss_races_every_provider_once(provider_calls, cache):
+    info = lookup(cache)
+    assert info['ip'] == IP and info['country_code'] == 'JP'
+    assert info['ip_type'] == 'Datacenter/Hosting'
+    assert info['registration_country_code'] == 'US'
+    assert sorted(provider_calls) == ['api.hackertarget.com', 'api64.ipify.org', 'ip-api.com',
+                                      'ipapi.co', 'ipinfo.io']
+    assert cache.get('ip_info', IP)['ip_type'] == 'Datacenter/Hosting'
+
+
+def test_cache_hit_ends_the_race_at_the_first_answer_with_the_ip(provider_calls, cache):
+    lookup(cache)
+    provider_calls.clear()
+    started = time.monotonic()
+    info = lookup(cache)
+    # ipinfo.io (0.3 s) was cut short once ipify's answer turned up in the cache
+    assert time.monotonic() - started < DELAYS['ipinfo.io']
+    assert info['ip_type'] == 'Datacenter/Hosting' and info['registration_country_code'] == 'US'
+    # One round trip: the providers were sent together, nothing followed the ipify answer
+    assert sorted(provider_calls) == ['api64.ipify.org', 'ip-api.com', 'ipapi.co', 'ipinfo.io']
+
+
+def test_ip_api_answering_after_the_grace_period_is_waited_for_not_asked_again(provider_calls, monkeypatch):
+    monkeypatch.setitem(DELAYS, 'ip-api.com', DELAYS['ipapi.co'] + 0.5)
+    info = lookup()
+    assert provider_calls.count('ip-api.com') == 1
+    assert info['ip_type'] == 'Datacenter/Hosting'
+
+
+def test_ip_type_stays_unknown_without_ip_api(provider_calls, monkeypatch):
+    monkeypatch.delitem(ANSWERS, 'ip-api.com')
+    info = lookup()
+    assert provider_calls.count('ip-api.com') == 1
+    assert info['country_code'] == 'JP' and info['ip_type'] == 'Unknown'
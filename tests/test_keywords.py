@@ -0,0 +1,51 @@
+"""KeywordSet: case-insensitive keyword matching on raw response bytes"""
+
+import pytest
+
+import unlockcheck
+from unlockcheck import KeywordSet
+
+KEYWORDS = KeywordSet("not available", "Access Denied", "страница отсутствует", "僅在特定地區提供服務")
+
+
+@pytest.mark.parametrize('body, found', [
+    (b'<h1>NOT AVAILABLE</h1>', {"not available"}),
+    (b'access denied; this page is Not Available', {"not available", "Access Denied"}),
+    ('<title>Страница отсутствует</title>'.encode(), {"страница отсутствует"}),
+    ('СТРАНИЦА ОТСУТСТВУЕТ'.encode(), {"страница отсутствует"}),
+    ('此服務僅在特定地區提供服務'.encode(), {"僅在特定地區提供服務"}),
+    (b'<html>all good</html>', set()),
+    (b'', set()),
+])
+def test_scan_and_search(body, found):
+    assert KEYWORDS.scan(body) == found
+    assert KEYWORDS.search(body) == bool(found)
+
+
+def test_bodies_that_are_not_utf8_do_not_raise():
+    body = 'Страница отсутствует'.encode('cp1251') + b'\xff\xfe not available'
+    assert KEYWORDS.scan(body) == {"not available"}
+
+
+def test_keywords_are_reported_as_given():
+    assert KEYWORDS.keywords == {"not available", "Access Denied", "страница отсутствует", "僅在特定地區提供服務"}
+    assert KEYWORDS.scan(b'ACCESS DENIED') == {"Access Denied"}
+
+
+SAMPLES = [
+    '<html><title>Just a moment...</title>Checking your browser</html>',
+    'Sorry, YouTube Premium is not available in your country',
+    'Netflix: Страница отсутствует / Page manquante',
+    '<title>Claude - Unavailable</title> 應用程式不可用',
+    'Request not allowed: unsupported Region',
+    'Reddit is NOT available in your region. Blocked by Imgur',
+]
+
+
+@pytest.mark.parametrize('name', [name for name, value in vars(unlockcheck).items() if isinstance(value, KeywordSet)])
+@pytest.mark.parametrize('text', SAMPLES)
+def test_module_keyword_sets_match_like_lowercased_text(name, text):
+    """Same answer as the `keyword in text.lower()` checks they replaced"""
+    keywords = getattr(unlockcheck, name)
+    expected = {keyword for keyword in keywords.keywords if keyword.lower() in text.lower()}
+    assert keywords.scan(text.encode()) == expected
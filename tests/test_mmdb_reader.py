@@ -0,0 +1,178 @@
+"""MMDBReader: lookups in a small MaxMind DB built by the fixture"""
+
+import ipaddress
+import struct
+
+import pytest
+
+from unlockcheck import MMDBReader
+
+
+class Pointer(int):
+    """Data section offset, written as an MMDB pointer instead of the value itself"""
+
+
+def encode_mmdb_value(value) -> bytes:
+    """MaxMind DB data section encoding of the types the fixtures use (sizes below 285)"""
+    def control(kind: int, size: int) -> bytes:
+        extra = b''
+        if size >= 29:
+            assert size < 285
+            size, extra = 29, bytes([size - 29])
+        if kind <= 7:
+            return bytes([(kind << 5) | size]) + extra
+        return bytes([size, kind - 7]) + extra
+
+    if isinstance(value, Pointer):
+        assert value < 2048
+        return bytes([(1 << 5) | (value >> 8), value & 0xFF])
+    if isinstance(value, bool):
+        return control(14, int(value))
+    if isinstance(value, str):
+        data = value.encode('utf-8')
+        return control(2, len(data)) + data
+    if isinstance(value, float):
+        return control(3, 8) + struct.pack('>d', value)
+    if isinstance(value, int):
+        data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+        return control(6 if value < 2 ** 32 else 9, len(data)) + data
+    if isinstance(value, dict):
+        return control(7, len(value)) + b''.join(
+            encode_mmdb_value(key) + encode_mmdb_value(item) for key, item in value.items()
+        )
+    if isinstance(value, list):
+        return control(11, len(value)) + b''.join(encode_mmdb_value(item) for item in value)
+    raise TypeError(value)
+
+
+def build_mmdb(networks, ip_version: int = 6, database_type: str = 'Test-Country') -> bytes:
+    """
+    A MaxMind DB file (24-bit records) mapping each (cidr, record) of networks
+    IPv4 networks go under ::/96 in an IPv6 database; a record may be a Pointer
+    to the data section offset of an earlier one
+    """
+    nodes = [[None, None]]
+    data = b''
+    for cidr, record in networks:
+        network = ipaddress.ip_network(cidr)
+        bits, prefix = network.network_address.packed, network.prefixlen
+        if ip_version == 6 and network.version == 4:
+            bits, prefix = bytes(12) + bits, prefix + 96
+        offset = record if isinstance(record, Pointer) else len(data)
+        if not isinstance(record, Pointer):
+            data += encode_mmdb_value(record)
+        node = 0
+        for index in range(prefix):
+            bit = (bits[index >> 3] >> (7 - (index & 7))) & 1
+            if index == prefix - 1:
+                nodes[node][bit] = ('data', offset)
+            else:
+                if not isinstance(nodes[node][bit], int):
+                    nodes.append([None, None])
+                    nodes[node][bit] = len(nodes) - 1
+                node = nodes[node][bit]
+
+    node_count = len(nodes)
+
+    def record_value(entry) -> int:
+        if entry is None:
+            return node_count  # No data
+        if isinstance(entry, tuple):
+            return node_count + 16 + entry[1]
+        return entry
+
+    tree = b''.join(record_value(entry).to_bytes(3, 'big') for node in nodes for entry in node)
+    metadata = encode_mmdb_value({
+        'node_count': node_count,
+        'record_size': 24,
+        'ip_version': ip_version,
+        'database_type': database_type,
+        'languages': ['en'],
+        'binary_format_major_version': 2,
+        'binary_format_minor_version': 0,
+        'build_epoch': 1760000000,
+        'description': {'en': 'unlockcheck test fixture'},
+    })
+    return tree + bytes(16) + data + b'\xab\xcd\xefMaxMind.com' + metadata
+
+
+
+@pytest.fixture
+def mmdb_file(tmp_path):
+    """Write build_mmdb(*args) to a file and return its path"""
+    def write(networks, **kwargs):
+        path = tmp_path / 'fixture.mmdb'
+        path.write_bytes(build_mmdb(networks, **kwargs))
+        return str(path)
+    return write
+
+
+COUNTRY_JP = {
+    'country': {'iso_code': 'JP', 'names': {'en': 'Japan', 'ja': '日本'}},
+    'registered_country': {'iso_code': 'US', 'names': {'en': 'United States'}},
+    'location': {'time_zone': 'Asia/Tokyo', 'latitude': 35.69, 'accuracy_radius': 50},
+    'is_in_european_union': False,
+}
+ASN_RECORD = {'autonomous_system_number': 64500, 'autonomous_system_organization': 'Example Net'}
+
+
+def test_lookup_range_edges_in_an_ipv6_database(mmdb_file):
+    reader = MMDBReader(mmdb_file([
+        ('203.0.113.0/24', COUNTRY_JP),
+        ('2001:db8::/32', ASN_RECORD),
+    ]))
+    try:
+        assert reader.metadata['database_type'] == 'Test-Country'
+        assert reader.lookup('203.0.112.255') is None
+        assert reader.lookup('203.0.113.0') == COUNTRY_JP
+        assert reader.lookup('203.0.113.255') == COUNTRY_JP
+        assert reader.lookup('203.0.114.0') is None
+        # IPv4 lives under ::/96, not under its IPv4-mapped address
+        assert reader.lookup('::cb00:7101') == COUNTRY_JP
+        assert reader.lookup('::ffff:203.0.113.1') is None
+        assert reader.lookup('2001:db8:ffff::1') == ASN_RECORD
+        assert reader.lookup('2001:db9::') is None
+        assert reader.lookup('not-an-ip') is None
+    finally:
+        reader.close()
+
+
+def test_pointer_records_decode_like_the_record_they_point_to(mmdb_file):
+    reader = MMDBReader(mmdb_file([
+        ('198.51.100.0/24', COUNTRY_JP),
+        ('192.0.2.0/25', Pointer(0)),
+    ], ip_version=4))
+    try:
+        assert reader.lookup('192.0.2.127') == COUNTRY_JP
+        assert reader.lookup('192.0.2.128') is None
+        # An IPv4-only database has no IPv6 records
+        assert reader.lookup('2001:db8::1') is None
+    finally:
+        reader.close()
+
+
+def test_ip_info_maps_country_and_asn_records(mmdb_file):
+    reader = MMDBReader(mmdb_file([
+        ('203.0.113.0/24', COUNTRY_JP),
+        ('2001:db8::/32', ASN_RECORD),
+    ]))
+    try:
+        assert reader.ip_info('203.0.113.9') == {
+            'country_code': 'JP', 'usage_country_code': 'JP',
+            'country': 'Japan', 'usage_location': 'Japan',
+            'registration_country_code': 'US', 'registration_location': 'United States',
+            'timezone': 'Asia/Tokyo',
+        }
+        assert reader.ip_info('2001:db8::1') == {
+            'asn': 'AS64500', 'as_info': 'AS64500 Example Net', 'isp': 'Example Net',
+        }
+        assert reader.ip_info('198.51.100.1') == {}
+    finally:
+        reader.close()
+
+
+def test_rejects_a_file_without_metadata(tmp_path):
+    path = tmp_path / 'bogus.mmdb'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        MMDBReader(str(path))
@@ -0,0 +1,156 @@
+"""ProviderHealth circuit breakers and the retrying _provider_call sub-flow"""
+
+import time
+
+import pytest
+import requests
+
+import unlockcheck
+from unlockcheck import (
+    PROVIDER_COOLDOWN, PROVIDER_COOLDOWN_MAX, PROVIDER_FAILURE_THRESHOLD, PROVIDER_RETRIES, DiskCache, Pause,
+    Probe, ProbeCancelled, ProbeResponse, ProviderHealth, Race, UnlockChecker
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Wall clock ProviderHealth reads, advanced by clock.now += seconds"""
+    class Clock:
+        now = time.time()
+    monkeypatch.setattr(unlockcheck.time, 'time', lambda: Clock.now)
+    return Clock
+
+
+def fail(health, provider, times):
+    for _ in range(times):
+        health.record(provider, False)
+
+
+def test_circuit_opens_after_the_threshold_of_failures_in_a_row(clock):
+    health = ProviderHealth()
+    fail(health, 'ipinfo.io', PROVIDER_FAILURE_THRESHOLD - 1)
+    health.record('ipinfo.io', True)
+    fail(health, 'ipinfo.io', PROVIDER_FAILURE_THRESHOLD - 1)
+    assert health.available('ipinfo.io')
+    fail(health, 'ipinfo.io', 1)
+    assert not health.available('ipinfo.io')
+    assert health.available('ipapi.co')
+
+
+def test_half_open_circuit_reopens_for_longer_or_closes_on_success(clock):
+    health = ProviderHealth()
+    fail(health, 'bgpview', PROVIDER_FAILURE_THRESHOLD)
+
+    # Cool-down over: calls go through again, one more failure re-opens it for twice as long
+    clock.now += PROVIDER_COOLDOWN
+    assert health.available('bgpview')
+    fail(health, 'bgpview', 1)
+    clock.now += PROVIDER_COOLDOWN
+    assert not health.available('bgpview')
+    clock.now += PROVIDER_COOLDOWN
+    assert health.available('bgpview')
+
+    # One success closes it: the next opening starts from the base cool-down again
+    health.record('bgpview', True)
+    fail(health, 'bgpview', PROVIDER_FAILURE_THRESHOLD - 1)
+    assert health.available('bgpview')
+    fail(health, 'bgpview', 1)
+    clock.now += PROVIDER_COOLDOWN
+    assert health.available('bgpview')
+
+
+def test_cooldown_is_capped(clock):
+    health = ProviderHealth()
+    fail(health, 'hackertarget', PROVIDER_FAILURE_THRESHOLD + 20)
+    clock.now += PROVIDER_COOLDOWN_MAX
+    assert health.available('hackertarget')
+
+
+def test_state_is_shared_through_the_disk_cache(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / 'cache.sqlite3'))
+    fail(ProviderHealth(cache), 'ipapi.co', PROVIDER_FAILURE_THRESHOLD)
+    assert not ProviderHealth(cache).available('ipapi.co')
+    cache.close()
+
+
+@pytest.mark.parametrize('result, failed', [
+    (ProbeResponse(200, '', {}, b''), False),
+    (ProbeResponse(404, '', {}, b''), False),
+    (ProbeResponse(429, '', {}, b''), True),
+    (ProbeResponse(503, '', {}, b''), True),
+    (requests.exceptions.ConnectionError('refused'), True),
+])
+def test_failed(result, failed):
+    assert ProviderHealth.failed(result) == failed
+
+
+def run_call(checker, provider, results):
+    """Drive _provider_call by hand: answer its probes with results; returns (return value, yielded)"""
+    flow = checker._provider_call(provider, Probe('GET', 'https://provider.example/'))
+    yielded = []
+    answer = None
+    answers = iter(results)
+    try:
+        step = next(flow)
+        while True:
+            yielded.append(step)
+            if isinstance(step, Pause):
+                step = flow.send(None)
+                continue
+            answer = next(answers)
+            step = flow.throw(answer) if isinstance(answer, BaseException) else flow.send(answer)
+    except StopIteration as stop:
+        return stop.value, yielded
+
+
+@pytest.fixture
+def checker():
+    checker = UnlockChecker()
+    yield checker
+    checker.close()
+
+
+def test_a_failed_call_is_retried_after_a_backoff(checker):
+    ok = ProbeResponse(200, 'https://provider.example/', {}, b'{}')
+    value, yielded = run_call(checker, 'bgpview', [ProbeResponse(503, '', {}, b''), ok])
+    assert value is ok
+    assert [type(step) for step in yielded] == [Probe, Pause, Probe]
+    assert checker.provider_health._get('bgpview') == {}
+
+
+def test_every_attempt_failing_counts_as_one_failed_call(checker):
+    errors = [requests.exceptions.ConnectionError('refused')] * (PROVIDER_RETRIES + 1)
+    value, yielded = run_call(checker, 'bgpview', errors)
+    assert value is None
+    assert sum(isinstance(step, Probe) for step in yielded) == PROVIDER_RETRIES + 1
+    assert checker.provider_health._get('bgpview')['failures'] == 1
+
+
+def test_no_retry_when_the_backoff_would_overrun_the_deadline(checker):
+    token = unlockcheck._deadline.set(time.monotonic() + 0.01)
+    try:
+        value, yielded = run_call(checker, 'bgpview', [ProbeResponse(503, '', {}, b'')])
+    finally:
+        unlockcheck._deadline.reset(token)
+    assert value is None and len(yielded) == 1
+
+
+def test_an_open_circuit_skips_the_provider_without_a_probe(checker):
+    fail(checker.provider_health, 'hackertarget', PROVIDER_FAILURE_THRESHOLD)
+    assert run_call(checker, 'hackertarget', []) == (None, [])
+
+
+def test_race_results_count_unless_cut_short_or_the_route_is_down(checker):
+    race = Race([], decisive=set())
+    race.results = [ProbeResponse(503, '', {}, b''), ProbeCancelled('x'), None,
+                    requests.exceptions.ConnectionError('refused')]
+    providers = ['ipapi.co', 'ipinfo.io', 'ip-api.com', 'ipify']
+    for _ in range(PROVIDER_FAILURE_THRESHOLD):
+        checker._record_race_health(providers, race)
+    assert [checker.provider_health.available(provider) for provider in providers] == [False, True, True, False]
+
+    # Nobody answered: a dead route, not failing providers
+    race.results = [requests.exceptions.ConnectionError('refused')] * 4
+    for _ in range(PROVIDER_FAILURE_THRESHOLD):
+        checker._record_race_health(providers[1:], race)
+    assert checker.provider_health.available('ipinfo.io')
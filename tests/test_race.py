@@ -0,0 +1,107 @@
+"""Race: decisive outcomes, grace, kept probes and cancellation, on both transports"""
+
+import asyncio
+import time
+
+import pytest
+
+from unlockcheck import Probe, ProbeCancelled, ProbeResponse, Race, UnlockChecker
+
+
+class StubChecker(UnlockChecker):
+    """Probes to http://<name>/<seconds> answer 200 after that many seconds; http://<name>/fail raises"""
+
+    def __init__(self):
+        super().__init__()
+        self.finished = []
+        self.cancelled = []
+
+    @staticmethod
+    def _parse(probe):
+        name, _, delay = probe.url[len('http://'):].partition('/')
+        return name, delay
+
+    def _send(self, probe, cancelled=None):
+        name, delay = self._parse(probe)
+        if delay == 'fail':
+            raise ConnectionError(name)
+        end = time.monotonic() + float(delay)
+        while time.monotonic() < end:
+            if cancelled is not None and cancelled.is_set():
+                self.cancelled.append(name)
+                raise ProbeCancelled(probe.url)
+            time.sleep(0.005)
+        self.finished.append(name)
+        return ProbeResponse(200, probe.url, {}, name.encode())
+
+    async def _asend(self, probe):
+        name, delay = self._parse(probe)
+        if delay == 'fail':
+            raise ConnectionError(name)
+        try:
+            await asyncio.sleep(float(delay))
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+        self.finished.append(name)
+        return ProbeResponse(200, probe.url, {}, name.encode())
+
+
+def probe(name: str, delay) -> Probe:
+    return Probe('GET', f"http://{name}/{delay}", classify=lambda response: response.text)
+
+
+@pytest.fixture(params=['blocking', 'asyncio'])
+def run_race(request):
+    checker = StubChecker()
+
+    def run(race: Race):
+        started = time.monotonic()
+        if request.param == 'blocking':
+            outcomes = checker._race(race)
+        else:
+            outcomes = asyncio.run(checker._arace(race))
+        return outcomes, time.monotonic() - started
+
+    run.checker = checker
+    yield run
+    checker.close()
+
+
+def test_decisive_outcome_cancels_the_slower_probes(run_race):
+    race = Race([probe('slow', 0.5), probe('blocked', 0.02)], decisive={'blocked'})
+    outcomes, elapsed = run_race(race)
+    assert outcomes == [None, 'blocked']
+    assert elapsed < 0.3
+    time.sleep(0.05)
+    assert run_race.checker.cancelled == ['slow']
+
+
+def test_probes_finishing_within_the_grace_period_still_count(run_race):
+    race = Race([probe('fast', 0.02), probe('medium', 0.1), probe('slow', 0.6)], decisive={'fast'}, grace=0.2)
+    outcomes, elapsed = run_race(race)
+    assert outcomes == ['fast', 'medium', None]
+    assert elapsed < 0.45
+
+
+def test_without_a_decisive_outcome_every_probe_is_waited_for(run_race):
+    race = Race([probe('a', 0.05), probe('b', 'fail'), probe('c', 0.1)], decisive=lambda outcome: False)
+    outcomes, _ = run_race(race)
+    assert outcomes == ['a', None, 'c']
+    assert isinstance(race.results[1], ConnectionError)
+    assert isinstance(race.results[2], ProbeResponse)
+
+
+def test_kept_probes_outlast_the_grace_period(run_race):
+    race = Race([probe('winner', 0.02), probe('kept', 0.3), probe('loser', 0.3)], decisive={'winner'}, keep=[1])
+    outcomes, elapsed = run_race(race)
+    assert outcomes == ['winner', 'kept', None]
+    assert elapsed >= 0.25
+
+
+def test_final_outcome_ends_the_race_at_once(run_race):
+    race = Race([probe('final', 0.02), probe('kept', 0.5)], decisive={'kept'}, grace=1.0,
+                final=lambda outcome: outcome == 'final', keep=[1])
+    outcomes, elapsed = run_race(race)
+    assert outcomes == ['final', None]
+    assert elapsed < 0.3
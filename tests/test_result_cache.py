@@ -0,0 +1,64 @@
+"""Result cache: status-aware TTLs and what a cached result is keyed on"""
+
+import socket
+
+import pytest
+
+import unlockcheck
+from unlockcheck import RESULT_TTL_STABLE, RESULT_TTL_UNSTABLE, DiskCache, UnlockChecker
+
+
+@pytest.mark.parametrize('status, detail, ttl', [
+    ('success', '', RESULT_TTL_STABLE),
+    ('success', 'Full Access', RESULT_TTL_STABLE),
+    ('success', 'Manual Check Needed', RESULT_TTL_UNSTABLE),
+    ('success', 'Please verify in browser', RESULT_TTL_UNSTABLE),
+    ('success', 'Rate Limited', RESULT_TTL_UNSTABLE),
+    ('failed', 'Region Restricted', RESULT_TTL_STABLE),
+    ('failed', 'Blocked', RESULT_TTL_STABLE),
+    ('failed', 'Access Denied', RESULT_TTL_UNSTABLE),
+    ('partial', 'Originals Only', RESULT_TTL_UNSTABLE),
+    ('error', 'Timeout', RESULT_TTL_UNSTABLE),
+    ('error', 'Network Error', RESULT_TTL_UNSTABLE),
+])
+def test_result_ttl(status, detail, ttl):
+    assert UnlockChecker.result_ttl(status, detail) == ttl
+
+
+@pytest.fixture
+def checker(tmp_path, monkeypatch):
+    resolv_conf = tmp_path / 'resolv.conf'
+    resolv_conf.write_text('nameserver 192.0.2.53\nnameserver 192.0.2.1\n')
+    monkeypatch.setattr(unlockcheck, 'RESOLV_CONF', str(resolv_conf))
+    cache = DiskCache(str(tmp_path / 'cache.sqlite3'))
+    checker = UnlockChecker(cache=cache, family=socket.AF_INET)
+    checker.ip_info = {'ip': '203.0.113.9'}
+    yield checker
+    checker.close()
+    cache.close()
+
+
+def test_result_key_covers_ip_family_resolvers_and_service(checker):
+    assert checker._result_key('netflix') == '203.0.113.9|ipv4|192.0.2.1,192.0.2.53|netflix'
+    checker.ip_info = {'ip': 'N/A'}
+    assert checker._result_key('netflix') is None
+
+
+def test_results_are_reused_for_the_same_exit_ip_and_resolvers_only(checker, tmp_path, monkeypatch):
+    checker.store_result('netflix', 'success', 'JP', 'Full Access')
+    checker.store_result('claude', 'error', 'N/A', 'Network Error')
+    assert checker.cached_result('netflix') == ('success', 'JP', 'Full Access')
+    assert checker.cached_result('claude') == ('error', 'N/A', 'Network Error')
+
+    checker.fresh = True
+    assert checker.cached_result('netflix') is None
+    checker.fresh = False
+
+    # Another resolver can answer with DNS-unlock addresses: its results are its own
+    other = tmp_path / 'other-resolv.conf'
+    other.write_text('nameserver 198.51.100.53\n')
+    monkeypatch.setattr(unlockcheck, 'RESOLV_CONF', str(other))
+    assert checker.cached_result('netflix') is None
+
+    checker.ip_info = {'ip': '198.51.100.7'}
+    assert checker.cached_result('netflix') is None
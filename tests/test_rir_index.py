@@ -0,0 +1,84 @@
+"""RIRIndex: delegation parsing and range edges of the built index"""
+
+import pytest
+
+from unlockcheck import RIRIndex
+
+DELEGATIONS = """\
+2|arin|20250101|7|19700101|20250101|+0000
+arin|*|ipv4|*|3|summary
+# comment
+arin|US|ipv4|198.51.100.0|256|20100101|allocated|a1
+arin|US|ipv4|198.51.101.0|256|20100101|assigned|a1
+apnic|JP|ipv4|203.0.113.0|128|20110101|allocated|b1
+apnic|KR|ipv4|203.0.113.64|128|20110101|allocated|b2
+ripencc|DE|ipv4|192.0.2.0|256|20120101|reserved|c1
+ripencc|ZZ|ipv4|192.0.2.0|256|20120101|available|
+ripencc|de|ipv6|2001:db8::|32|20120101|allocated|c2
+ripencc|NL|asn|64496|16|20120101|allocated|c3
+arin|US|asn|64512|1|20100101|assigned|a2
+lacnic|BR|ipv4|not-an-address|256|20130101|allocated|d1
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    source = tmp_path / 'delegated-test-extended-latest'
+    source.write_text(DELEGATIONS)
+    index = RIRIndex(RIRIndex.build([str(source)], str(tmp_path / 'rir-index.bin')))
+    yield index
+    index.close()
+
+
+def test_parse_delegations_skips_summary_reserved_and_malformed_lines():
+    parsed = list(RIRIndex.parse_delegations(DELEGATIONS.splitlines()))
+    assert ('ipv4', 0xC6336400, 0xC63364FF, 'US') in parsed
+    assert ('ipv6', 0x20010DB8 << 96, (0x20010DB9 << 96) - 1, 'DE') in parsed
+    assert ('asn', 64496, 64511, 'NL') in parsed
+    assert all(country not in ('ZZ', 'BR') for _, _, _, country in parsed)
+    assert len(parsed) == 7
+
+
+def test_ipv4_range_edges(index):
+    # Adjacent US blocks merge into 198.51.100.0 - 198.51.101.255
+    assert index.lookup_ip('198.51.99.255') is None
+    assert index.lookup_ip('198.51.100.0') == 'US'
+    assert index.lookup_ip('198.51.101.255') == 'US'
+    assert index.lookup_ip('198.51.102.0') is None
+    # Reserved blocks are not delegations
+    assert index.lookup_ip('192.0.2.1') is None
+
+
+def test_overlapping_ranges_keep_the_earlier_block(index):
+    assert index.lookup_ip('203.0.113.0') == 'JP'
+    assert index.lookup_ip('203.0.113.127') == 'JP'
+    assert index.lookup_ip('203.0.113.128') == 'KR'
+    assert index.lookup_ip('203.0.113.191') == 'KR'
+    assert index.lookup_ip('203.0.113.192') is None
+
+
+def test_ipv6_prefix_edges(index):
+    assert index.lookup_ip('2001:db7:ffff:ffff:ffff:ffff:ffff:ffff') is None
+    assert index.lookup_ip('2001:db8::') == 'DE'
+    assert index.lookup_ip('2001:db8:ffff:ffff:ffff:ffff:ffff:ffff') == 'DE'
+    assert index.lookup_ip('2001:db9::') is None
+
+
+def test_asn_range_edges_and_registration_country(index):
+    assert index.lookup_asn(64495) is None
+    assert index.lookup_asn(64496) == 'NL'
+    assert index.lookup_asn('64511') == 'NL'
+    assert index.lookup_asn(64512) == 'US'
+    assert index.lookup_asn(64513) is None
+    assert index.lookup_asn('AS64496') is None
+    # The ASN's country wins over the IP block's, which is the fallback
+    assert index.registration_country('203.0.113.5', 64496) == 'NL'
+    assert index.registration_country('203.0.113.5', 1) == 'JP'
+    assert index.registration_country('not-an-ip') is None
+
+
+def test_rejects_a_file_that_is_not_an_index(tmp_path):
+    path = tmp_path / 'bogus.bin'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        RIRIndex(str(path))
@@ -0,0 +1,133 @@
+"""Streamed body reads: BodyCollector and early hang-up on both transports"""
+
+import asyncio
+import gzip
+import re
+import socketserver
+import threading
+import time
+
+import pytest
+
+from unlockcheck import BodyCollector, Probe, UnlockChecker
+
+MARKER = re.compile(rb'"region"\s*:\s*"([A-Z]{2})"')
+
+
+def test_marker_split_across_chunks_stops_the_read():
+    collector = BodyCollector(until=MARKER)
+    assert not collector.feed(b'x' * 5000 + b'{"regi')
+    assert collector.feed(b'on": "JP", "more": 1')
+    assert MARKER.search(collector.content).group(1) == b'JP'
+
+
+def test_byte_cap_stops_the_read_and_truncates():
+    collector = BodyCollector(max_bytes=10)
+    assert not collector.feed(b'12345')
+    assert collector.feed(b'67890abc')
+    assert collector.content == b'1234567890'
+
+
+def test_without_marker_or_cap_everything_is_read():
+    collector = BodyCollector()
+    assert not collector.feed(b'a' * 100000)
+    assert len(collector.content) == 100000
+
+
+class StallingHandler(socketserver.BaseRequestHandler):
+    """Sends the marker early in a body announced as 10 MB, then stalls until the client hangs up"""
+
+    def handle(self):
+        data = b''
+        while b'\r\n\r\n' not in data:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return
+            data += chunk
+        self.request.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 10485760\r\nContent-Type: text/html\r\n\r\n'
+                             + b'<html>' + b' ' * 20000 + b'{"region": "JP"}' + b' ' * 1000)
+        self.request.settimeout(3)
+        try:
+            while self.request.recv(4096):
+                pass
+        except OSError:
+            pass
+
+
+class ChunkedGzipHandler(socketserver.BaseRequestHandler):
+    """Sends BODY gzipped in small HTTP/1.1 chunks"""
+
+    BODY = b''.join(b'line %d\n' % i for i in range(5000))
+
+    def handle(self):
+        data = b''
+        while b'\r\n\r\n' not in data:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return
+            data += chunk
+        compressed = gzip.compress(self.BODY)
+        self.request.sendall(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\nContent-Encoding: gzip\r\n'
+                             b'Connection: close\r\n\r\n')
+        for start in range(0, len(compressed), 1000):
+            part = compressed[start:start + 1000]
+            self.request.sendall(b'%x\r\n%s\r\n' % (len(part), part))
+        self.request.sendall(b'0\r\n\r\n')
+
+
+def serve(handler):
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stalling_url():
+    yield from serve(StallingHandler)
+
+
+@pytest.fixture
+def chunked_gzip_url():
+    yield from serve(ChunkedGzipHandler)
+
+
+def send(checker, probe, transport):
+    if transport == 'blocking':
+        return checker._send(probe)
+
+    async def run():
+        try:
+            return await checker._asend(probe)
+        finally:
+            checker.aclient.close()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('transport', ['blocking', 'asyncio'])
+def test_transport_hangs_up_once_the_marker_is_read(stalling_url, transport):
+    checker = UnlockChecker()
+    probe = Probe('GET', stalling_url, until=MARKER, max_bytes=1024 * 1024, timeout=5)
+    started = time.monotonic()
+    try:
+        response = send(checker, probe, transport)
+    finally:
+        checker.close()
+    assert time.monotonic() - started < 2
+    assert response.status_code == 200
+    assert MARKER.search(response.content).group(1) == b'JP'
+    assert len(response.content) < 1024 * 1024
+
+
+@pytest.mark.parametrize('transport', ['blocking', 'asyncio'])
+def test_chunked_gzip_body_is_read_and_decoded_in_full(chunked_gzip_url, transport):
+    checker = UnlockChecker()
+    probe = Probe('GET', chunked_gzip_url, until=re.compile(rb'never'), timeout=5)
+    try:
+        response = send(checker, probe, transport)
+    finally:
+        checker.close()
+    assert response.content == ChunkedGzipHandler.BODY
@@ -6,23 +6,306 @@ One-click detection of streaming media and AI services unlock status for your ne
 """
 
 import requests
+import urllib3
 import json
+import math
+import random
+import re
+import select
 import sys
 import argparse
+import bisect
+import ipaddress
+import mmap
+import struct
 import time
 import socket
+import ssl
+import zlib
+import asyncio
+import base64
+import contextvars
+import gzip
+import os
+import sqlite3
+import functools
+import itertools
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, Tuple, Optional
-from colorama import init, Fore, Style
+from http.cookies import SimpleCookie
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Tuple, Optional, Union
+from urllib.parse import SplitResult, unquote, urlencode, urljoin, urlsplit
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 
-# Initialize colorama
-init(autoreset=True)
+
+class _Palette:
+    """
+    Stand-in for colorama's Fore / Style: the ANSI code on a terminal, '' otherwise
+
+    colorama is only imported the first time a color is used with stdout on a
+    TTY (machine output and pipes never load it), and then just to enable ANSI
+    handling in the Windows console.
+    """
+
+    def __init__(self, **codes: str):
+        self._codes = codes
+
+    def __getattr__(self, name: str) -> str:
+        try:
+            code = self._codes[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return code if _colors_enabled() else ''
+
+
+@functools.lru_cache(maxsize=None)
+def _colors_enabled() -> bool:
+    if not sys.stdout.isatty():
+        return False
+    import colorama
+    colorama.just_fix_windows_console()
+    return True
+
+
+Fore = _Palette(RED='\033[31m', GREEN='\033[32m', YELLOW='\033[33m', BLUE='\033[34m',
+                MAGENTA='\033[35m', CYAN='\033[36m')
+Style = _Palette(BRIGHT='\033[1m', DIM='\033[2m', RESET_ALL='\033[0m')
 
 # Configuration
 VERSION = "1.2"
 TIMEOUT = 10
+MAX_WORKERS = 12       # Upper bound on checks running at the same time
+FLEET_CONCURRENCY = 100     # Proxies scanned at the same time in --proxies mode
+FLEET_PROXY_DEADLINE = 60   # Seconds allowed per proxy (IP lookup + all checks)
+HOST_SPACING = 0.5     # Minimum seconds between two requests to the same host
+ADAPTER_POOLS = 32     # Per-host connection pools kept by the shared HTTPAdapter (service hosts + IP providers)
+PREWARM_IDLE = 20      # Seconds a prewarmed async connection is kept for its first request
+IP_INFO_GRACE = 0.3    # Seconds other IP providers get to fill in fields after the first complete answer
+ASN_CACHE_TTL = 30 * 86400      # ASN -> registration country rarely changes
+IP_INFO_CACHE_TTL = 86400       # IP -> ip_info (type, registration location, ...)
+CACHE_MAX_ENTRIES = 10000       # Rows kept per on-disk cache namespace, LRU first out (--cache-entries)
+CACHE_PURGE_INTERVAL = 256      # Cache writes between two sweeps of expired and over-budget rows
+# Namespaces with another budget than max_entries
+CACHE_NAMESPACE_ENTRIES: Dict[str, int] = {}
+RESULT_TTL_STABLE = 6 * 3600    # Full access / hard block for an unchanged exit IP
+RESULT_TTL_UNSTABLE = 600       # errors, rate limits, outages, partial and "manual check" outcomes
+# "failed" details that are a verdict on the exit IP, not a passing condition of the service
+DEFINITIVE_BLOCKS = ("Region Restricted", "Blocked", "Not Available in This Region", "Coming Soon")
+# Per-service deadline: p95 of the last LATENCY_HISTORY check durations x LATENCY_DEADLINE_FACTOR,
+# kept between the floor and the ceiling (the ceiling alone until LATENCY_MIN_SAMPLES are known)
+LATENCY_HISTORY = 20
+LATENCY_MIN_SAMPLES = 5
+LATENCY_DEADLINE_FACTOR = 2.0
+SERVICE_DEADLINE_FLOOR = 4.0
+SERVICE_DEADLINE_CEILING = 2 * TIMEOUT
+LATENCY_HISTORY_TTL = 30 * 86400
+# Third-party IP intelligence providers (see ProviderHealth)
+PROVIDER_FAILURE_THRESHOLD = 3  # Failed calls in a row that open a provider's circuit
+PROVIDER_COOLDOWN = 300         # Seconds an open circuit skips the provider, doubled on each re-open
+PROVIDER_COOLDOWN_MAX = 3600
+PROVIDER_RETRIES = 1            # Extra attempts after a failed call
+PROVIDER_RETRY_BACKOFF = 0.5    # Seconds before the first retry (doubling), jittered between 50% and 150%
+DAEMON_POLL_INTERVAL = 60       # Seconds between two exit-IP checks in --daemon mode
+DAEMON_LISTEN = "127.0.0.1:9477"  # Metrics endpoint of --daemon mode
+
+MMDB_RECORD_CACHE = 4096        # Decoded MMDB records kept in memory (records are shared by many networks)
+
+# DNS unlock detection: service hosts resolved by the system resolver are compared with these
+DNS_PUBLIC_RESOLVERS = ["1.1.1.1", "8.8.8.8", "9.9.9.9"]
+DNS_TIMEOUT = 1.0               # Seconds per attempt (unanswered queries are sent twice)
+DNS_BUDGET = 2.5                # Seconds DNS unlock detection may take in all (it runs alongside the checks)
+RESOLV_CONF = "/etc/resolv.conf"
+
+# RIR statistics exchange files (delegated-*-extended), source of the offline registration index
+RIR_DELEGATION_URLS = [
+    "https://ftp.arin.net/pub/stats/arin/delegated-arin-extended-latest",
+    "https://ftp.ripe.net/pub/stats/ripencc/delegated-ripencc-extended-latest",
+    "https://ftp.apnic.net/stats/apnic/delegated-apnic-extended-latest",
+    "https://ftp.lacnic.net/pub/stats/lacnic/delegated-lacnic-extended-latest",
+    "https://ftp.afrinic.net/pub/stats/afrinic/delegated-afrinic-extended-latest",
+]
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
+# Supported services: (key used on the command line, display name, check method)
+SERVICES = [
+    ('netflix', 'Netflix', 'check_netflix'),
+    ('disney', 'Disney+', 'check_disney'),
+    ('youtube', 'YouTube Premium', 'check_youtube_premium'),
+    ('chatgpt', 'ChatGPT', 'check_chatgpt'),
+    ('claude', 'Claude', 'check_claude'),
+    ('gemini', 'Gemini', 'check_gemini'),
+    ('scholar', 'Google Scholar', 'check_scholar'),
+    ('tiktok', 'TikTok', 'check_tiktok'),
+    ('imgur', 'Imgur', 'check_imgur'),
+    ('reddit', 'Reddit', 'check_reddit'),
+    ('spotify', 'Spotify', 'check_spotify'),
+]
+SERVICE_KEYS = [key for key, _, _ in SERVICES]
+
+# Countries where a service is officially unavailable: its check settles on the
+# exit IP's geolocation alone, without sending a request (see UnlockChecker.region_gate)
+SANCTIONED_REGIONS = frozenset({'CN', 'HK', 'RU', 'IR', 'KP', 'SY', 'CU', 'BY'})
+REGION_RESTRICTIONS = {
+    # https://platform.openai.com/docs/supported-countries
+    'chatgpt': SANCTIONED_REGIONS | {'VE'},
+    # https://www.anthropic.com/supported-countries
+    'claude': SANCTIONED_REGIONS,
+    # https://ai.google.dev/gemini-api/docs/available-regions
+    'gemini': SANCTIONED_REGIONS | {'MO', 'VE'},
+}
+
+# Hosts each check connects to first: warmed up while the exit IP is looked up (see UnlockChecker.prewarm)
+# and compared across resolvers for DNS unlock detection (see UnlockChecker.adns_unlock)
+SERVICE_HOSTS = {
+    'netflix': ['www.netflix.com'],
+    'disney': ['disney.api.edge.bamgrid.com'],
+    'youtube': ['www.youtube.com'],
+    'chatgpt': ['api.openai.com', 'chatgpt.com'],
+    'claude': ['claude.ai', 'api.anthropic.com'],
+    'gemini': ['generativelanguage.googleapis.com', 'gemini.google.com', 'www.gstatic.com', 'aistudio.google.com'],
+    'scholar': ['scholar.google.com'],
+    'tiktok': ['www.tiktok.com'],
+    'imgur': ['imgur.com'],
+    'reddit': ['www.reddit.com'],
+    'spotify': ['spclient.wg.spotify.com'],
+}
+
+# Exit IP fields written next to the results in JSON output (--format, --proxies, --replay)
+IP_REPORT_FIELDS = ('ip', 'country_code', 'country', 'isp', 'ip_type')
+
+# Address families of a dual-stack run, in report order
+ADDRESS_FAMILIES = [('IPv4', socket.AF_INET), ('IPv6', socket.AF_INET6)]
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+ASN_NUMBER = re.compile(r'AS(\d+)')
+HACKERTARGET_COUNTRY = re.compile(r',\s*([A-Z]{2})"?\s*$')
+IP_API_FIELDS = "status,country,countryCode,region,regionName,city,isp,org,as,hosting,proxy,mobile,query"
+IP_API_BATCH_URL = "http://ip-api.com/batch"
+IP_API_BATCH_SIZE = 100     # IPs per POST /batch (ip-api's maximum)
+IP_API_BATCH_WINDOW = 0.5   # Seconds a fleet lookup waits for others to share its batch call
+
+
+class KeywordSet:
+    """
+    Case-insensitive multi-keyword matcher working on raw response bytes
+
+    Keywords are encoded and case-folded once, at import. A body is folded
+    with a single bytes.lower() (ASCII only, no decoding or charset sniffing)
+    and then searched with CPython's C substring search, which outruns both a
+    regex alternation and a pure-Python automaton on large pages. Keywords in
+    other scripts are matched through their lower/upper/title-case forms.
+    """
+
+    def __init__(self, *keywords: str):
+        self.keywords = frozenset(keywords)
+        needles = set()
+        for keyword in keywords:
+            variants = {keyword} if keyword.isascii() else {
+                keyword, keyword.lower(), keyword.upper(), keyword.capitalize(), keyword.title()
+            }
+            needles.update((variant.encode('utf-8').lower(), keyword) for variant in variants)
+        self._needles = tuple(needles)
+
+    def scan(self, data: bytes) -> frozenset:
+        """Return the keywords occurring in data"""
+        folded = data.lower()
+        return frozenset(keyword for needle, keyword in self._needles if needle in folded)
+
+    def search(self, data: bytes) -> bool:
+        """Return True if any keyword occurs in data"""
+        folded = data.lower()
+        return any(needle in folded for needle, _ in self._needles)
+
+
+# ========================================================================
+# Classifier patterns - compiled once at import, matched against raw bytes
+# Streamed bodies stop at the *_MARKER pattern or at the *_MAX_BYTES cap
+# ========================================================================
+NETFLIX_REGION_MARKER = re.compile(rb'"currentCountry"\s*:\s*"([^"]+)"')
+NETFLIX_MAX_BYTES = 2 * 1024 * 1024
+NETFLIX_ERROR_KEYWORDS = KeywordSet("not available", "страница отсутствует", "page manquante", "not found")
+
+DISNEY_WEB_KEYWORDS = KeywordSet(
+    "not available in your region", "not available in your country", "unavailable",
+    "disney", "disneyplus"
+)
+
+YOUTUBE_KEYWORDS = KeywordSet(
+    "not available in your country", "not available in your region", "unavailable in your",
+    "youtube", "premium", "subscribe"
+)
+
+CHATGPT_CLOUDFLARE_KEYWORDS = KeywordSet(
+    "cloudflare", "attention required", "just a moment", "checking your browser"
+)
+
+CLAUDE_RESTRICTION_KEYWORDS = (
+    "unavailable in your country", "unavailable in your region",
+    "<title>claude - unavailable</title>",
+    "not available", "not supported", "access denied",
+    "應用程式不可用", "僅在特定地區提供服務"
+)
+CLAUDE_CLOUDFLARE_KEYWORDS = ("just a moment", "checking your browser", "cloudflare")
+CLAUDE_PAGE_KEYWORDS = ("claude", "anthropic", "sign in", "log in", "sign up")
+CLAUDE_WEB_KEYWORDS = KeywordSet(*CLAUDE_RESTRICTION_KEYWORDS, *CLAUDE_CLOUDFLARE_KEYWORDS, *CLAUDE_PAGE_KEYWORDS)
+CLAUDE_API_BLOCK_KEYWORDS = KeywordSet("request not allowed", "region", "country", "territory", "forbidden")
+
+TIKTOK_REGION_MARKER = re.compile(rb'"region"\s*:\s*"([^"]+)"')
+TIKTOK_MAX_BYTES = 512 * 1024
+TIKTOK_KEYWORDS = KeywordSet(
+    "access denied", "not available in your region", "not available in your country",
+    "region unavailable", "tiktok"
+)
+
+IMGUR_BLOCK_MARKER = re.compile(rb'(?i)not available|blocked')
+IMGUR_MAX_BYTES = 256 * 1024
+IMGUR_KEYWORDS = KeywordSet(
+    "not available in your region", "not available in your country", "not available", "blocked", "imgur"
+)
+
+REDDIT_BLOCK_MARKER = re.compile(rb'(?i)not available in your (?:region|country)')
+REDDIT_MAX_BYTES = 256 * 1024
+REDDIT_KEYWORDS = KeywordSet(
+    "not available in your region", "not available in your country",
+    "blocked by network security", "blocked by mistake", "blocked", "banned",
+    "reddit", "location_blocking"
+)
+
+GEMINI_WEB_PAGE_KEYWORDS = ("sign in", "get started", "continue with google", "chat with gemini")
+GEMINI_WEB_KEYWORDS = KeywordSet(
+    "access denied", "supported in your country", "not available in your country", *GEMINI_WEB_PAGE_KEYWORDS
+)
+
+SPOTIFY_BLOCK_KEYWORDS = KeywordSet("access denied")
+
+SCHOLAR_KEYWORDS = KeywordSet(
+    "not available in your region", "not available in your country",
+    "unusual traffic", "captcha", "scholar", "google"
+)
+# ========================================================================
+
+logger = logging.getLogger("unlockcheck")
+
+# Set while the async API is running: logs go to `logger` instead of stdout
+_async_api = contextvars.ContextVar('unlockcheck_async_api', default=False)
+# Absolute deadline of the current call on time.monotonic() (the event loop's clock), or None
+_deadline = contextvars.ContextVar('unlockcheck_deadline', default=None)
+# Phase timings of the blocking HTTP call in progress (filled by the urllib3 connection hooks)
+_request_timings = contextvars.ContextVar('unlockcheck_request_timings', default=None)
+# Per-request timing records of the check running in this context, or None
+_timings_sink = contextvars.ContextVar('unlockcheck_timings_sink', default=None)
+
+TIMING_PHASES = ('dns', 'connect', 'tls', 'ttfb')
+
+
+def _add_timing(timings: Optional[Dict], phase: str, seconds: float):
+    """Accumulate a phase duration (redirect hops add up)"""
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
 # ========================================================================
 # 表格布局常量 - 请勿修改！这些值是精心调整过的，确保所有行完美对齐
 # ========================================================================
@@ -44,22 +327,2449 @@ def print_header_separator():
     print(f"{Fore.CYAN}{'=' * SEPARATOR_WIDTH}{Style.RESET_ALL}")
 
 
+class HostPacer:
+    """Per-host request spacing shared by every worker session
+
+    Replaces the old global sleep between checks: requests to different hosts
+    go out immediately, requests to the same host are spaced by `interval`.
+    """
+
+    def __init__(self, interval: float = HOST_SPACING):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def reserve(self, url: str) -> float:
+        """Reserve the next slot for the host of url, returns seconds to wait"""
+        host = urlsplit(url).hostname or ''
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval
+        return slot - now
+
+    def wait(self, url: str):
+        """Block until the host of url may receive another request"""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PacedSession(requests.Session):
+    """requests.Session that waits for its HostPacer before each request"""
+
+    def __init__(self, pacer: Optional[HostPacer] = None):
+        super().__init__()
+        self.pacer = pacer
+
+    def request(self, method, url, *args, **kwargs):
+        if self.pacer is not None:
+            self.pacer.wait(url)
+        return super().request(method, url, *args, **kwargs)
+
+
+def default_cache_dir() -> str:
+    """Per-user cache directory ($XDG_CACHE_HOME/unlockcheck)"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'unlockcheck')
+
+
+class DiskCache:
+    """
+    Persistent JSON key/value cache in SQLite, safe to share between processes
+
+    Entries live in namespaces and expire after their TTL. Each namespace has its
+    own budget (`namespace_entries`, else `max_entries`) beyond which its least
+    recently used entries are evicted, so a fleet scan filling the results
+    cannot push out IP or ASN information. Expired and over-budget rows are swept
+    when the database is opened and every CACHE_PURGE_INTERVAL writes, not on each
+    write; get() never returns an expired entry. The cache is best effort: if the
+    database cannot be opened or written, it turns itself off for the run.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = CACHE_MAX_ENTRIES,
+                 namespace_entries: Optional[Dict[str, int]] = None):
+        self.path = path or os.path.join(default_cache_dir(), 'cache.sqlite3')
+        self.max_entries = max_entries
+        self.namespace_entries = dict(CACHE_NAMESPACE_ENTRIES if namespace_entries is None else namespace_entries)
+        self._lock = threading.Lock()
+        self._db = None
+        self._disabled = False
+        self._writes = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and not self._disabled:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                # A cache can lose its last writes on power loss; no fsync per commit
+                db.execute("PRAGMA synchronous=NORMAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                    " expires REAL NOT NULL, accessed REAL NOT NULL,"
+                    " PRIMARY KEY (namespace, key))"
+                )
+                db.execute("DROP INDEX IF EXISTS entries_accessed")
+                db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed)")
+                db.execute("CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires)")
+                with db:
+                    db.execute("BEGIN IMMEDIATE")
+                    self._purge(db)
+                self._db = db
+            except (OSError, sqlite3.Error) as e:
+                logger.debug(f"Disk cache disabled ({self.path}): {e}")
+                self._disabled = True
+        return self._db
+
+    def _purge(self, db: sqlite3.Connection):
+        """Drop expired rows, then the least recently used rows of namespaces over budget"""
+        db.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+        for (namespace,) in db.execute("SELECT DISTINCT namespace FROM entries").fetchall():
+            db.execute(
+                "DELETE FROM entries WHERE rowid IN ("
+                " SELECT rowid FROM entries WHERE namespace = ? ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (namespace, self.namespace_entries.get(namespace, self.max_entries))
+            )
+
+    def _fail(self, error: Exception):
+        logger.debug(f"Disk cache disabled ({self.path}): {error}")
+        self._disabled = True
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def get(self, namespace: str, key: str):
+        """Return the cached value, or None when missing or expired"""
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return None
+            now = time.time()
+            try:
+                row = db.execute(
+                    "SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires > ?",
+                    (namespace, key, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                db.execute(
+                    "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key)
+                )
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError) as e:
+                self._fail(e)
+                return None
+
+    def set(self, namespace: str, key: str, value, ttl: float):
+        """Store a JSON-serialisable value for `ttl` seconds"""
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return
+            now = time.time()
+            try:
+                with db:
+                    db.execute("BEGIN IMMEDIATE")
+                    db.execute(
+                        "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                        (namespace, key, json.dumps(value), now + ttl, now)
+                    )
+                    self._writes += 1
+                    if self._writes % CACHE_PURGE_INTERVAL == 0:
+                        self._purge(db)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                self._fail(e)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class _SortedRecords:
+    """Read-only sequence view of the record starts of one RIRIndex table, for bisect"""
+
+    def __init__(self, buffer, offset: int, count: int, width: int):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+        self.width = width
+        self.size = 2 * width + 2
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index: int) -> bytes:
+        start = self.offset + index * self.size
+        return self.buffer[start:start + self.width]
+
+    def record(self, index: int) -> Tuple[bytes, bytes, str]:
+        start = self.offset + index * self.size
+        end = start + self.width
+        return (self.buffer[start:end], self.buffer[end:end + self.width],
+                self.buffer[end + self.width:end + self.width + 2].decode('ascii'))
+
+
+class RIRIndex:
+    """
+    Offline registration country lookup from the RIR delegation files
+
+    build() turns the delegated-*-extended files of the five RIRs into one
+    binary file of sorted, non-overlapping ranges (ASNs, IPv4, IPv6), each
+    record being fixed-width big-endian start and end plus the country code.
+    The file is memory-mapped and searched with bisect, so a lookup is
+    O(log n) with no network call and nothing loaded up front.
+    """
+
+    MAGIC = b'UCRIR1\0\0'
+    HEADER = struct.Struct('>8sIII')
+    # (table, address width in bytes)
+    TABLES = (('asn', 4), ('ipv4', 4), ('ipv6', 16))
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *counts = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not an RIR index")
+        self._tables = {}
+        offset = self.HEADER.size
+        for (name, width), count in zip(self.TABLES, counts):
+            self._tables[name] = _SortedRecords(self._map, offset, count, width)
+            offset += count * (2 * width + 2)
+
+    @staticmethod
+    def default_path() -> str:
+        return os.path.join(default_cache_dir(), 'rir-index.bin')
+
+    @classmethod
+    def open_default(cls) -> Optional['RIRIndex']:
+        """Open the index in the cache directory, None if it was never built"""
+        try:
+            return cls(cls.default_path())
+        except (OSError, ValueError):
+            return None
+
+    def _find(self, table: str, key: bytes) -> Optional[str]:
+        records = self._tables[table]
+        index = bisect.bisect_right(records, key) - 1
+        if index < 0:
+            return None
+        _, end, country = records.record(index)
+        return country if key <= end else None
+
+    def lookup_asn(self, asn) -> Optional[str]:
+        """Registration country of an AS number"""
+        try:
+            return self._find('asn', int(asn).to_bytes(4, 'big'))
+        except (ValueError, OverflowError):
+            return None
+
+    def lookup_ip(self, ip: str) -> Optional[str]:
+        """Registration country of the block an IP address was delegated from"""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        return self._find('ipv4' if address.version == 4 else 'ipv6', address.packed)
+
+    def registration_country(self, ip: Optional[str] = None, asn=None) -> Optional[str]:
+        """Country of the ASN's registration, falling back to the IP block's"""
+        return (asn is not None and self.lookup_asn(asn)) or (ip and self.lookup_ip(ip)) or None
+
+    def close(self):
+        self._map.close()
+
+    @staticmethod
+    def parse_delegations(lines: Iterable[str]) -> Iterable[Tuple[str, int, int, str]]:
+        """Yield (table, first, last, country) from delegated-*-extended lines"""
+        for line in lines:
+            if line.startswith('#'):
+                continue
+            fields = line.strip().split('|')
+            # registry|cc|type|start|value|date|status[|opaque-id|...]
+            if len(fields) < 7 or fields[1] in ('', '*', 'ZZ'):
+                continue
+            if fields[6] not in ('allocated', 'assigned'):
+                continue
+            kind, start, value = fields[2], fields[3], fields[4]
+            try:
+                if kind == 'asn':
+                    first = int(start)
+                    yield 'asn', first, first + int(value) - 1, fields[1].upper()
+                elif kind == 'ipv4':
+                    first = int(ipaddress.IPv4Address(start))
+                    yield 'ipv4', first, first + int(value) - 1, fields[1].upper()
+                elif kind == 'ipv6':
+                    network = ipaddress.IPv6Network(f"{start}/{value}", strict=False)
+                    yield 'ipv6', int(network.network_address), int(network.broadcast_address), fields[1].upper()
+            except ValueError:
+                continue
+
+    @classmethod
+    def build(cls, sources: Optional[Iterable[str]] = None, path: Optional[str] = None) -> str:
+        """
+        Build the index from delegation files (local paths or URLs, the five RIRs by default)
+        Returns: path of the written index
+        """
+        path = path or cls.default_path()
+        ranges = {name: [] for name, _ in cls.TABLES}
+        for source in sources or RIR_DELEGATION_URLS:
+            if '://' in source:
+                response = requests.get(source, timeout=60, headers={'User-Agent': USER_AGENT})
+                response.raise_for_status()
+                lines = response.text.splitlines()
+            else:
+                with open(source, encoding='utf-8', errors='replace') as f:
+                    lines = f.readlines()
+            for table, first, last, country in cls.parse_delegations(lines):
+                ranges[table].append((first, last, country))
+
+        tables = []
+        for name, width in cls.TABLES:
+            merged = []
+            for first, last, country in sorted(ranges[name]):
+                if merged and first <= merged[-1][1] + 1:
+                    # Adjacent blocks of one country collapse; overlaps keep the earlier block
+                    if merged[-1][2] == country:
+                        merged[-1][1] = max(merged[-1][1], last)
+                        continue
+                    first = merged[-1][1] + 1
+                    if first > last:
+                        continue
+                merged.append([first, last, country])
+            tables.append(b''.join(
+                first.to_bytes(width, 'big') + last.to_bytes(width, 'big') + country.encode('ascii')[:2]
+                for first, last, country in merged
+            ))
+            ranges[name] = merged
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, *(len(ranges[name]) for name, _ in cls.TABLES)))
+            for table in tables:
+                f.write(table)
+        os.replace(temporary, path)
+        return path
+
+
+class MMDBReader:
+    """
+    Pure-Python reader for MaxMind DB (.mmdb) files, e.g. GeoLite2-Country/City/ASN
+
+    The file is memory-mapped; lookups walk the binary search tree one bit of
+    the address at a time and decode the data record it points to. Records are
+    shared by many networks, so decoded records are kept in a small LRU cache.
+    """
+
+    METADATA_MARKER = b'\xab\xcd\xefMaxMind.com'
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        marker = self._map.rfind(self.METADATA_MARKER, max(0, len(self._map) - 128 * 1024))
+        if marker < 0:
+            self._map.close()
+            raise ValueError(f"{path} is not a MaxMind DB file")
+        self.metadata, _ = self._decode(marker + len(self.METADATA_MARKER), marker + len(self.METADATA_MARKER))
+        self.node_count = self.metadata['node_count']
+        self.record_size = self.metadata['record_size']
+        if self.record_size not in (24, 28, 32):
+            self._map.close()
+            raise ValueError(f"{path}: unsupported record size {self.record_size}")
+        self.ip_version = self.metadata['ip_version']
+        self._node_bytes = self.record_size // 4
+        self._data_start = self.node_count * self._node_bytes + 16
+        self._record = functools.lru_cache(maxsize=MMDB_RECORD_CACHE)(self._decode_record)
+
+        # IPv4 addresses live under ::/96 in IPv6 databases
+        self._ipv4_start = 0
+        if self.ip_version == 6:
+            node = 0
+            for _ in range(96):
+                if node >= self.node_count:
+                    break
+                node = self._read_node(node, 0)
+            self._ipv4_start = node
+
+    def _read_node(self, node: int, bit: int) -> int:
+        offset = node * self._node_bytes
+        buf = self._map
+        if self.record_size == 24:
+            offset += 3 * bit
+            return int.from_bytes(buf[offset:offset + 3], 'big')
+        if self.record_size == 28:
+            if bit:
+                return ((buf[offset + 3] & 0x0F) << 24) | int.from_bytes(buf[offset + 4:offset + 7], 'big')
+            return ((buf[offset + 3] & 0xF0) << 20) | int.from_bytes(buf[offset:offset + 3], 'big')
+        offset += 4 * bit
+        return int.from_bytes(buf[offset:offset + 4], 'big')
+
+    def _decode(self, offset: int, base: int):
+        """Decode the value at absolute `offset`; pointers are relative to `base`"""
+        buf = self._map
+        control = buf[offset]
+        offset += 1
+        kind = control >> 5
+
+        if kind == 1:  # pointer
+            size = (control >> 3) & 0x3
+            value = control & 0x7
+            if size == 3:
+                pointer = int.from_bytes(buf[offset:offset + 4], 'big')
+            else:
+                pointer = (value << (8 * (size + 1))) | int.from_bytes(buf[offset:offset + size + 1], 'big')
+                pointer += (0, 2048, 526336)[size]
+            return self._decode(base + pointer, base)[0], offset + size + 1
+
+        if kind == 0:  # extended type
+            kind = 7 + buf[offset]
+            offset += 1
+
+        size = control & 0x1f
+        if size >= 29:
+            extra = size - 28
+            size = (29, 285, 65821)[extra - 1] + int.from_bytes(buf[offset:offset + extra], 'big')
+            offset += extra
+
+        if kind == 7:  # map
+            result = {}
+            for _ in range(size):
+                key, offset = self._decode(offset, base)
+                result[key], offset = self._decode(offset, base)
+            return result, offset
+        if kind == 11:  # array
+            result = []
+            for _ in range(size):
+                value, offset = self._decode(offset, base)
+                result.append(value)
+            return result, offset
+        if kind == 14:  # boolean, stored in the size
+            return size != 0, offset
+
+        payload = buf[offset:offset + size]
+        offset += size
+        if kind == 2:
+            return payload.decode('utf-8'), offset
+        if kind in (5, 6, 9, 10):
+            return int.from_bytes(payload, 'big'), offset
+        if kind == 8:
+            return int.from_bytes(payload, 'big', signed=size == 4), offset
+        if kind == 3:
+            return struct.unpack('>d', payload)[0], offset
+        if kind == 15:
+            return struct.unpack('>f', payload)[0], offset
+        if kind == 4:
+            return bytes(payload), offset
+        raise ValueError(f"{self.path}: unknown data type {kind}")
+
+    def _decode_record(self, pointer: int):
+        offset = self._data_start + pointer - self.node_count - 16
+        return self._decode(offset, self._data_start)[0]
+
+    def lookup(self, ip: str) -> Optional[Dict]:
+        """Raw record of the network containing ip, None if it is not in the database"""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and self.ip_version == 4:
+            return None
+
+        packed = address.packed
+        node = self._ipv4_start if address.version == 4 else 0
+        for index in range(len(packed) * 8):
+            if node >= self.node_count:
+                break
+            node = self._read_node(node, (packed[index >> 3] >> (7 - (index & 7))) & 1)
+        if node <= self.node_count:
+            return None
+        return self._record(node)
+
+    def ip_info(self, ip: str) -> Dict:
+        """Map the record of ip onto ip_info keys (only the keys the database knows)"""
+        record = self.lookup(ip)
+        if not isinstance(record, dict):
+            return {}
+
+        def name(entry):
+            return (entry or {}).get('names', {}).get('en', '')
+
+        info = {}
+        country = record.get('country') or {}
+        if country.get('iso_code'):
+            info['country_code'] = info['usage_country_code'] = country['iso_code']
+            info['country'] = info['usage_location'] = name(country) or country['iso_code']
+        registered = record.get('registered_country') or {}
+        if registered.get('iso_code'):
+            info['registration_country_code'] = registered['iso_code']
+            info['registration_location'] = name(registered) or registered['iso_code']
+        if record.get('subdivisions'):
+            info['region'] = name(record['subdivisions'][0])
+        if record.get('city'):
+            info['city'] = name(record['city'])
+        if (record.get('location') or {}).get('time_zone'):
+            info['timezone'] = record['location']['time_zone']
+        if record.get('autonomous_system_number'):
+            organization = record.get('autonomous_system_organization', '')
+            info['asn'] = f"AS{record['autonomous_system_number']}"
+            info['as_info'] = f"{info['asn']} {organization}".strip()
+            info['isp'] = organization or info['asn']
+        return info
+
+    def close(self):
+        self._record.cache_clear()
+        self._map.close()
+
+
+class DNSStub:
+    """
+    Stub resolver on plain UDP sockets, for comparing what different resolvers answer
+
+    resolve() sends every (name, type) query to every server at once from one
+    event loop - one socket per server, answers matched on transaction ID and
+    question - so any number of names takes one round trip (plus one retry for
+    lost datagrams). Only the answer section is read: A/AAAA addresses and TXT
+    strings of any owner name, so CNAME chains come out flattened.
+    """
+
+    TYPES = {'A': 1, 'AAAA': 28, 'TXT': 16}
+
+    def __init__(self, timeout: Optional[float] = None, attempts: int = 2):
+        self.timeout = DNS_TIMEOUT if timeout is None else timeout
+        self.attempts = attempts
+        self._random = random.SystemRandom()
+
+    @staticmethod
+    def system_nameservers(path: Optional[str] = None) -> List[str]:
+        """Nameservers of the system resolver configuration (RESOLV_CONF; empty if unreadable)"""
+        servers = []
+        try:
+            with open(path or RESOLV_CONF, encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 2 and fields[0] == 'nameserver':
+                        try:
+                            servers.append(str(ipaddress.ip_address(fields[1].split('%')[0])))
+                        except ValueError:
+                            continue
+        except OSError:
+            pass
+        return servers
+
+    def build_query(self, txid: int, name: str, qtype: str) -> bytes:
+        question = b''.join(
+            bytes([len(label)]) + label for label in name.rstrip('.').encode('idna').split(b'.')
+        ) + b'\0'
+        # Header: ID, flags (RD), QDCOUNT=1
+        return struct.pack('>HHHHHH', txid, 0x0100, 1, 0, 0, 0) + question + struct.pack('>HH', self.TYPES[qtype], 1)
+
+    @staticmethod
+    def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+        """Decode a (possibly compressed) name; returns it and the offset after it"""
+        labels = []
+        end = None
+        for _ in range(128):  # Bounds compression pointer loops
+            length = data[offset]
+            if length & 0xC0 == 0xC0:
+                if end is None:
+                    end = offset + 2
+                offset = ((length & 0x3F) << 8) | data[offset + 1]
+                continue
+            if length == 0:
+                return '.'.join(labels), end if end is not None else offset + 1
+            labels.append(data[offset + 1:offset + 1 + length].decode('ascii', 'replace'))
+            offset += 1 + length
+        raise ValueError("DNS name compression loop")
+
+    @classmethod
+    def parse_response(cls, data: bytes) -> Tuple[int, str, int, List[str]]:
+        """
+        Returns: (transaction ID, question name, question type, answers) - answers are
+        address strings for A/AAAA and joined strings for TXT
+        """
+        txid, flags, qdcount, ancount = struct.unpack_from('>HHHH', data)
+        offset = 12
+        qname, qtype = '', 0
+        for index in range(qdcount):
+            name, offset = cls._read_name(data, offset)
+            if index == 0:
+                qname, qtype = name.lower(), struct.unpack_from('>H', data, offset)[0]
+            offset += 4
+        answers = []
+        if flags & 0x000F:  # RCODE: NXDOMAIN, SERVFAIL, ...
+            return txid, qname, qtype, answers
+        for _ in range(ancount):
+            _, offset = cls._read_name(data, offset)
+            rtype, _, _, length = struct.unpack_from('>HHIH', data, offset)
+            offset += 10
+            rdata = data[offset:offset + length]
+            offset += length
+            if rtype == 1 and length == 4:
+                answers.append(str(ipaddress.IPv4Address(rdata)))
+            elif rtype == 28 and length == 16:
+                answers.append(str(ipaddress.IPv6Address(rdata)))
+            elif rtype == 16:
+                strings, position = [], 0
+                while position < len(rdata):
+                    size = rdata[position]
+                    strings.append(rdata[position + 1:position + 1 + size].decode('utf-8', 'replace'))
+                    position += 1 + size
+                answers.append(''.join(strings))
+        return txid, qname, qtype, answers
+
+    async def resolve(self, queries: Iterable[Tuple[str, str]], servers: Iterable[str],
+                      first: bool = False) -> Dict[str, Dict[Tuple[str, str], List[str]]]:
+        """
+        Send every (name, type) query to every server concurrently
+        first: stop at the first server that answered every query (the others are left out)
+        Returns: {server: {(name, type): answers}}; unanswered queries are left out
+        and unreachable servers map to {}
+        """
+        queries = list(dict.fromkeys((name.lower().rstrip('.'), qtype) for name, qtype in queries))
+        servers = list(dict.fromkeys(servers))
+
+        async def ask(server):
+            return server, await self._ask(server, queries)
+
+        tasks = [asyncio.ensure_future(ask(server)) for server in servers]
+        results = {}
+        try:
+            for task in asyncio.as_completed(tasks):
+                server, answers = await task
+                results[server] = answers
+                if first and len(answers) == len(queries):
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        return results
+
+    async def _ask(self, server: str, queries: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[str]]:
+        loop = asyncio.get_running_loop()
+        stub = self
+        pending = {}  # txid -> (name, type)
+        answers = {}
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                try:
+                    txid, qname, qtype, records = stub.parse_response(data)
+                except (ValueError, IndexError, struct.error):
+                    return
+                query = pending.get(txid)
+                if query is not None and query == (qname, next(
+                        (name for name, code in stub.TYPES.items() if code == qtype), None)):
+                    answers[query] = records
+                    del pending[txid]
+                    if not pending:
+                        done.set()
+
+            def error_received(self, exc):
+                # ICMP port/host unreachable: no point waiting for this server
+                logger.debug(f"DNS server {server}: {exc}")
+                done.set()
+
+        done = asyncio.Event()
+        try:
+            transport, _ = await loop.create_datagram_endpoint(Protocol, remote_addr=(server, 53))
+        except OSError as e:
+            logger.debug(f"DNS server {server} unreachable: {e}")
+            return {}
+        try:
+            for txid, query in zip(self._random.sample(range(1, 65536), len(queries)), queries):
+                pending[txid] = query
+            for _ in range(self.attempts):
+                for txid, (name, qtype) in list(pending.items()):
+                    transport.sendto(self.build_query(txid, name, qtype))
+                try:
+                    await asyncio.wait_for(done.wait(), self.timeout)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+        finally:
+            transport.close()
+        return answers
+
+
+class _TimedDial:
+    """
+    urllib3 connection hooks recording DNS, connect and time to first byte
+
+    Names are resolved here, timed, and each address is then dialled by
+    urllib3 itself (an IP literal needs no second lookup), so errors and
+    timeouts stay exactly urllib3's. Phases go to _request_timings.
+    """
+
+    def _new_conn(self):
+        timings = _request_timings.get()
+        host = self._dns_host
+        family = 0
+        if self.source_address:
+            family = socket.AF_INET6 if ':' in self.source_address[0] else socket.AF_INET
+        started = time.perf_counter()
+        try:
+            addresses = list(dict.fromkeys(
+                info[4][0] for info in socket.getaddrinfo(host, self.port, family, socket.SOCK_STREAM)
+            ))
+        except OSError:
+            # Let urllib3 resolve again and raise its usual error
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        _add_timing(timings, 'dns', resolved - started)
+
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except urllib3.exceptions.ConnectTimeoutError:
+                    if index == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+            self._dial_seconds = time.perf_counter() - started
+            _add_timing(timings, 'connect', time.perf_counter() - resolved)
+        return sock
+
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        self._request_sent = time.perf_counter()
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        sent = getattr(self, '_request_sent', None)
+        if sent is not None:
+            _add_timing(_request_timings.get(), 'ttfb', time.perf_counter() - sent)
+        return response
+
+
+class _TimedHTTPConnection(_TimedDial, urllib3.connection.HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedDial, urllib3.connection.HTTPSConnection):
+    def connect(self):
+        self._dial_seconds = 0.0
+        started = time.perf_counter()
+        super().connect()
+        # Whatever connect() spent beyond dialling is the TLS handshake (and proxy CONNECT)
+        _add_timing(_request_timings.get(), 'tls', max(0.0, time.perf_counter() - started - self._dial_seconds))
+
+
+class _TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections report DNS/connect/TLS/TTFB timings (see _TimedDial)"""
+
+    POOL_CLASSES = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith('socks'):
+            manager.pool_classes_by_scheme = self.POOL_CLASSES
+        return manager
+
+
+class FamilyAdapter(TimedAdapter):
+    """TimedAdapter whose connections are pinned to one address family
+
+    Connections bind the wildcard address of the family, so urllib3 skips
+    resolver results of the other family instead of falling back to them.
+    """
+
+    def __init__(self, family: int, **kwargs):
+        self.source_address = ('::', 0) if family == socket.AF_INET6 else ('0.0.0.0', 0)
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs['source_address'] = self.source_address
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs['source_address'] = self.source_address
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+class Probe:
+    """
+    A single HTTP request issued by a check flow
+
+    Check flows are generators: they `yield Probe(...)` and receive a
+    ProbeResponse back (or the transport exception raised at the yield),
+    so the same flow runs on the blocking and the asyncio transport.
+    Yielding a list of probes sends them concurrently and returns a list in
+    the same order, with failed probes as their exception instance.
+    `classify` maps a response to an outcome, see Race.
+    `until` (compiled bytes pattern) and `max_bytes` make the transport read
+    the body incrementally and hang up once the marker is seen or the cap is
+    reached; the response then only holds the bytes read so far.
+    Other keyword arguments follow requests.Session.request().
+    """
+
+    __slots__ = ('method', 'url', 'classify', 'until', 'max_bytes', 'kwargs')
+
+    def __init__(self, method: str, url: str, classify=None, until=None, max_bytes=None, **kwargs):
+        self.method = method
+        self.url = url
+        self.classify = classify
+        self.until = until
+        self.max_bytes = max_bytes
+        self.kwargs = kwargs
+
+    @property
+    def limited(self) -> bool:
+        """Whether the body may be cut short"""
+        return self.until is not None or self.max_bytes is not None
+
+    def __repr__(self):
+        return f"Probe({self.method} {self.url})"
+
+
+class Race(list):
+    """
+    Probes sent concurrently where one decisive outcome settles the check
+
+    Yielding a Race returns the list of outcomes, i.e. each probe's
+    `classify(response)` (None when the probe failed or classify raised).
+    As soon as one outcome is in `decisive` (or satisfies it, when decisive
+    is a callable), the remaining probes get `grace` more seconds, then are
+    cancelled, their connections closed and their outcomes left as None.
+    Probes whose index is in `keep` are not cut short: their outcome is needed
+    whatever wins. An outcome satisfying `final` ends the race at once, kept
+    probes included.
+    """
+
+    def __init__(self, probes: Iterable[Probe], decisive, grace: float = 0.0, final=None,
+                 keep: Iterable[int] = ()):
+        super().__init__(probes)
+        self.decisive = decisive
+        self.grace = grace
+        self.final = final
+        self.keep = frozenset(keep)
+        # What each probe came back with: response, exception, or None if it never finished
+        self.results = [None] * len(self)
+
+    def is_decisive(self, outcome) -> bool:
+        if callable(self.decisive):
+            return outcome is not None and bool(self.decisive(outcome))
+        return outcome in self.decisive
+
+    def is_final(self, outcome) -> bool:
+        return self.final is not None and outcome is not None and bool(self.final(outcome))
+
+    @staticmethod
+    def outcome(probe: Probe, result):
+        """Classify a probe result (response or exception)"""
+        if isinstance(result, BaseException) or probe.classify is None:
+            return None
+        try:
+            return probe.classify(result)
+        except Exception:
+            return None
+
+    def settle(self, index: int, result):
+        """Keep a finished probe's result and return its outcome; called by the transports"""
+        self.results[index] = result
+        return self.outcome(self[index], result)
+
+
+class Pause(float):
+    """Seconds a flow waits before its next probe (a retry backoff); yielding one returns None"""
+
+
+class BodyCollector:
+    """Accumulates a streamed body until a marker shows up or a byte cap is hit"""
+
+    OVERLAP = 1024  # Re-scanned tail, so markers split across chunks are still found
+
+    def __init__(self, until=None, max_bytes: Optional[int] = None):
+        self.until = until
+        self.max_bytes = max_bytes
+        self._buffer = bytearray()
+        self._scanned = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        """Add a chunk, returns True once no more data is needed"""
+        self._buffer += chunk
+        if self.until is not None:
+            if self.until.search(self._buffer, max(0, self._scanned - self.OVERLAP)):
+                return True
+            self._scanned = len(self._buffer)
+        return self.max_bytes is not None and len(self._buffer) >= self.max_bytes
+
+    @property
+    def content(self) -> bytes:
+        if self.max_bytes is not None:
+            return bytes(self._buffer[:self.max_bytes])
+        return bytes(self._buffer)
+
+
+class ProbeCancelled(Exception):
+    """Raised inside a transport when the probe lost a Race"""
+
+
+class ProbeResponse:
+    """Transport-independent response handed back to check flows
+
+    Exposes the part of requests.Response the checks use: status_code, url,
+    headers, content, text and json(). Text is decoded with the declared
+    charset (UTF-8 otherwise), without charset sniffing.
+    """
+
+    def __init__(self, status_code: int, url: str, headers, content: bytes):
+        self.status_code = status_code
+        self.url = url
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self._text = None
+
+    @classmethod
+    def from_requests(cls, response: requests.Response) -> 'ProbeResponse':
+        """Build from a (fully read) requests.Response"""
+        return cls(response.status_code, response.url, response.headers, response.content)
+
+    @property
+    def encoding(self) -> str:
+        content_type = self.headers.get('content-type', '')
+        for param in content_type.split(';')[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                return value.strip('"\' ')
+        return 'utf-8'
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            try:
+                self._text = self.content.decode(self.encoding, errors='replace')
+            except LookupError:
+                self._text = self.content.decode('utf-8', errors='replace')
+        return self._text
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class TrafficRecorder:
+    """
+    --record: capture every probe exchange of one checker
+
+    Each exchange keeps the request (method, URL), the response (status, final
+    URL, headers, body as read) or the transport error, and its duration. The
+    session is written to DIR/<time>-<pid>-<n>.json.gz by save(), which the
+    checker calls on close(); one checker (one exit IP / proxy / family) is one session.
+    Exchanges are held in memory until then, hence no --record for the daemon.
+    """
+
+    _sequence = itertools.count(1)
+
+    def __init__(self, directory: str, proxy: Optional[str] = None, family: int = 0):
+        self.directory = directory
+        self.path = os.path.join(
+            directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._sequence)}.json.gz"
+        )
+        self.meta = {
+            'version': 1,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'proxy': redact_proxy(proxy) if proxy else None,
+            'family': {socket.AF_INET: 'IPv4', socket.AF_INET6: 'IPv6'}.get(family),
+        }
+        self._lock = threading.Lock()
+        self.exchanges = []
+
+    def add(self, probe: Probe, response: Optional[ProbeResponse], error: Optional[BaseException],
+            elapsed: float):
+        exchange = {'method': probe.method, 'url': probe.url, 'elapsed': round(elapsed, 4)}
+        if response is not None:
+            exchange.update({
+                'status': response.status_code,
+                'final_url': response.url,
+                'headers': list(response.headers.items()),
+                'body': base64.b64encode(response.content).decode('ascii'),
+            })
+        else:
+            # Lost races and deadline cancellations are replayed as a lost race
+            cancelled = isinstance(error, (ProbeCancelled, asyncio.CancelledError))
+            exchange['error'] = 'ProbeCancelled' if cancelled else type(error).__name__
+            exchange['message'] = str(error)
+        with self._lock:
+            self.exchanges.append(exchange)
+
+    def save(self) -> Optional[str]:
+        """Write the session (again, if more exchanges came in); returns its path"""
+        with self._lock:
+            if not self.exchanges:
+                return None
+            session = {**self.meta, 'exchanges': list(self.exchanges)}
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with gzip.open(temporary, 'wt', encoding='utf-8') as f:
+            json.dump(session, f, ensure_ascii=False)
+        os.replace(temporary, self.path)
+        return self.path
+
+
+class TrafficReplay:
+    """
+    --replay: answer probes from a session written by TrafficRecorder
+
+    Exchanges are matched on method and URL, in recorded order (the last one
+    repeats once a URL's exchanges are used up); recorded errors are raised
+    again. Nothing touches the network, and unless `timing` is set nothing
+    waits either, so a session replays at memory speed. A probe that was not
+    recorded fails like a refused connection.
+    """
+
+    ERRORS = {cls.__name__: cls for cls in (
+        requests.exceptions.ConnectionError, requests.exceptions.ProxyError, requests.exceptions.SSLError,
+        requests.exceptions.Timeout, requests.exceptions.ConnectTimeout, requests.exceptions.ReadTimeout,
+        requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError,
+        requests.exceptions.TooManyRedirects, ProbeCancelled,
+    )}
+
+    def __init__(self, path: str, timing: bool = False):
+        """timing: wait each exchange's recorded duration, reproducing slow and flaky runs"""
+        self.path = path
+        self.timing = timing
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            session = json.load(f)
+        self.meta = {key: value for key, value in session.items() if key != 'exchanges'}
+        self._queues = {}
+        for exchange in session['exchanges']:
+            self._queues.setdefault((exchange['method'], exchange['url']), []).append(exchange)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sessions(path: str) -> List[str]:
+        """Session files at path: the file itself, or every *.json.gz in a directory"""
+        if not os.path.isdir(path):
+            return [path]
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json.gz')
+        )
+
+    def _take(self, probe: Probe) -> Dict:
+        with self._lock:
+            queue = self._queues.get((probe.method, probe.url))
+            if not queue:
+                raise requests.exceptions.ConnectionError(f"{probe.method} {probe.url}: not in {self.path}")
+            return queue.pop(0) if len(queue) > 1 else queue[0]
+
+    def _answer(self, exchange: Dict) -> ProbeResponse:
+        if 'error' in exchange:
+            raise self.ERRORS.get(exchange['error'], requests.exceptions.ConnectionError)(exchange['message'])
+        return ProbeResponse(
+            exchange['status'], exchange['final_url'], exchange['headers'], base64.b64decode(exchange['body'])
+        )
+
+    def send(self, probe: Probe) -> ProbeResponse:
+        exchange = self._take(probe)
+        if self.timing:
+            # A blocking wait cannot be cancelled: stop at the call's deadline like a real read would
+            remaining = _remaining_timeout(None)
+            if remaining is not None and remaining < exchange['elapsed']:
+                time.sleep(max(0.0, remaining))
+                raise requests.exceptions.Timeout(f"Deadline exceeded waiting for {probe.url}")
+            time.sleep(exchange['elapsed'])
+        return self._answer(exchange)
+
+    async def asend(self, probe: Probe) -> ProbeResponse:
+        exchange = self._take(probe)
+        if self.timing:
+            await asyncio.sleep(exchange['elapsed'])
+        return self._answer(exchange)
+
+
+def probe_flow(func):
+    """
+    Turn a generator-based check flow into a blocking method
+
+    The decorated method runs the flow with the requests transport and returns
+    its result; the undecorated generator stays reachable as `.flow` so the
+    asyncio transport can drive the very same logic.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return self._drive(func(self, *args, **kwargs))
+
+    wrapper.flow = func
+    return wrapper
+
+
+def _remaining_timeout(timeout: Optional[float]) -> Optional[float]:
+    """Clamp a per-request timeout to the deadline of the current call"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if timeout is None:
+        return remaining
+    return min(timeout, remaining)
+
+
+class _BodyDecoder:
+    """Incremental gzip/deflate decoder, passing data through if decoding fails"""
+
+    def __init__(self, encoding: str):
+        encoding = encoding.strip().lower()
+        if encoding in ('gzip', 'x-gzip'):
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self._zlib = zlib.decompressobj()
+        else:
+            self._zlib = None
+        self._started = False
+
+    def feed(self, data: bytes) -> bytes:
+        if self._zlib is None:
+            return data
+        try:
+            decoded = self._zlib.decompress(data)
+        except zlib.error:
+            if self._started:
+                raise ValueError("corrupt compressed body")
+            # Some servers send raw deflate, others mislabel plain bodies
+            self._zlib = zlib.decompressobj(-zlib.MAX_WBITS)
+            try:
+                decoded = self._zlib.decompress(data)
+            except zlib.error:
+                self._zlib = None
+                return data
+        self._started = True
+        return decoded
+
+    def flush(self) -> bytes:
+        return self._zlib.flush() if self._zlib is not None else b''
+
+
+_json_dumps = json.dumps  # AsyncHTTPClient.request() shadows `json` like requests does
+
+
+class AsyncHTTPClient:
+    """
+    Minimal asyncio HTTP/1.1 client behind the async API
+
+    One connection per request (Connection: close), chunked transfer encoding,
+    gzip/deflate bodies, redirects and a small per-client cookie jar. prewarm()
+    opens a connection ahead of time for the first request to a host. Failures
+    raise the same requests.exceptions types as the blocking session, so check
+    flows handle both transports identically.
+
+    proxy: optional http://, socks4://, socks4a://, socks5:// or socks5h:// URL
+    (credentials in the URL are supported); socks5h and socks4a resolve
+    hostnames on the proxy. Without one, HTTP_PROXY / HTTPS_PROXY / ALL_PROXY
+    and NO_PROXY apply as they do for requests, unless trust_env is False.
+    family: socket.AF_INET / AF_INET6 to pin connections (to the proxy, if any), 0 for any
+    """
+
+    MAX_REDIRECTS = 10
+    PROXY_SCHEMES = ('http', 'socks4', 'socks4a', 'socks5', 'socks5h')
+
+    def __init__(self, headers: Optional[Dict] = None, pacer: Optional[HostPacer] = None,
+                 proxy: Optional[str] = None, family: int = 0, trust_env: bool = True):
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.pacer = pacer
+        self.family = family
+        self.proxy = urlsplit(proxy) if proxy else None
+        if self.proxy is not None and self.proxy.scheme not in self.PROXY_SCHEMES:
+            raise ValueError(f"Unsupported proxy scheme: {self.proxy.scheme}")
+        # Environment proxies are read once; usually there are none and nothing is left to do per request
+        self._environ_proxies = requests.utils.getproxies() if trust_env and self.proxy is None else {}
+        self._env_proxies = {}  # (scheme, host) -> proxy from the environment, or None
+        self.cookies = {}  # (domain, name) -> value
+        self._ssl_context = None
+        self._warm = {}  # (host, port) -> task opening a TLS connection, see prewarm()
+
+    def _proxy_for(self, scheme: str, host: str) -> Optional[SplitResult]:
+        """Proxy for requests to scheme://host: the client's own, else the environment's"""
+        if self.proxy is not None or not self._environ_proxies:
+            return self.proxy
+        key = (scheme, host)
+        if key not in self._env_proxies:
+            url = f"{scheme}://{host}/"
+            proxy = requests.utils.select_proxy(url, requests.utils.get_environ_proxies(url))
+            parsed = urlsplit(proxy if '://' in proxy else f"http://{proxy}") if proxy else None
+            if parsed is not None and parsed.scheme not in self.PROXY_SCHEMES:
+                logger.warning(f"Unsupported {parsed.scheme}:// proxy in the environment, "
+                               f"connecting to {host} directly")
+                parsed = None
+            self._env_proxies[key] = parsed
+        return self._env_proxies[key]
+
+    def _ssl(self) -> ssl.SSLContext:
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context(cafile=requests.certs.where())
+        return self._ssl_context
+
+    async def request(self, method: str, url: str, headers=None, data=None, json=None,
+                      timeout=TIMEOUT, allow_redirects=True, until=None, max_bytes=None,
+                      timings: Optional[Dict] = None, **kwargs) -> ProbeResponse:
+        """
+        Send a request; the timeout covers the whole exchange including redirects
+        until/max_bytes stop reading the final body early, see Probe
+        timings: dict receiving dns/connect/tls/ttfb seconds and body bytes as each phase
+                 completes (summed over redirects), so it is informative even on timeout
+        """
+        request_headers = CaseInsensitiveDict(self.headers)
+        request_headers.update(headers or {})
+        body = None
+        if json is not None:
+            body = _json_dumps(json).encode('utf-8')
+            request_headers.setdefault('Content-Type', 'application/json')
+        elif isinstance(data, dict):
+            body = urlencode(data).encode('utf-8')
+            request_headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+        elif data is not None:
+            body = data.encode('utf-8') if isinstance(data, str) else data
+
+        if self.pacer is not None:
+            delay = self.pacer.reserve(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        timeout = _remaining_timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            raise requests.exceptions.Timeout(f"Deadline exceeded before {method} {url}")
+        try:
+            return await asyncio.wait_for(
+                self._request(method, url, request_headers, body, allow_redirects,
+                              BodyCollector(until, max_bytes), {} if timings is None else timings),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            raise requests.exceptions.Timeout(f"{method} {url} timed out") from None
+
+    def prewarm(self, hosts: Iterable[str]):
+        """
+        Start opening a TLS connection to port 443 of each host (through the proxy, if any)
+        The first request to the host takes it over instead of dialling; must be
+        called with the event loop running
+        """
+        loop = asyncio.get_running_loop()
+        for host in hosts:
+            key = (host.lower(), 443)
+            if key not in self._warm:
+                self._warm[key] = (loop.time(), asyncio.ensure_future(self._warm_up(*key)))
+
+    async def _warm_up(self, host: str, port: int):
+        try:
+            return await asyncio.wait_for(self._open(host, port, True, {}, self._proxy_for('https', host)), TIMEOUT)
+        except (Exception, asyncio.TimeoutError) as e:
+            logger.debug(f"Prewarm of {host} failed: {e}")
+            return None
+
+    async def _take_warm(self, host: str, port: int, timings: Dict):
+        """A prewarmed (reader, writer, absolute_form) for host:port, or None"""
+        started, task = self._warm.pop((host, port), (None, None))
+        if task is None:
+            return None
+        if not task.done():
+            # Still connecting: waiting for it beats starting over
+            waited = time.perf_counter()
+            await asyncio.shield(task)
+            _add_timing(timings, 'connect', time.perf_counter() - waited)
+        connection = task.result()
+        if connection is None:
+            return None
+        reader, writer, _ = connection
+        if asyncio.get_running_loop().time() - started > PREWARM_IDLE or writer.is_closing() or reader.at_eof():
+            writer.close()
+            return None
+        return connection
+
+    def close(self):
+        """Drop the prewarmed connections nobody used"""
+        warm, self._warm = self._warm, {}
+        for _, task in warm.values():
+            if not task.done():
+                task.cancel()
+            elif task.result() is not None:
+                task.result()[1].close()
+
+    async def _request(self, method, url, headers, body, allow_redirects, collector, timings) -> ProbeResponse:
+        for _ in range(self.MAX_REDIRECTS + 1):
+            response = await self._send_once(method, url, headers, body, collector, timings)
+            location = response.headers.get('location')
+            if not allow_redirects or not location or response.status_code not in (301, 302, 303, 307, 308):
+                return response
+            url = urljoin(url, location)
+            collector = BodyCollector(collector.until, collector.max_bytes)
+            if response.status_code == 303 or (response.status_code in (301, 302) and method == 'POST'):
+                method, body = 'GET', None
+                headers.pop('Content-Type', None)
+        raise requests.exceptions.TooManyRedirects(f"Exceeded {self.MAX_REDIRECTS} redirects")
+
+    def _cookie_header(self, host: str) -> str:
+        return '; '.join(
+            f"{name}={value}" for (domain, name), value in self.cookies.items()
+            if host == domain or host.endswith('.' + domain)
+        )
+
+    def _store_cookies(self, host: str, set_cookies: List[str]):
+        for header in set_cookies:
+            cookie = SimpleCookie()
+            try:
+                cookie.load(header)
+            except Exception:
+                continue
+            for name, morsel in cookie.items():
+                domain = (morsel['domain'] or host).lstrip('.').lower()
+                self.cookies[(domain, name)] = morsel.value
+
+    async def _open(self, host: str, port: int, use_tls: bool, timings: Dict,
+                    proxy: Optional[SplitResult] = None):
+        """
+        Open a connection to host:port, directly or through proxy (see _proxy_for)
+        Returns: (reader, writer, absolute_form) - absolute_form is True when the
+        request line must carry the full URL (plain HTTP through an HTTP proxy)
+        """
+        tls = {'ssl': self._ssl(), 'server_hostname': host} if use_tls else {}
+        absolute_form = False
+        if proxy is None:
+            sock = await self._connect(host, port, timings)
+        elif proxy.scheme == 'http' and not use_tls:
+            sock = await self._connect(proxy.hostname, proxy.port or 8080, timings)
+            absolute_form = True
+        else:
+            sock = await self._tunnel(host, port, timings, proxy)
+
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(sock=sock, **tls)
+        except BaseException:
+            sock.close()
+            raise
+        if use_tls:
+            _add_timing(timings, 'tls', time.perf_counter() - started)
+        return reader, writer, absolute_form
+
+    async def _connect(self, host: str, port: int, timings: Dict) -> socket.socket:
+        """Resolve and connect a non-blocking socket, trying each address in turn"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        addresses = await loop.getaddrinfo(host, port, family=self.family, type=socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        _add_timing(timings, 'dns', resolved - started)
+
+        last_error = None
+        try:
+            for family, type_, proto, _, address in addresses:
+                sock = socket.socket(family, type_, proto)
+                sock.setblocking(False)
+                try:
+                    await loop.sock_connect(sock, address)
+                    return sock
+                except BaseException as e:
+                    sock.close()
+                    if not isinstance(e, OSError):
+                        raise
+                    last_error = e
+        finally:
+            _add_timing(timings, 'connect', time.perf_counter() - resolved)
+        raise last_error or OSError(f"Cannot connect to {host}")
+
+    @staticmethod
+    def _proxy_credentials(proxy: SplitResult) -> Tuple[str, str]:
+        return unquote(proxy.username or ''), unquote(proxy.password or '')
+
+    @staticmethod
+    async def _recv_exact(sock: socket.socket, size: int) -> bytes:
+        loop = asyncio.get_running_loop()
+        data = b''
+        while len(data) < size:
+            chunk = await loop.sock_recv(sock, size - len(data))
+            if not chunk:
+                raise requests.exceptions.ProxyError("Proxy closed the connection")
+            data += chunk
+        return data
+
+    async def _tunnel(self, host: str, port: int, timings: Dict, proxy: SplitResult) -> socket.socket:
+        """Connect to the proxy and have it open a tunnel to host:port (counted as connect time)"""
+        scheme = proxy.scheme
+        proxy_port = proxy.port or (8080 if scheme == 'http' else 1080)
+        sock = await self._connect(proxy.hostname, proxy_port, timings)
+
+        started = time.perf_counter()
+        try:
+            if scheme == 'http':
+                await self._http_connect(sock, host, port, proxy)
+            elif scheme.startswith('socks5'):
+                await self._socks5_connect(sock, host, port, proxy)
+            else:
+                await self._socks4_connect(sock, host, port, proxy)
+        except BaseException:
+            sock.close()
+            raise
+        finally:
+            _add_timing(timings, 'connect', time.perf_counter() - started)
+        return sock
+
+    async def _http_connect(self, sock: socket.socket, host: str, port: int, proxy: SplitResult):
+        loop = asyncio.get_running_loop()
+        request = f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+        if proxy.username:
+            token = base64.b64encode(':'.join(self._proxy_credentials(proxy)).encode('utf-8')).decode('ascii')
+            request += f"Proxy-Authorization: Basic {token}\r\n"
+        await loop.sock_sendall(sock, (request + "\r\n").encode('latin-1'))
+
+        response = b''
+        while b'\r\n\r\n' not in response:
+            chunk = await loop.sock_recv(sock, 4096)
+            if not chunk or len(response) > 65536:
+                raise requests.exceptions.ProxyError("Invalid CONNECT response from proxy")
+            response += chunk
+        status = response.split(b' ', 2)[1:2]
+        if status != [b'200']:
+            raise requests.exceptions.ProxyError(f"Proxy CONNECT failed: {response.splitlines()[0]!r}")
+
+    async def _socks5_connect(self, sock: socket.socket, host: str, port: int, proxy: SplitResult):
+        loop = asyncio.get_running_loop()
+        methods = b'\x00\x02' if proxy.username else b'\x00'
+        await loop.sock_sendall(sock, b'\x05' + bytes([len(methods)]) + methods)
+        _, method = await self._recv_exact(sock, 2)
+        if method == 0x02:
+            username, password = (value.encode('utf-8') for value in self._proxy_credentials(proxy))
+            await loop.sock_sendall(
+                sock, b'\x01' + bytes([len(username)]) + username + bytes([len(password)]) + password
+            )
+            if (await self._recv_exact(sock, 2))[1] != 0:
+                raise requests.exceptions.ProxyError("SOCKS5 authentication failed")
+        elif method != 0x00:
+            raise requests.exceptions.ProxyError("SOCKS5 proxy refused our authentication methods")
+
+        if proxy.scheme == 'socks5h':
+            name = host.encode('idna')
+            address = b'\x03' + bytes([len(name)]) + name
+        else:
+            infos = await loop.getaddrinfo(host, port, family=self.family, type=socket.SOCK_STREAM)
+            family, ip = infos[0][0], infos[0][4][0]
+            address = (b'\x04' if family == socket.AF_INET6 else b'\x01') + socket.inet_pton(family, ip)
+        await loop.sock_sendall(sock, b'\x05\x01\x00' + address + port.to_bytes(2, 'big'))
+
+        _, reply, _, address_type = await self._recv_exact(sock, 4)
+        if reply != 0:
+            raise requests.exceptions.ProxyError(f"SOCKS5 connect failed (code {reply})")
+        if address_type == 0x03:
+            skip = (await self._recv_exact(sock, 1))[0]
+        else:
+            skip = 16 if address_type == 0x04 else 4
+        await self._recv_exact(sock, skip + 2)
+
+    async def _socks4_connect(self, sock: socket.socket, host: str, port: int, proxy: SplitResult):
+        loop = asyncio.get_running_loop()
+        user_id = self._proxy_credentials(proxy)[0].encode('utf-8')
+        if proxy.scheme == 'socks4a':
+            address, tail = b'\x00\x00\x00\x01', host.encode('idna') + b'\x00'
+        else:
+            infos = await loop.getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_STREAM)
+            address, tail = socket.inet_aton(infos[0][4][0]), b''
+        await loop.sock_sendall(
+            sock, b'\x04\x01' + port.to_bytes(2, 'big') + address + user_id + b'\x00' + tail
+        )
+        if (await self._recv_exact(sock, 8))[1] != 0x5a:
+            raise requests.exceptions.ProxyError("SOCKS4 connect rejected")
+
+    async def _send_once(self, method, url, headers, body, collector, timings) -> ProbeResponse:
+        parts = urlsplit(url)
+        use_tls = parts.scheme == 'https'
+        host = (parts.hostname or '').lower()
+        port = parts.port or (443 if use_tls else 80)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+        request_headers = CaseInsensitiveDict(headers)
+        request_headers['Host'] = parts.netloc.rpartition('@')[2]
+        proxy = self._proxy_for(parts.scheme, host)
+        warm = await self._take_warm(host, port, timings) if use_tls and self._warm else None
+        try:
+            reader, writer, absolute_form = warm or await self._open(host, port, use_tls, timings, proxy)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            if proxy is not None:
+                raise requests.exceptions.ProxyError(f"{proxy.hostname}: {e}") from e
+            raise requests.exceptions.ConnectionError(f"{host}:{port}: {e}") from e
+
+        if absolute_form:
+            target = f"{parts.scheme}://{parts.netloc}{target}"
+            if proxy.username:
+                token = base64.b64encode(':'.join(self._proxy_credentials(proxy)).encode('utf-8')).decode('ascii')
+                request_headers['Proxy-Authorization'] = f"Basic {token}"
+        request_headers['Connection'] = 'close'
+        request_headers.setdefault('Accept', '*/*')
+        request_headers.setdefault('Accept-Encoding', 'gzip, deflate')
+        cookie = self._cookie_header(host)
+        if cookie:
+            request_headers['Cookie'] = cookie
+        if body is not None:
+            request_headers['Content-Length'] = str(len(body))
+
+        head = f"{method} {target} HTTP/1.1\r\n" + ''.join(
+            f"{name}: {value}\r\n" for name, value in request_headers.items()
+        ) + "\r\n"
+
+        status = None
+        try:
+            sent = time.perf_counter()
+            writer.write(head.encode('latin-1') + (body or b''))
+            await writer.drain()
+            status, response_headers, set_cookies = await self._read_head(reader)
+            _add_timing(timings, 'ttfb', time.perf_counter() - sent)
+            content = await self._read_body(reader, method, status, response_headers, collector, timings)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            if warm is not None and status is None:
+                # The server dropped the prewarmed connection while it idled: dial a fresh one
+                return await self._send_once(method, url, headers, body, collector, timings)
+            raise requests.exceptions.ConnectionError(f"{host}:{port}: {e}") from e
+        finally:
+            writer.close()
+
+        self._store_cookies(host, set_cookies)
+        return ProbeResponse(status, url, response_headers, content)
+
+    @staticmethod
+    async def _read_head(reader):
+        """Read status line and headers, skipping interim 1xx responses"""
+        while True:
+            status_line = (await reader.readline()).decode('latin-1')
+            if not status_line:
+                raise ValueError("connection closed before response")
+            parts = status_line.split(None, 2)
+            if len(parts) < 2 or not parts[0].startswith('HTTP/') or not parts[1].isdigit():
+                raise ValueError(f"bad status line {status_line.strip()[:80]!r}")
+            status = int(parts[1])
+            headers = CaseInsensitiveDict()
+            set_cookies = []
+            while True:
+                line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                name, value = name.strip(), value.strip()
+                if name.lower() == 'set-cookie':
+                    set_cookies.append(value)
+                headers[name] = f"{headers[name]}, {value}" if name in headers else value
+            if status >= 200 or status == 101:
+                return status, headers, set_cookies
+
+    READ_SIZE = 16384
+
+    @classmethod
+    async def _iter_raw(cls, reader, headers) -> AsyncIterator[bytes]:
+        """Yield the raw (still content-encoded) body in chunks"""
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return
+                while size > 0:
+                    chunk = await reader.read(min(size, cls.READ_SIZE))
+                    if not chunk:
+                        raise asyncio.IncompleteReadError(b'', size)
+                    size -= len(chunk)
+                    yield chunk
+                await reader.readexactly(2)
+        elif 'content-length' in headers:
+            remaining = int(headers['content-length'])
+            while remaining > 0:
+                # Hand over whatever has arrived: a marker must not wait for the rest of a block
+                chunk = await reader.read(min(remaining, cls.READ_SIZE))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b'', remaining)
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while True:
+                chunk = await reader.read(cls.READ_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    @classmethod
+    async def _read_body(cls, reader, method, status, headers, collector, timings=None) -> bytes:
+        """Read and decode the body, stopping as soon as the collector has enough"""
+        if method == 'HEAD' or status in (204, 304):
+            return b''
+        decoder = _BodyDecoder(headers.get('content-encoding', ''))
+        async for chunk in cls._iter_raw(reader, headers):
+            if timings is not None:
+                timings['bytes'] = timings.get('bytes', 0) + len(chunk)
+            if collector.feed(decoder.feed(chunk)):
+                # The connection is closed by the caller without reading further
+                return collector.content
+        collector.feed(decoder.flush())
+        return collector.content
+
+
+class IPBatchLookup:
+    """
+    ip-api.com lookups gathered into POST /batch calls (IP_API_BATCH_SIZE IPs each)
+
+    Fleet checkers learn their exit IP through their proxy, then await
+    lookup(ip): IPs arriving within IP_API_BATCH_WINDOW share one call, sent
+    from this host, so a fleet costs one request per hundred exits instead of
+    one or two per exit against the free tier's 45 a minute. Calls go out one
+    at a time; once ip-api's X-Rl header says the batch quota is used up, the
+    next call waits X-Ttl seconds for it to reset. An IP that could not be
+    looked up resolves to None. Calls run outside any caller's deadline; each
+    caller waits no longer than its own.
+    """
+
+    def __init__(self, client: Optional[AsyncHTTPClient] = None, window: float = IP_API_BATCH_WINDOW,
+                 size: int = IP_API_BATCH_SIZE):
+        self.client = client or AsyncHTTPClient(headers={'User-Agent': USER_AGENT})
+        self.window = window
+        self.size = size
+        self.calls = 0
+        self._pending = {}  # ip -> futures awaiting it
+        self._timer = None
+        self._lock = asyncio.Lock()
+        self._not_before = 0.0
+
+    async def lookup(self, ip: str) -> Optional[Dict]:
+        """Raw ip-api.com record of ip (IP_API_FIELDS), or None (also once the caller's deadline passes)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(ip, []).append(future)
+        if len(self._pending) >= self.size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        remaining = _remaining_timeout(None)
+        try:
+            return await asyncio.wait_for(future, None if remaining is None else max(0.0, remaining))
+        except asyncio.TimeoutError:
+            return None
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = dict(itertools.islice(self._pending.items(), self.size))
+            for ip in batch:
+                del self._pending[ip]
+            # A batch serves many callers: it must not inherit the deadline of the one that flushed it
+            contextvars.Context().run(asyncio.ensure_future, self._send(batch))
+
+    async def _send(self, batch: Dict[str, List[asyncio.Future]]):
+        records = []
+        try:
+            async with self._lock:
+                loop = asyncio.get_running_loop()
+                if self._not_before > loop.time():
+                    await asyncio.sleep(self._not_before - loop.time())
+                response = await self.client.request(
+                    'POST', f"{IP_API_BATCH_URL}?fields={IP_API_FIELDS}", json=list(batch), timeout=TIMEOUT
+                )
+                self.calls += 1
+                remaining, reset = response.headers.get('X-Rl'), response.headers.get('X-Ttl')
+                if (remaining == '0' or response.status_code == 429) and reset and reset.isdigit():
+                    self._not_before = loop.time() + int(reset)
+                if response.status_code == 200:
+                    records = response.json()
+                else:
+                    logger.debug(f"ip-api batch: HTTP {response.status_code}")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.debug(f"ip-api batch failed: {e}")
+        finally:
+            by_ip = {record.get('query'): record for record in records
+                     if isinstance(record, dict) and record.get('status') == 'success'}
+            for ip, futures in batch.items():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(by_ip.get(ip))
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.client.close()
+
+
+class ProviderHealth:
+    """
+    Circuit breakers for the third-party IP intelligence providers
+
+    A provider whose calls fail PROVIDER_FAILURE_THRESHOLD times in a row is
+    skipped (circuit open) for PROVIDER_COOLDOWN seconds, doubled each time it
+    fails again once the cool-down is over, up to PROVIDER_COOLDOWN_MAX. After
+    the cool-down calls go through again: one success closes the circuit.
+    With a DiskCache the state lives in its 'provider_health' namespace, so
+    daemon polls, fleet scans and later runs all share it.
+    """
+
+    def __init__(self, cache: Optional[DiskCache] = None):
+        self.cache = cache
+        self._state = {}  # provider -> state, when there is no cache to keep it
+        self._lock = threading.Lock()
+
+    def _get(self, provider: str) -> Dict:
+        if self.cache is not None:
+            return self.cache.get('provider_health', provider) or {}
+        return self._state.get(provider, {})
+
+    def _put(self, provider: str, state: Dict):
+        if self.cache is not None:
+            self.cache.set('provider_health', provider, state, 2 * PROVIDER_COOLDOWN_MAX)
+        else:
+            self._state[provider] = state
+
+    def available(self, provider: str) -> bool:
+        """Whether the provider may be called: circuit closed, or its cool-down is over"""
+        return self._get(provider).get('open_until', 0) <= time.time()
+
+    def record(self, provider: str, ok: bool):
+        """Account for one call to the provider (retries included)"""
+        with self._lock:
+            state = self._get(provider)
+            if ok:
+                if state:
+                    self._put(provider, {})
+                return
+            state = {'failures': state.get('failures', 0) + 1, 'cooldown': state.get('cooldown', 0)}
+            if state['failures'] >= PROVIDER_FAILURE_THRESHOLD:
+                state['cooldown'] = min(PROVIDER_COOLDOWN_MAX, 2 * state['cooldown'] or PROVIDER_COOLDOWN)
+                state['open_until'] = time.time() + state['cooldown']
+                logger.debug(f"{provider}: {state['failures']} failed calls in a row, "
+                             f"skipped for {state['cooldown']}s")
+            self._put(provider, state)
+
+    @staticmethod
+    def failed(result) -> bool:
+        """Whether a probe result counts against the provider: an error, a rate limit or a 5xx"""
+        return isinstance(result, BaseException) or result.status_code == 429 or result.status_code >= 500
+
+
+class CheckResult(NamedTuple):
+    """Structured result of one service check"""
+    service: str    # Service key, e.g. 'netflix'
+    name: str       # Display name, e.g. 'Netflix'
+    status: str     # success / partial / failed / error
+    region: str
+    detail: str
+    elapsed: float  # Seconds spent on the check
+    cached: bool = False  # Reused from the result cache instead of probed
+    # Per-request records: method, url, status, dns/connect/tls/ttfb/total seconds, bytes, error
+    timings: Tuple[Dict, ...] = ()
+    unlock_type: Optional[str] = None  # 'native' / 'dns' (see adns_unlock), None if undetermined
+
+
+class UnlockTypeUpdate(NamedTuple):
+    """Late unlock type of a result acheck(unlock_updates=True) yielded before DNS detection finished"""
+    service: str
+    unlock_type: str  # 'native' / 'dns'
+
+
 class UnlockChecker:
     """Main unlock checker class for streaming media and AI services"""
 
-    def __init__(self, verbose=False, ipv6=False):
+    def __init__(self, verbose=False, ipv6=False, max_workers=MAX_WORKERS, proxy=None, family=None,
+                 cache: Optional[DiskCache] = None, rir_index: Optional[RIRIndex] = None,
+                 mmdb: Optional[List[MMDBReader]] = None, fresh: bool = False, show_timings: bool = False,
+                 record: Optional[str] = None, replay: Optional[TrafficReplay] = None,
+                 ip_batch: Optional['IPBatchLookup'] = None,
+                 provider_health: Optional[ProviderHealth] = None):
+        """
+        ipv6: shorthand for family=socket.AF_INET6
+        family: socket.AF_INET / AF_INET6 to pin every connection to one address family;
+                by default the resolver picks
+        cache: DiskCache for IP intelligence and ASN registration countries (none by default)
+        rir_index: RIRIndex answering registration countries offline (none by default)
+        mmdb: MMDBReaders (e.g. GeoLite2 Country + ASN) that replace the remote IP providers;
+              only the exit IP is then fetched over the network
+        fresh: probe every service even when the cache holds a recent result for this exit IP
+        show_timings: print (and report in fleet JSON) the per-request network timings of each check
+        record: directory receiving this checker's HTTP exchanges on close(), see TrafficRecorder
+        replay: recorded session answering every probe instead of the network, see TrafficReplay
+        ip_batch: IPBatchLookup shared by a fleet; aget_ip_info() then geolocates in bulk
+        provider_health: circuit breakers of the IP intelligence providers, shared by a fleet
+                         (a new ProviderHealth on the cache by default)
+        """
         self.verbose = verbose
-        self.ipv6 = ipv6
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.cache = cache
+        self.fresh = fresh
+        self.show_timings = show_timings
+        self.recorder = TrafficRecorder(record, proxy, family or 0) if record else None
+        self.replay = replay
+        self.ip_batch = ip_batch
+        self.provider_health = provider_health if provider_health is not None else ProviderHealth(cache)
+        self.rir_index = rir_index
+        self.mmdb = list(mmdb or [])
+        self.family = family if family is not None else (socket.AF_INET6 if ipv6 else 0)
+        self.ipv6 = self.family == socket.AF_INET6
+        self.proxy = proxy
+        self.max_workers = max(1, max_workers)
+        self.pacer = HostPacer()
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+        self._probe_pool = None
+        self._check_pool = None
+        self._adapter = None
+        self._aclient = None
+        self._latency = {}  # service -> durations, when there is no cache to keep them
+        self._latency_lock = threading.Lock()
+        self.ip_info = {}
+
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session of the calling thread (requests.Session is not thread-safe)"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._new_session()
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _new_session(self) -> requests.Session:
+        """Create a session with the default headers"""
+        session = PacedSession(self.pacer)
+        session.headers.update({
             'User-Agent': USER_AGENT,
             'Accept-Language': 'en-US,en;q=0.9',
         })
-        self.ip_info = {}
+        if self.proxy:
+            session.proxies.update({'http': self.proxy, 'https': self.proxy})
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        return session
+
+    @property
+    def adapter(self) -> TimedAdapter:
+        """
+        HTTPAdapter shared by every per-thread session (urllib3 pools are thread-safe),
+        so a keep-alive connection opened by one worker, or by prewarm(), serves them all
+        """
+        with self._sessions_lock:
+            if self._adapter is None:
+                pools = {'pool_connections': ADAPTER_POOLS, 'pool_maxsize': self.max_workers}
+                self._adapter = FamilyAdapter(self.family, **pools) if self.family else TimedAdapter(**pools)
+            return self._adapter
+
+    @staticmethod
+    def _service_hosts(services: Optional[Iterable[str]] = None) -> List[str]:
+        wanted = SERVICE_KEYS if services is None else services
+        return list(dict.fromkeys(host for key in wanted for host in SERVICE_HOSTS.get(key, ())))
+
+    def prewarm(self, services: Optional[Iterable[str]] = None):
+        """
+        Resolve and connect to the hosts of `services` (all by default) in the background
+
+        Meant to overlap with get_ip_info(): DNS, TCP and TLS are done in parallel,
+        and the connections wait in the shared adapter's pools, so the checks start
+        on warm keep-alive connections. Without effect through a proxy (it resolves
+        the names itself) and when replaying.
+        """
+        if self.replay is not None or self.proxy:
+            return
+        warmers = None
+        for host in self._service_hosts(services):
+            settings = self.session.merge_environment_settings(f"https://{host}/", {}, None, None, None)
+            if settings['proxies'].get('https'):
+                continue  # Proxy from the environment
+            if warmers is None:
+                warmers = ThreadPoolExecutor(max_workers=len(SERVICE_HOSTS), thread_name_prefix='unlockcheck-prewarm')
+            warmers.submit(self._warm_connection, host, settings['verify'])
+        if warmers is not None:
+            warmers.shutdown(wait=False)
+
+    def _warm_connection(self, host: str, verify):
+        """Open one TLS connection to host and park it in the pool requests will use for it"""
+        request = requests.Request('GET', f"https://{host}/").prepare()
+        try:
+            if hasattr(self.adapter, 'get_connection_with_tls_context'):
+                pool = self.adapter.get_connection_with_tls_context(request, verify)
+            else:  # requests < 2.32.2
+                pool = self.adapter.get_connection(request.url)
+                self.adapter.cert_verify(pool, request.url, verify, None)
+            conn = pool._get_conn()
+            try:
+                conn.timeout = TIMEOUT
+                conn.connect()
+                self._drain_session_tickets(conn.sock, max(0.05, min(1.0, 2 * getattr(conn, '_dial_seconds', 0.5))))
+            except Exception:
+                conn.close()
+                raise
+            finally:
+                pool._put_conn(conn)
+        except Exception as e:
+            self.log(f"Prewarm of {host} failed: {e}", "debug")
+
+    @staticmethod
+    def _drain_session_tickets(sock, wait: float):
+        """
+        Read the TLS 1.3 session tickets a server sends about one round trip after the
+        handshake: left unread they make the idle socket readable, and urllib3 takes a
+        readable idle connection for a dropped one
+        """
+        sock.settimeout(0)
+        try:
+            while select.select([sock], [], [], wait)[0]:
+                try:
+                    if not sock.recv(1):
+                        raise ConnectionError("closed by the server")
+                except ssl.SSLWantReadError:
+                    continue  # Only handshake records: nothing for the application
+                raise ConnectionError("unexpected data before any request")
+        finally:
+            sock.settimeout(TIMEOUT)
+
+    def close(self):
+        """Close the worker pools and every per-thread session (and save the recorded traffic)"""
+        if self.recorder is not None:
+            try:
+                self.recorder.save()
+            except OSError as e:
+                self.log(f"Cannot save recorded traffic: {e}", "warning")
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+            probe_pool, self._probe_pool = self._probe_pool, None
+            check_pool, self._check_pool = self._check_pool, None
+            adapter, self._adapter = self._adapter, None
+        for pool in (check_pool, probe_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        for session in sessions:
+            session.close()
+        if adapter is not None:
+            adapter.close()
+        self._local = threading.local()
+
+    def _send(self, probe: Probe, cancelled: Optional[threading.Event] = None) -> ProbeResponse:
+        """
+        Blocking transport: send a probe through the calling thread's session
+        The body is only read while `cancelled` is not set, otherwise the
+        connection is closed and ProbeCancelled is raised
+        """
+        if self.replay is not None:
+            return self.replay.send(probe)
+        if cancelled is not None and cancelled.is_set():
+            raise ProbeCancelled(probe.url)
+        timings = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        result = error = None
+        try:
+            result = self._send_blocking(probe, cancelled, timings)
+            return result
+        except Exception as e:
+            timings['error'] = type(e).__name__
+            error = e
+            raise
+        finally:
+            _request_timings.reset(token)
+            self._record_timings(probe, timings, started, result)
+            if self.recorder is not None:
+                self.recorder.add(probe, result, error, time.perf_counter() - started)
+
+    def _send_blocking(self, probe: Probe, cancelled: Optional[threading.Event], timings: Dict) -> ProbeResponse:
+        kwargs = probe.kwargs
+        if _deadline.get() is not None:
+            timeout = _remaining_timeout(kwargs.get('timeout'))
+            if timeout <= 0:
+                raise requests.exceptions.Timeout(f"Deadline exceeded before {probe.method} {probe.url}")
+            kwargs = {**kwargs, 'timeout': timeout}
+        response = self.session.request(probe.method, probe.url, stream=True, **kwargs)
+        try:
+            if cancelled is not None and cancelled.is_set():
+                raise ProbeCancelled(probe.url)
+            if not probe.limited:
+                return ProbeResponse.from_requests(response)
+
+            # Read incrementally; closing early drops the connection instead of draining it
+            collector = BodyCollector(probe.until, probe.max_bytes)
+            for chunk in self._iter_available(response):
+                if cancelled is not None and cancelled.is_set():
+                    raise ProbeCancelled(probe.url)
+                if _remaining_timeout(None) is not None and _remaining_timeout(None) <= 0:
+                    raise requests.exceptions.Timeout(f"Deadline exceeded reading {probe.url}")
+                if collector.feed(chunk):
+                    break
+            return ProbeResponse(response.status_code, response.url, response.headers, collector.content)
+        finally:
+            # Body bytes as read off the wire, redirect hops included
+            timings['bytes'] = sum(hop.raw.tell() for hop in (*response.history, response) if hop.raw)
+            response.close()
+
+    @staticmethod
+    def _iter_available(response: requests.Response) -> Iterable[bytes]:
+        """Yield the decoded body as it arrives, without waiting to fill a whole READ_SIZE block"""
+        if not hasattr(response.raw, 'read1'):
+            # urllib3 1.x: full blocks only
+            yield from response.iter_content(chunk_size=AsyncHTTPClient.READ_SIZE)
+            return
+        # Same exception mapping as Response.iter_content
+        try:
+            while True:
+                chunk = response.raw.read1(AsyncHTTPClient.READ_SIZE, decode_content=True)
+                if not chunk:
+                    return
+                yield chunk
+        except urllib3.exceptions.ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except urllib3.exceptions.DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e)
+        except urllib3.exceptions.SSLError as e:
+            raise requests.exceptions.SSLError(e)
+
+    @staticmethod
+    def _record_timings(probe: Probe, timings: Dict, started: float, result: Optional[ProbeResponse]):
+        """Append the timing record of one HTTP call to the running check's sink, if any"""
+        sink = _timings_sink.get()
+        if sink is None:
+            return
+        record = {'method': probe.method, 'url': probe.url,
+                  'status': result.status_code if result is not None else None}
+        for phase in TIMING_PHASES:
+            if phase in timings:
+                record[phase] = round(timings[phase], 4)
+        record['total'] = round(time.perf_counter() - started, 4)
+        record['bytes'] = timings.get('bytes', 0)
+        if 'error' in timings:
+            record['error'] = timings['error']
+        sink.append(record)
+
+    def _probe_executor(self) -> ThreadPoolExecutor:
+        """Thread pool for concurrent sub-probes (created on first use)"""
+        with self._sessions_lock:
+            if self._probe_pool is None:
+                self._probe_pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='unlockcheck-probe'
+                )
+            return self._probe_pool
+
+    def _check_executor(self) -> ThreadPoolExecutor:
+        """
+        Thread pool running the checks of run_services() (created on first use)
+        It outlives each run, so a daemon's polls reuse the same workers and their sessions
+        """
+        with self._sessions_lock:
+            if self._check_pool is None:
+                self._check_pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='unlockcheck'
+                )
+            return self._check_pool
+
+    def _send_all(self, probes: List[Probe]) -> List:
+        """Send probes concurrently on the probe pool; failures come back as exception instances"""
+        pool = self._probe_executor()
+        # Each probe runs in a copy of this context so its timings reach the check's sink
+        futures = [pool.submit(contextvars.copy_context().run, self._send, probe) for probe in probes]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _race(self, race: Race) -> List:
+        """Send a Race on the probe pool, returning outcomes once decided"""
+        pool = self._probe_executor()
+        cancelled = [threading.Event() for _ in race]
+        futures = {
+            pool.submit(contextvars.copy_context().run, self._send, probe, cancelled[index]): index
+            for index, probe in enumerate(race)
+        }
+        outcomes = [None] * len(race)
+        pending = set(futures)
+        grace_end = None
+        while pending:
+            timeout = None if grace_end is None else max(0.0, grace_end - time.monotonic())
+            if timeout == 0.0:
+                # Out of grace: only the probes the race keeps are waited for
+                for future in pending:
+                    if futures[future] not in race.keep:
+                        cancelled[futures[future]].set()
+                        future.cancel()
+                pending = {future for future in pending if futures[future] in race.keep}
+                timeout = None
+                if not pending:
+                    break
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            decided = final = False
+            for future in done:
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                outcomes[index] = race.settle(index, result)
+                decided = decided or race.is_decisive(outcomes[index])
+                final = final or race.is_final(outcomes[index])
+            if final:
+                break
+            if decided and grace_end is None:
+                grace_end = time.monotonic() + max(0.0, race.grace)
+        # Queued probes never start, running ones drop their response unread
+        for event in cancelled:
+            event.set()
+        for future in pending:
+            future.cancel()
+        return outcomes
+
+    def _drive(self, flow):
+        """
+        Run a check flow to completion on the blocking transport
+        A flow may yield a single Probe, a list of Probes to send concurrently, a Race or a Pause
+        """
+        try:
+            probe = next(flow)
+            while True:
+                try:
+                    if isinstance(probe, Pause):
+                        time.sleep(probe)
+                        response = None
+                    elif isinstance(probe, Race):
+                        response = self._race(probe)
+                    elif isinstance(probe, list):
+                        response = self._send_all(probe)
+                    else:
+                        response = self._send(probe)
+                except Exception as e:
+                    probe = flow.throw(e)
+                else:
+                    probe = flow.send(response)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            flow.close()
+
+    @property
+    def aclient(self) -> AsyncHTTPClient:
+        """asyncio transport used by the async API (created on first use)"""
+        if self._aclient is None:
+            self._aclient = AsyncHTTPClient(
+                headers={
+                    'User-Agent': USER_AGENT,
+                    'Accept-Language': 'en-US,en;q=0.9',
+                },
+                pacer=self.pacer,
+                proxy=self.proxy,
+                family=self.family
+            )
+        return self._aclient
+
+    async def _asend(self, probe: Probe) -> ProbeResponse:
+        """asyncio transport: send a probe through the async client"""
+        if self.replay is not None:
+            return await self.replay.asend(probe)
+        timings = {}
+        started = time.perf_counter()
+        result = error = None
+        try:
+            result = await self.aclient.request(
+                probe.method, probe.url, until=probe.until, max_bytes=probe.max_bytes,
+                timings=timings, **probe.kwargs
+            )
+            return result
+        except (Exception, asyncio.CancelledError) as e:
+            timings['error'] = type(e).__name__
+            error = e
+            raise
+        finally:
+            self._record_timings(probe, timings, started, result)
+            if self.recorder is not None:
+                self.recorder.add(probe, result, error, time.perf_counter() - started)
+
+    async def _asend_all(self, probes: List[Probe]) -> List:
+        """Send probes concurrently; failures come back as exception instances"""
+        return list(await asyncio.gather(*(self._asend(probe) for probe in probes), return_exceptions=True))
+
+    async def _arace(self, race: Race) -> List:
+        """Send a Race concurrently, cancelling the losers once decided"""
+        tasks = {asyncio.ensure_future(self._asend(probe)): index for index, probe in enumerate(race)}
+        outcomes = [None] * len(race)
+        pending = set(tasks)
+        loop = asyncio.get_running_loop()
+        grace_end = None
+        try:
+            while pending:
+                timeout = None if grace_end is None else max(0.0, grace_end - loop.time())
+                if timeout == 0.0:
+                    # Out of grace: only the probes the race keeps are waited for
+                    for task in pending:
+                        if tasks[task] not in race.keep:
+                            task.cancel()
+                    pending = {task for task in pending if tasks[task] in race.keep}
+                    timeout = None
+                    if not pending:
+                        break
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                decided = final = False
+                for task in done:
+                    index = tasks[task]
+                    result = task.exception() or task.result()
+                    outcomes[index] = race.settle(index, result)
+                    decided = decided or race.is_decisive(outcomes[index])
+                    final = final or race.is_final(outcomes[index])
+                if final:
+                    break
+                if decided and grace_end is None:
+                    grace_end = loop.time() + max(0.0, race.grace)
+        finally:
+            for task in pending:
+                task.cancel()
+        return outcomes
+
+    async def _adrive(self, flow):
+        """Run a check flow to completion on the asyncio transport"""
+        try:
+            probe = next(flow)
+            while True:
+                try:
+                    if isinstance(probe, Pause):
+                        await asyncio.sleep(probe)
+                        response = None
+                    elif isinstance(probe, Race):
+                        response = await self._arace(probe)
+                    elif isinstance(probe, list):
+                        response = await self._asend_all(probe)
+                    else:
+                        response = await self._asend(probe)
+                except Exception as e:
+                    probe = flow.throw(e)
+                else:
+                    probe = flow.send(response)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            flow.close()
+
+    async def aget_ip_info(self, deadline: Optional[float] = None) -> Dict:
+        """
+        Async version of get_ip_info()
+        deadline: seconds allowed for the whole lookup, applied to every HTTP call
+        """
+        api_token = _async_api.set(True)
+        deadline_token = _deadline.set(None if deadline is None else time.monotonic() + deadline)
+        try:
+            if self.ip_batch is not None and not self.mmdb and self.replay is None:
+                info = await self._abatched_ip_info()
+                if info is not None:
+                    return info
+            return await self._adrive(UnlockChecker.get_ip_info.flow(self))
+        finally:
+            _deadline.reset(deadline_token)
+            _async_api.reset(api_token)
+
+    async def _abatched_ip_info(self) -> Optional[Dict]:
+        """
+        aget_ip_info() through the shared IPBatchLookup: the exit IP over this checker's
+        route, geolocation and hosting/proxy/mobile flags in bulk from this host
+        None if either step fails, leaving the regular provider race to try
+        """
+        ip, cached = await self._adrive(self._cached_ip_info())
+        if cached:
+            return cached
+        if ip is None:
+            return None
+        outcome = self._ip_api_record(await self.ip_batch.lookup(ip) or {})
+        if outcome is None:
+            return None
+        info, data = outcome
+        self.ip_info = {**info, 'ip': ip}
+        return await self._adrive(self._complete_ip_info(data))
+
+    async def _aoffload(self, func, *args):
+        """Run func (blocking disk cache I/O) in the default executor, off the event loop"""
+        if self.cache is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(contextvars.copy_context().run, func, *args))
+
+    async def _acheck_one(self, key: str, name: str, method: str, sink: List[Dict]) -> CheckResult:
+        started = time.monotonic()
+        # Tasks run in their own context copy: the sink and the deadline are this check's
+        _timings_sink.set(sink)
+        limit = await self._aoffload(self.service_deadline, key)
+        end = self._check_end(started, limit)
+        _deadline.set(end)
+        try:
+            status, region, detail = await asyncio.wait_for(
+                self._adrive(getattr(UnlockChecker, method).flow(self)), max(0.0, end - started)
+            )
+        except asyncio.TimeoutError:
+            status, region, detail = "error", "N/A", "Timeout"
+        except Exception as e:
+            self.log(f"{name} check exception: {e}", "debug")
+            status, region, detail = "error", "N/A", "Detection Failed"
+        return await self._aoffload(self._finish_check, key, name, (status, region, detail), started, end, sink)
+
+    async def acheck(self, services: Optional[Iterable[str]] = None, deadline: Optional[float] = None,
+                     unlock_updates: bool = False) -> AsyncIterator[Union[CheckResult, UnlockTypeUpdate]]:
+        """
+        Async generator running checks concurrently, yielding results as they complete
+
+        services: service keys (see SERVICE_KEYS), all services by default
+        deadline: seconds allowed for the whole run; it bounds every in-flight HTTP call,
+                  and services still pending when it passes are yielded as "Timeout".
+                  Each check is also bounded by its own service_deadline()
+        unlock_updates: yield results without waiting for DNS unlock detection, followed
+                  by an UnlockTypeUpdate for each one it classifies later
+
+        With a cache, results still valid for the current exit IP (see get_ip_info) are
+        yielded first with cached=True, and only the other services are probed.
+        Each result carries the timings of its HTTP requests; for timed-out services
+        these show how far the cancelled requests got. unlock_type comes from
+        adns_unlock(), which runs alongside the checks: only the results it can classify
+        wait for it (bounded by DNS_BUDGET and the deadline), the others are yielded
+        at once. Each service is yielded exactly once.
+
+        Nothing is printed; debug messages go to the `unlockcheck` logger. Closing or
+        cancelling the generator cancels the pending checks and their connections.
+        Usage:
+            async for result in checker.acheck(['netflix', 'claude'], deadline=15):
+                ...
+        """
+        wanted = SERVICE_KEYS if services is None else list(services)
+        unknown = set(wanted) - set(SERVICE_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown services: {', '.join(sorted(unknown))}")
+
+        started = time.monotonic()
+        end = None if deadline is None else started + deadline
+
+        selected = [(key, name, method) for key, name, method in SERVICES if key in wanted]
+        hits = await self._aoffload(lambda: [self.cached_result(key) for key, _, _ in selected])
+        cached = []
+        to_check = []
+        for (key, name, method), hit in zip(selected, hits):
+            if hit is not None:
+                cached.append(CheckResult(key, name, *hit, 0.0, True))
+            else:
+                to_check.append((key, name, method))
+
+        api_token = _async_api.set(True)
+        deadline_token = _deadline.set(end)
+        sinks = {key: [] for key, _, _ in to_check}
+        try:
+            # Tasks copy the current context, so they inherit both variables
+            tasks = {
+                asyncio.ensure_future(self._acheck_one(key, name, method, sinks[key])): (key, name)
+                for key, name, method in to_check
+            }
+            dns_task = asyncio.ensure_future(self.adns_unlock(wanted))
+        finally:
+            _deadline.reset(deadline_token)
+            _async_api.reset(api_token)
+        classified = set(self.dns_classified(wanted))
+
+        def unlock_types() -> Dict[str, Optional[str]]:
+            if not dns_task.done() or dns_task.cancelled() or dns_task.exception() is not None:
+                return {}
+            return dns_task.result()
+
+        def with_unlock_type(result: CheckResult) -> CheckResult:
+            return result._replace(unlock_type=unlock_types().get(result.service))
+
+        pending = set(tasks)
+        finished = list(cached)  # Results neither yielded nor held yet
+        held = []   # Waiting for adns_unlock() to classify them
+        early = []  # Yielded unclassified (unlock_updates): an UnlockTypeUpdate may follow
+        try:
+            while True:
+                if dns_task.done():
+                    finished, held = held + finished, []
+                    types = unlock_types()
+                    for result in early:
+                        if types.get(result.service) is not None:
+                            yield UnlockTypeUpdate(result.service, types[result.service])
+                    early = []
+                for result in finished:
+                    if dns_task.done() or result.service not in classified:
+                        yield with_unlock_type(result)
+                    elif unlock_updates:
+                        early.append(result)
+                        yield result
+                    else:
+                        held.append(result)
+                finished = []
+                if not pending and (dns_task.done() or not (held or early)):
+                    break
+
+                timeout = None if end is None else max(0.0, end - time.monotonic())
+                done, _ = await asyncio.wait(
+                    pending if dns_task.done() else pending | {dns_task},
+                    timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Deadline passed: held results go out unclassified, the rest as timed out
+                    for task in pending:
+                        task.cancel()
+                    if pending:
+                        # Let the cancelled requests record their partial timings
+                        await asyncio.wait(pending)
+                    for result in held:
+                        yield result
+                    for task in pending:
+                        key, name = tasks[task]
+                        yield with_unlock_type(CheckResult(key, name, "error", "N/A", "Timeout",
+                                                           time.monotonic() - started, timings=tuple(sinks[key])))
+                    pending = set()
+                    break
+                for task in done:
+                    if task is not dns_task:
+                        pending.discard(task)
+                        finished.append(task.result())
+        finally:
+            for task in pending:
+                task.cancel()
+            dns_task.cancel()
+
+    async def acheck_all(self, services: Optional[Iterable[str]] = None,
+                         deadline: Optional[float] = None) -> List[CheckResult]:
+        """acheck() run to the end: the result of each service, in SERVICES order"""
+        results = {result.service: result async for result in self.acheck(services, deadline)}
+        return [results[key] for key in SERVICE_KEYS if key in results]
+
+    def aprewarm(self, services: Optional[Iterable[str]] = None):
+        """
+        prewarm() for the async API: background tasks open one TLS connection per host
+        (through the proxy too) for the first request of each check; call it right
+        before aget_ip_info()
+        """
+        if self.replay is None:
+            self.aclient.prewarm(self._service_hosts(services))
+
+    async def aclose(self):
+        """Release resources of the async API (and the blocking sessions)"""
+        if self._aclient is not None:
+            self._aclient.close()
+        self._aclient = None
+        self.close()
 
     def log(self, message, level="info"):
-        """Log output"""
-        if level == "info":
+        """Log output (routed to the `unlockcheck` logger inside the async API)"""
+        if _async_api.get():
+            levels = {"debug": logging.DEBUG, "warning": logging.WARNING, "error": logging.ERROR}
+            logger.log(levels.get(level, logging.INFO), message)
+        elif level == "info":
             print(f"{Fore.CYAN}[INFO]{Style.RESET_ALL} {message}")
         elif level == "success":
             print(f"{Fore.GREEN}[✓]{Style.RESET_ALL} {message}")
@@ -72,32 +2782,141 @@ class UnlockChecker:
 
     def check_dns_unlock(self, domain: str) -> str:
         """
-        Check if DNS unlock is being used for a domain
-
-        Note: Many services use CDN (like Cloudflare), different DNS servers returning
-        different IPs is normal load balancing behavior. True DNS unlock detection requires
-        more complex logic (checking IP ownership, AS numbers, etc.)
+        Check if DNS unlock is being used for a domain (see adns_unlock)
+        Returns: 'native' or 'dns'
+        """
+        return asyncio.run(self._adns_classify([domain])).get(domain.lower()) or "native"
 
-        Currently disabled to avoid false positives.
+    async def adns_unlock(self, services: Optional[Iterable[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        Tell for each service (key -> 'dns' / 'native') whether its hosts are DNS-unlocked
+
+        An unlock DNS answers with its own relay instead of the service's CDN. The hosts
+        of every service (SERVICE_HOSTS) are resolved by the system resolver and by
+        DNS_PUBLIC_RESOLVERS in one round trip; a system answer is native when a public
+        resolver returned the same address, one in the same /24 (/48 for IPv6) or one
+        announced by the same AS. Private addresses, or ones next to the system resolver,
+        are DNS unlock. None when it cannot be told (no answers, replay or proxy runs).
+        """
+        wanted = SERVICE_KEYS if services is None else list(services)
+        if not self.dns_classified(wanted):
+            return dict.fromkeys(wanted)
+        try:
+            by_host = await asyncio.wait_for(self._adns_classify(self._service_hosts(wanted)), DNS_BUDGET)
+        except asyncio.TimeoutError:
+            self.log(f"DNS unlock detection gave up after {DNS_BUDGET:.1f}s", "debug")
+            return dict.fromkeys(wanted)
+        types = {}
+        for key in wanted:
+            verdicts = [by_host.get(host) for host in SERVICE_HOSTS.get(key, ())]
+            types[key] = 'dns' if 'dns' in verdicts else 'native' if 'native' in verdicts else None
+        return types
+
+    def dns_classified(self, services: Iterable[str]) -> List[str]:
+        """Services adns_unlock() can tell apart: those with SERVICE_HOSTS, unless replaying or proxied"""
+        if self.replay is not None or self.proxy:
+            return []
+        return [key for key in services if SERVICE_HOSTS.get(key)]
+
+    def dns_unlock(self, services: Optional[Iterable[str]] = None) -> Dict[str, Optional[str]]:
+        """Blocking version of adns_unlock()"""
+        return asyncio.run(self.adns_unlock(services))
+
+    async def _adns_classify(self, hosts: List[str]) -> Dict[str, Optional[str]]:
+        """host -> 'dns' / 'native' / None, see adns_unlock()"""
+        system = DNSStub.system_nameservers()
+        if not system or not hosts:
+            return {}
+        resolver = system[0]
+        public = [server for server in DNS_PUBLIC_RESOLVERS if server != resolver]
+        qtypes = {socket.AF_INET: ('A',), socket.AF_INET6: ('AAAA',)}.get(self.family, ('A', 'AAAA'))
+        hosts = [host.lower() for host in hosts]
+        queries = [(host, qtype) for host in hosts for qtype in qtypes]
+        stub = DNSStub()
+        public_task = asyncio.ensure_future(stub.resolve(queries, public))
+        try:
+            answers = await stub.resolve(queries, [resolver])
+            # Nothing to compare if the system resolver had no address for any host
+            if not any(answers.get(resolver, {}).values()):
+                return {}
+            answers.update(await public_task)
+        except OSError as e:
+            self.log(f"DNS unlock detection failed: {e}", "debug")
+            return {}
+        finally:
+            public_task.cancel()
+
+        def addresses(server, host):
+            return {ip for qtype in qtypes for ip in answers.get(server, {}).get((host, qtype), [])}
+
+        resolver_address = ipaddress.ip_address(resolver)
+        verdicts = {}
+        undecided = {}  # host -> (system addresses, public addresses)
+        for host in hosts:
+            local = addresses(resolver, host)
+            remote = set().union(*(addresses(server, host) for server in public))
+            if not local or not remote:
+                verdicts[host] = None
+                continue
+            local_ips = [ipaddress.ip_address(ip) for ip in local]
+            remote_ips = [ipaddress.ip_address(ip) for ip in remote]
+            if local & remote or any(self._same_network(a, b) for a in local_ips for b in remote_ips):
+                verdicts[host] = 'native'
+            elif any(not ip.is_global for ip in local_ips) or (
+                    resolver_address.is_global and any(self._same_network(ip, resolver_address) for ip in local_ips)):
+                verdicts[host] = 'dns'
+            else:
+                undecided[host] = (local, remote)
+            self.log(f"DNS {host}: system {sorted(local)} public {sorted(remote)}", "debug")
+
+        if undecided:
+            origins = await self._aorigin_asns(stub, {ip for pair in undecided.values() for ips in pair for ip in ips})
+            for host, (local, remote) in undecided.items():
+                local_asns = set().union(*(origins.get(ip, set()) for ip in local))
+                remote_asns = set().union(*(origins.get(ip, set()) for ip in remote))
+                if not local_asns or not remote_asns:
+                    verdicts[host] = None
+                else:
+                    verdicts[host] = 'native' if local_asns & remote_asns else 'dns'
+        return verdicts
 
-        Returns: 'native' or 'dns'
+    @staticmethod
+    def _same_network(a, b) -> bool:
+        """Whether two addresses share a /24 (IPv4) or /48 (IPv6)"""
+        if a.version != b.version:
+            return False
+        bits = 24 if a.version == 4 else 48
+        return ipaddress.ip_network(f"{a}/{bits}", strict=False) == ipaddress.ip_network(f"{b}/{bits}", strict=False)
+
+    async def _aorigin_asns(self, stub: DNSStub, ips: Iterable[str]) -> Dict[str, set]:
+        """
+        ip -> origin ASNs, from the MMDB files if they have them, otherwise from
+        Team Cymru's IP-to-ASN service over DNS (TXT "13335 | 104.16.0.0/13 | US | ...")
         """
-        # Currently always return 'native' to avoid false positives
-        # DNS unlock detection is disabled because CDN services naturally return different IPs
-        return "native"
-
-        # The following code is preserved but not used:
-        # try:
-        #     # Resolve using system default DNS
-        #     system_ip = socket.getaddrinfo(domain, None)[0][4][0]
-        #
-        #     # Would need to resolve using public DNS (8.8.8.8) for comparison
-        #     # But this requires more complex implementation with dnspython library
-        #     #
-        #     # For now, just return 'native'
-        #     return "native"
-        # except:
-        #     return "native"
+        origins = {}
+        names = {}
+        for ip in ips:
+            for reader in self.mmdb:
+                asn = reader.ip_info(ip).get('asn')
+                if asn:
+                    origins[ip] = {asn[2:]}
+                    break
+            else:
+                address = ipaddress.ip_address(ip)
+                if address.version == 4:
+                    names[f"{'.'.join(reversed(ip.split('.')))}.origin.asn.cymru.com"] = ip
+                else:
+                    nibbles = address.exploded.replace(':', '')
+                    names[f"{'.'.join(reversed(nibbles))}.origin6.asn.cymru.com"] = ip
+        if names:
+            answers = await stub.resolve([(name, 'TXT') for name in names], DNS_PUBLIC_RESOLVERS, first=True)
+            for name, ip in names.items():
+                for server in DNS_PUBLIC_RESOLVERS:
+                    records = answers.get(server, {}).get((name, 'TXT'))
+                    if records:
+                        origins[ip] = {asn for record in records for asn in record.split('|')[0].split()}
+                        break
+        return origins
 
     def print_header(self):
         """Print program header"""
@@ -109,118 +2928,256 @@ class UnlockChecker:
         print(f"{' '*16}检测时间: {current_time}{Style.RESET_ALL}")
         print_header_separator()
 
-    def get_ip_info(self) -> Dict:
-        """Get current IP information (enhanced: includes native IP detection, registration location, etc.)"""
-        try:
-            # Try using ipapi.co to get detailed information
-            response = self.session.get(
-                "https://ipapi.co/json/",
-                timeout=TIMEOUT
-            )
-            if response.status_code == 200:
-                data = response.json()
+    @staticmethod
+    def _ipapi_co_info(response) -> Tuple[Dict, None]:
+        data = response.json()
+        return {
+            'ip': data.get('ip', 'N/A'),
+            'country': data.get('country_name', 'N/A'),
+            'region': data.get('region', 'N/A'),
+            'city': data.get('city', 'N/A'),
+            'isp': data.get('org', 'N/A'),
+            'country_code': data.get('country_code', 'Unknown'),
+            'asn': data.get('asn', 'N/A'),
+            'timezone': data.get('timezone', 'N/A')
+        }, None
 
-                # Basic information
-                self.ip_info = {
-                    'ip': data.get('ip', 'N/A'),
-                    'country': data.get('country_name', 'N/A'),
-                    'region': data.get('region', 'N/A'),
-                    'city': data.get('city', 'N/A'),
-                    'isp': data.get('org', 'N/A'),
-                    'country_code': data.get('country_code', 'Unknown'),
-                    'asn': data.get('asn', 'N/A'),
-                    'timezone': data.get('timezone', 'N/A')
-                }
-
-                if self.ip_info['ip'] != 'N/A' and self.ip_info['country_code'] != 'Unknown':
-                    # Try to get IP type information (native IP detection)
-                    self._detect_ip_type()
-                    return self.ip_info
-        except Exception as e:
-            self.log(f"ipapi.co fetch failed: {e}", "debug")
+    @staticmethod
+    def _ipinfo_info(response) -> Tuple[Dict, None]:
+        data = response.json()
+        return {
+            'ip': data.get('ip', 'N/A'),
+            'country': data.get('country', 'N/A'),
+            'region': data.get('region', 'N/A'),
+            'city': data.get('city', 'N/A'),
+            'isp': data.get('org', 'N/A'),
+            'country_code': data.get('country', 'Unknown'),
+            'timezone': data.get('timezone', 'N/A')
+        }, None
+
+    @classmethod
+    def _ip_api_info(cls, response) -> Optional[Tuple[Dict, Dict]]:
+        """ip-api.com answer; the raw data is kept for _detect_ip_type"""
+        return cls._ip_api_record(response.json())
 
-        # Fallback 1: Use ipinfo.io
-        try:
-            response = self.session.get(
-                "https://ipinfo.io/json",
-                timeout=TIMEOUT
-            )
-            if response.status_code == 200:
-                data = response.json()
-                self.ip_info = {
-                    'ip': data.get('ip', 'N/A'),
-                    'country': data.get('country', 'N/A'),
-                    'region': data.get('region', 'N/A'),
-                    'city': data.get('city', 'N/A'),
-                    'isp': data.get('org', 'N/A'),
-                    'country_code': data.get('country', 'Unknown'),
-                    'timezone': data.get('timezone', 'N/A')
-                }
-
-                if self.ip_info['ip'] != 'N/A' and self.ip_info['country_code'] != 'Unknown':
-                    # Try to get IP type information
-                    self._detect_ip_type()
-                    return self.ip_info
-        except Exception as e:
-            self.log(f"ipinfo.io fetch failed: {e}", "debug")
+    @staticmethod
+    def _ip_api_record(data: Dict) -> Optional[Tuple[Dict, Dict]]:
+        """One ip-api.com record (single or /batch answer)"""
+        if data.get('status') != 'success':
+            return None
+        return {
+            'ip': data.get('query', 'N/A'),
+            'country': data.get('country', 'N/A'),
+            'region': data.get('region', 'N/A'),
+            'city': data.get('city', 'N/A'),
+            'isp': data.get('isp', 'N/A'),
+            'country_code': data.get('countryCode', 'Unknown'),
+            'as_info': data.get('as', 'N/A')
+        }, data
 
-        # Fallback 2: Use ip-api.com
-        try:
-            response = self.session.get(
-                "http://ip-api.com/json/?fields=status,country,countryCode,region,city,isp,org,as,query",
-                timeout=TIMEOUT
-            )
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 'success':
-                    self.ip_info = {
-                        'ip': data.get('query', 'N/A'),
-                        'country': data.get('country', 'N/A'),
-                        'region': data.get('region', 'N/A'),
-                        'city': data.get('city', 'N/A'),
-                        'isp': data.get('isp', 'N/A'),
-                        'country_code': data.get('countryCode', 'Unknown'),
-                        'as_info': data.get('as', 'N/A')
-                    }
+    @staticmethod
+    def _ipify_info(response) -> Optional[Tuple[Dict, None]]:
+        ip = response.text.strip()
+        if not ip:
+            return None
+        return {'ip': ip, 'country_code': 'Unknown', 'ip_type': 'Unknown'}, None
 
-                    if self.ip_info['ip'] != 'N/A' and self.ip_info['country_code'] != 'Unknown':
-                        # Try to get IP type information
-                        self._detect_ip_type()
-                        return self.ip_info
-        except Exception as e:
-            self.log(f"ip-api.com fetch failed: {e}", "debug")
+    @staticmethod
+    def _is_complete_ip_info(outcome) -> bool:
+        info = outcome[0]
+        return info.get('ip', 'N/A') != 'N/A' and info.get('country_code', 'Unknown') != 'Unknown'
 
-        # Final fallback: Only get IP address
+    @probe_flow
+    def get_exit_ip(self) -> Optional[str]:
+        """Exit IP only, from ipify: one small request, no geolocation"""
         try:
-            ip = self.session.get("https://api.ipify.org", timeout=5).text.strip()
-            if ip:
-                self.log(f"Only IP address obtained: {ip}", "warning")
-                self.ip_info = {
-                    'ip': ip,
-                    'country_code': 'Unknown',
-                    'ip_type': 'Unknown'
-                }
-                self._detect_ip_type()
+            response = yield Probe('GET', "https://api64.ipify.org", timeout=TIMEOUT)
+            ip = response.text.strip()
+            return ip if response.status_code == 200 and ip else None
+        except Exception as e:
+            self.log(f"ipify fetch failed: {e}", "debug")
+            return None
+
+    def _mmdb_ip_info(self):
+        """Sub-flow of get_ip_info: exit IP from ipify, everything else from the local MMDB files"""
+        ip = yield from UnlockChecker.get_exit_ip.flow(self)
+        if ip is None:
+            return None
+
+        info = {'ip': ip}
+        for reader in self.mmdb:
+            for field, value in reader.ip_info(ip).items():
+                info.setdefault(field, value)
+        if 'country_code' not in info:
+            return None
+
+        info.setdefault('isp', 'N/A')
+        info.setdefault('ip_type', 'Unknown')
+        if 'registration_country_code' not in info and self.rir_index is not None:
+            asn_match = ASN_NUMBER.search(info.get('asn', ''))
+            reg_country_code = self.rir_index.registration_country(ip, asn_match.group(1) if asn_match else None)
+            if reg_country_code:
+                info['registration_country_code'] = reg_country_code
+                info['registration_location'] = self._convert_country_code(reg_country_code)
+        return info
+
+    @probe_flow
+    def get_ip_info(self) -> Dict:
+        """
+        Get current IP information (enhanced: includes native IP detection, registration location, etc.)
+        All providers are queried at once: the first complete answer wins, and answers
+        arriving within IP_INFO_GRACE fill in the fields it lacks. ip-api.com is waited for
+        past that, its hosting/proxy/mobile flags being needed for the IP type. With a cache,
+        the first answer carrying the exit IP (usually ipify's) ends the race if that IP is cached
+        """
+        if self.mmdb:
+            info = yield from self._mmdb_ip_info()
+            if info:
+                self.ip_info = info
                 return self.ip_info
-        except:
-            pass
-
-        self.log("Unable to get IP information, continuing detection (region info may be inaccurate)", "warning")
-        self.ip_info = {'country_code': 'Unknown'}
+            self.log("IP not found in the MMDB files, using online providers", "debug")
+
+        candidates = {
+            "ipapi.co": Probe('GET', "https://ipapi.co/json/", classify=self._ipapi_co_info, timeout=TIMEOUT),
+            "ipinfo.io": Probe('GET', "https://ipinfo.io/json", classify=self._ipinfo_info, timeout=TIMEOUT),
+            "ip-api.com": Probe('GET', f"http://ip-api.com/json/?fields={IP_API_FIELDS}",
+                                classify=self._ip_api_info, timeout=TIMEOUT),
+            "ipify": Probe('GET', "https://api64.ipify.org", classify=self._ipify_info, timeout=5),
+        }
+        # Providers with an open circuit are left out, unless that would leave none
+        providers = [provider for provider in candidates if self.provider_health.available(provider)]
+        if providers:
+            for provider in candidates.keys() - set(providers):
+                self.log(f"{provider} skipped: circuit open", "debug")
+        else:
+            providers = list(candidates)
+        cached = {}
+
+        def cache_hit(outcome) -> bool:
+            ip = outcome[0].get('ip', 'N/A')
+            if ip != 'N/A' and ip not in cached:
+                cached[ip] = self.cache.get('ip_info', ip)
+            return bool(cached.get(ip))
+
+        race = Race([candidates[provider] for provider in providers], decisive=self._is_complete_ip_info,
+                    grace=IP_INFO_GRACE, final=cache_hit if self.cache else None,
+                    keep=[index for index, provider in enumerate(providers) if provider == "ip-api.com"])
+        outcomes = yield race
+        self._record_race_health(providers, race)
+        hit = next((ip for ip, info in cached.items() if info), None)
+        if hit is not None:
+            self.log(f"Using cached IP information for {hit}", "debug")
+            self.ip_info = {**cached[hit], 'ip': hit}
+            return self.ip_info
+
+        answers = [outcome for outcome in outcomes if outcome is not None]
+        for provider, outcome in zip(providers, outcomes):
+            if outcome is None:
+                self.log(f"{provider} gave no usable answer", "debug")
+
+        # Provider order breaks ties between complete answers
+        winner = next((outcome for outcome in answers if self._is_complete_ip_info(outcome)), None)
+        if winner is None:
+            winner = next((outcome for outcome in answers if outcome[0].get('ip', 'N/A') != 'N/A'), None)
+            if winner is None:
+                self.log("Unable to get IP information, continuing detection (region info may be inaccurate)", "warning")
+                self.ip_info = {'country_code': 'Unknown'}
+                return self.ip_info
+            self.log(f"Only IP address obtained: {winner[0]['ip']}", "warning")
+
+        self.ip_info = dict(winner[0])
+        ip_api_data = None
+        for info, raw in answers:
+            # Answers for another address (e.g. the other family) must not be mixed in
+            if info.get('ip') != self.ip_info['ip']:
+                continue
+            for field, value in info.items():
+                if self.ip_info.get(field) in (None, '', 'N/A', 'Unknown') and value not in (None, ''):
+                    self.ip_info[field] = value
+            if raw is not None:
+                ip_api_data = raw
+
+        return (yield from self._complete_ip_info(ip_api_data))
+
+    def _cached_ip_info(self):
+        """
+        Sub-flow: the exit IP (from ipify) and the ip_info cached for it, if any
+        Returns (ip, info), either of which may be None; a hit also sets self.ip_info
+        """
+        ip = yield from UnlockChecker.get_exit_ip.flow(self)
+        cached = self.cache.get('ip_info', ip) if ip is not None and self.cache else None
+        if not cached:
+            return ip, None
+        self.log(f"Using cached IP information for {ip}", "debug")
+        self.ip_info = {**cached, 'ip': ip}
+        return ip, self.ip_info
+
+    def _record_race_health(self, providers: List[str], race: Race):
+        """
+        Feed a provider Race into the circuit breakers; probes cut short by the race are
+        not counted, and neither are connection errors when no provider answered at all
+        (the route is down, e.g. a dead proxy, not the providers)
+        """
+        responses = [result for result in race.results if isinstance(result, ProbeResponse)]
+        for provider, result in zip(providers, race.results):
+            if result is None or isinstance(result, ProbeCancelled):
+                continue
+            if isinstance(result, BaseException) and not responses:
+                continue
+            self.provider_health.record(provider, not ProviderHealth.failed(result))
+
+    def _provider_call(self, provider: str, probe: Probe):
+        """
+        Sub-flow sending one probe to a third-party provider through its circuit breaker
+        A failed attempt (see ProviderHealth.failed) is retried PROVIDER_RETRIES times after
+        a jittered backoff, deadline permitting. Returns the response, or None when the
+        provider is skipped or every attempt failed
+        """
+        if not self.provider_health.available(provider):
+            self.log(f"{provider} skipped: circuit open", "debug")
+            return None
+        for attempt in range(PROVIDER_RETRIES + 1):
+            if attempt:
+                delay = PROVIDER_RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                remaining = _remaining_timeout(None)
+                if remaining is not None and remaining <= delay:
+                    break
+                yield Pause(delay)
+            try:
+                result = yield probe
+            except Exception as e:
+                result = e
+            if not ProviderHealth.failed(result):
+                self.provider_health.record(provider, True)
+                return result
+            self.log(f"{provider} attempt {attempt + 1} failed: "
+                     f"{result if isinstance(result, BaseException) else result.status_code}", "debug")
+        self.provider_health.record(provider, False)
+        return None
+
+    def _complete_ip_info(self, ip_api_data: Optional[Dict] = None):
+        """Sub-flow of get_ip_info: IP type and registration country of self.ip_info, cached per IP"""
+        ip = self.ip_info['ip']
+        cached = self.cache.get('ip_info', ip) if self.cache else None
+        if cached:
+            self.log(f"Using cached IP information for {ip}", "debug")
+            self.ip_info = {**cached, **self.ip_info}
+            return self.ip_info
+
+        yield from self._detect_ip_type(ip_api_data)
+        if self.cache and self.ip_info.get('country_code', 'Unknown') != 'Unknown' \
+                and self.ip_info.get('ip_type', 'Unknown') != 'Unknown':
+            self.cache.set('ip_info', ip, self.ip_info, IP_INFO_CACHE_TTL)
         return self.ip_info
 
-    def _detect_ip_type(self):
-        """Detect IP type (native IP or broadcast IP)"""
+    def _detect_ip_type(self, data: Optional[Dict] = None):
+        """
+        Detect IP type (native IP or broadcast IP); sub-flow of get_ip_info
+        data: ip-api.com answer for this IP from get_ip_info's race (or the batch lookup).
+              ip-api.com is not asked again: without it the IP type stays Unknown
+        """
         try:
-            # Get more detailed IP information through ip-api.com
-            response = self.session.get(
-                f"http://ip-api.com/json/{self.ip_info.get('ip')}?fields=status,country,countryCode,region,regionName,city,isp,org,as,hosting,proxy,mobile",
-                timeout=TIMEOUT
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-
+            if data is not None:
                 # Determine if it's datacenter IP/proxy IP
                 is_hosting = data.get('hosting', False)
                 is_proxy = data.get('proxy', False)
@@ -249,44 +3206,55 @@ class UnlockChecker:
                 self.ip_info['usage_location'] = data.get('country', 'N/A')
 
                 # Registration location: Try to get IP block registration country from ASN
-                import re
                 as_info = data.get('as', '')
-                asn_match = re.search(r'AS(\d+)', as_info)
+                asn_match = ASN_NUMBER.search(as_info)
 
                 reg_country_code = ''
-                if asn_match:
+                # Offline RIR delegation data answers without any network call
+                if self.rir_index is not None:
+                    reg_country_code = self.rir_index.registration_country(
+                        self.ip_info.get('ip'), asn_match.group(1) if asn_match else None
+                    ) or ''
+
+                if asn_match and not reg_country_code:
                     asn_num = asn_match.group(1)
 
+                    # Registration countries already looked up are kept on disk
+                    cached_country = self.cache.get('asn_country', asn_num) if self.cache else None
+                    reg_country_code = cached_country or ''
+
                     # Method 1: Use HackerTarget API (most reliable, free)
                     # Returns format: "906","DMIT, US" - extract country code from end
-                    try:
-                        ht_response = self.session.get(
-                            f"https://api.hackertarget.com/aslookup/?q=AS{asn_num}",
+                    if not reg_country_code:
+                        ht_response = yield from self._provider_call('hackertarget', Probe(
+                            'GET', f"https://api.hackertarget.com/aslookup/?q=AS{asn_num}",
                             timeout=5
-                        )
-                        if ht_response.status_code == 200:
+                        ))
+                        if ht_response is not None and ht_response.status_code == 200:
                             ht_text = ht_response.text.strip().split('\n')[0]
                             if ht_text and 'error' not in ht_text.lower():
                                 # Extract 2-letter country code from end (e.g., "DMIT, US")
-                                import re
-                                match = re.search(r',\s*([A-Z]{2})"?\s*$', ht_text)
+                                match = HACKERTARGET_COUNTRY.search(ht_text)
                                 if match:
                                     reg_country_code = match.group(1)
-                    except:
-                        pass
+                            else:
+                                self.log(f"HackerTarget has no country for AS{asn_num}: {ht_text[:80]}", "debug")
 
                     # Method 2: Try BGPView API (fallback)
                     if not reg_country_code:
-                        try:
-                            asn_response = self.session.get(
-                                f"https://api.bgpview.io/asn/{asn_num}",
-                                timeout=5
-                            )
-                            if asn_response.status_code == 200:
+                        asn_response = yield from self._provider_call('bgpview', Probe(
+                            'GET', f"https://api.bgpview.io/asn/{asn_num}",
+                            timeout=5
+                        ))
+                        if asn_response is not None and asn_response.status_code == 200:
+                            try:
                                 asn_data = asn_response.json()
-                                reg_country_code = asn_data.get('data', {}).get('country_code', '')
-                        except:
-                            pass
+                                reg_country_code = asn_data.get('data', {}).get('country_code') or ''
+                            except (ValueError, AttributeError) as e:
+                                self.log(f"BGPView answer for AS{asn_num} unreadable: {e}", "debug")
+
+                    if reg_country_code and not cached_country and self.cache:
+                        self.cache.set('asn_country', asn_num, reg_country_code, ASN_CACHE_TTL)
 
                     # Method 3: Try well-known ASN mapping (fallback)
                     if not reg_country_code:
@@ -529,6 +3497,18 @@ class UnlockChecker:
 
         print()  # Empty line
 
+    def region_gate(self, service: str) -> Optional[Tuple[str, str, str]]:
+        """
+        Geolocation gate shared by the checks: the result for a service officially
+        unavailable in the exit IP's country (REGION_RESTRICTIONS), otherwise None
+        """
+        country_code = self.ip_info.get('country_code', '').upper()
+        if country_code in REGION_RESTRICTIONS.get(service, ()):
+            self.log(f"{service} not supported in {country_code} (geolocation check)", "debug")
+            return "failed", "N/A", "Region Restricted"
+        return None
+
+    @probe_flow
     def check_netflix(self) -> Tuple[str, str, str]:
         """
         Check Netflix unlock status
@@ -543,19 +3523,26 @@ class UnlockChecker:
         self.log("Checking Netflix...", "debug")
 
         try:
-            # Check Netflix original content
-            result1 = self.session.get(
-                "https://www.netflix.com/title/81280792",
-                timeout=TIMEOUT,
-                allow_redirects=True
-            )
-
-            # Check licensed content
-            result2 = self.session.get(
-                "https://www.netflix.com/title/70143836",
-                timeout=TIMEOUT,
-                allow_redirects=True
-            )
+            # Fetch original and licensed content concurrently, each read stops at "currentCountry"
+            result1, result2 = yield [
+                Probe(
+                    'GET', "https://www.netflix.com/title/81280792",
+                    until=NETFLIX_REGION_MARKER,
+                    max_bytes=NETFLIX_MAX_BYTES,
+                    timeout=TIMEOUT,
+                    allow_redirects=True
+                ),
+                Probe(
+                    'GET', "https://www.netflix.com/title/70143836",
+                    until=NETFLIX_REGION_MARKER,
+                    max_bytes=NETFLIX_MAX_BYTES,
+                    timeout=TIMEOUT,
+                    allow_redirects=True
+                ),
+            ]
+            for result in (result1, result2):
+                if isinstance(result, Exception):
+                    raise result
 
             # Check for region blocking (403/451 status codes)
             if (result1.status_code in [403, 451]) or (result2.status_code in [403, 451]):
@@ -566,27 +3553,25 @@ class UnlockChecker:
                 return "error", "N/A", "Server Error"
 
             # Check if both requests have no content
-            if not result1.text and not result2.text:
+            if not result1.content and not result2.content:
                 return "error", "N/A", "Network Error"
 
             # Extract region code from response
             # Look for "currentCountry" in the page HTML/JSON
-            import re
-            region1 = re.search(r'"currentCountry"\s*:\s*"([^"]+)"', result1.text)
-            region2 = re.search(r'"currentCountry"\s*:\s*"([^"]+)"', result2.text)
+            region1 = NETFLIX_REGION_MARKER.search(result1.content)
+            region2 = NETFLIX_REGION_MARKER.search(result2.content)
 
             region = None
-            if region1 and region1.group(1) != "null":
-                region = region1.group(1)
-            elif region2 and region2.group(1) != "null":
-                region = region2.group(1)
+            if region1 and region1.group(1) != b"null":
+                region = region1.group(1).decode('utf-8', 'replace')
+            elif region2 and region2.group(1) != b"null":
+                region = region2.group(1).decode('utf-8', 'replace')
             else:
                 region = self.ip_info.get('country_code', 'Unknown')
 
             # Check for error messages indicating unavailability
-            error_keywords = ["not available", "страница отсутствует", "page manquante", "not found"]
-            error1 = any(keyword in result1.text.lower() for keyword in error_keywords)
-            error2 = any(keyword in result2.text.lower() for keyword in error_keywords)
+            error1 = NETFLIX_ERROR_KEYWORDS.search(result1.content)
+            error2 = NETFLIX_ERROR_KEYWORDS.search(result2.content)
 
             # Determine unlock status:
             # 1. Both accessible -> Full unlock
@@ -609,6 +3594,7 @@ class UnlockChecker:
             self.log(f"Netflix check exception: {e}", "debug")
             return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_disney(self) -> Tuple[str, str, str]:
         """
         Check Disney+ unlock status using hybrid method
@@ -633,8 +3619,8 @@ class UnlockChecker:
             }
 
             try:
-                device_response = self.session.post(
-                    "https://disney.api.edge.bamgrid.com/devices",
+                device_response = yield Probe(
+                    'POST', "https://disney.api.edge.bamgrid.com/devices",
                     json=device_payload,
                     headers=device_headers,
                     timeout=TIMEOUT
@@ -655,8 +3641,8 @@ class UnlockChecker:
                             "subject_token_type": "urn:bamtech:params:oauth:token-type:device"
                         }
 
-                        token_response = self.session.post(
-                            "https://disney.api.edge.bamgrid.com/token",
+                        token_response = yield Probe(
+                            'POST', "https://disney.api.edge.bamgrid.com/token",
                             json=token_payload,
                             headers=device_headers,
                             timeout=TIMEOUT
@@ -676,8 +3662,8 @@ class UnlockChecker:
                                     "query": "query{getCurrentLocation{countryCode}inSupportedLocation}"
                                 }
 
-                                graphql_response = self.session.post(
-                                    "https://disney.api.edge.bamgrid.com/graph/v1/device/graphql",
+                                graphql_response = yield Probe(
+                                    'POST', "https://disney.api.edge.bamgrid.com/graph/v1/device/graphql",
                                     json=graphql_payload,
                                     headers=graphql_headers,
                                     timeout=TIMEOUT
@@ -700,31 +3686,31 @@ class UnlockChecker:
                                             return "failed", region, "Coming Soon"
                                         else:
                                             return "failed", "N/A", "Coming Soon"
-            except:
+            except Exception:
                 pass  # Fall through to web detection
 
             # Method 2: Fallback to web detection
-            response = self.session.get(
-                "https://www.disneyplus.com/",
+            response = yield Probe(
+                'GET', "https://www.disneyplus.com/",
                 timeout=TIMEOUT,
                 allow_redirects=True
             )
 
-            content_lower = response.text.lower()
+            found = DISNEY_WEB_KEYWORDS.scan(response.content)
 
             # Check for blocking
             if response.status_code == 403:
                 return "failed", "N/A", "Blocked"
 
             # Check for region restriction messages
-            if "not available in your region" in content_lower or \
-               "not available in your country" in content_lower or \
-               "unavailable" in content_lower:
+            if "not available in your region" in found or \
+               "not available in your country" in found or \
+               "unavailable" in found:
                 return "failed", "N/A", "Blocked"
 
             # Check if successful access
             if response.status_code == 200:
-                if "disney" in content_lower or "disneyplus" in content_lower:
+                if "disney" in found or "disneyplus" in found:
                     return "success", self.ip_info.get('country_code', 'Unknown'), "Full Access"
                 else:
                     return "failed", "N/A", "Blocked"
@@ -737,6 +3723,7 @@ class UnlockChecker:
             self.log(f"Disney+ check exception: {e}", "debug")
             return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_youtube_premium(self) -> Tuple[str, str, str]:
         """
         Check YouTube Premium availability
@@ -746,16 +3733,16 @@ class UnlockChecker:
 
         try:
             # Check YouTube Premium page with redirect following
-            response = self.session.get(
-                "https://www.youtube.com/premium",
+            response = yield Probe(
+                'GET', "https://www.youtube.com/premium",
                 timeout=TIMEOUT,
                 allow_redirects=True
             )
 
-            content_lower = response.text.lower()
+            found = YOUTUBE_KEYWORDS.scan(response.content)
 
             # Check if response is empty
-            if not response.text:
+            if not response.content:
                 return "error", "N/A", "Network Error"
 
             # Check for blocking (403)
@@ -763,16 +3750,16 @@ class UnlockChecker:
                 return "failed", "N/A", "Blocked"
 
             # Check for explicit region restriction messages
-            if "not available in your country" in content_lower or \
-               "not available in your region" in content_lower or \
-               "unavailable in your" in content_lower:
+            if "not available in your country" in found or \
+               "not available in your region" in found or \
+               "unavailable in your" in found:
                 return "failed", "N/A", "Blocked"
 
             # Check if Premium is available (more lenient check)
             if response.status_code in [200, 301, 302]:
                 # If status is OK and no explicit error, check for YouTube content
-                if "youtube" in content_lower or "premium" in content_lower or \
-                   "subscribe" in content_lower or len(response.text) > 1000:
+                if "youtube" in found or "premium" in found or \
+                   "subscribe" in found or len(response.content) > 1000:
                     return "success", self.ip_info.get('country_code', 'Unknown'), "Full Access"
                 else:
                     return "error", "N/A", "Detection Failed"
@@ -785,6 +3772,7 @@ class UnlockChecker:
             self.log(f"YouTube Premium check exception: {e}", "debug")
             return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_chatgpt(self) -> Tuple[str, str, str]:
         """
         Check ChatGPT/OpenAI accessibility
@@ -794,41 +3782,15 @@ class UnlockChecker:
         """
         self.log("Checking ChatGPT/OpenAI...", "debug")
 
-        # ChatGPT/OpenAI unsupported regions (based on official documentation)
-        # https://platform.openai.com/docs/supported-countries
-        UNSUPPORTED_REGIONS = [
-            'CN',  # China
-            'HK',  # Hong Kong
-            'RU',  # Russia
-            'IR',  # Iran
-            'KP',  # North Korea
-            'SY',  # Syria
-            'CU',  # Cuba
-            'BY',  # Belarus
-            'VE',  # Venezuela
-            # Add more based on official docs
-        ]
-
         # Step 0: Check geolocation first (most reliable)
-        country_code = self.ip_info.get('country_code', '').upper()
-
-        if country_code in UNSUPPORTED_REGIONS:
-            self.log(f"ChatGPT not supported in {country_code} (geolocation check)", "debug")
-            return "failed", "N/A", "Region Restricted"
-
-        api_result = None
-        has_cloudflare = False
-
-        # Step 1: Check API endpoint
-        try:
-            api_response = self.session.get(
-                "https://api.openai.com/v1/models",
-                timeout=TIMEOUT,
-                headers={'Content-Type': 'application/json'}
-            )
+        gated = self.region_gate('chatgpt')
+        if gated:
+            return gated
 
+        def api_outcome(api_response):
+            """Step 1: classify API endpoint -> api_result tuple, "cloudflare" or None"""
             if api_response.status_code == 401 or api_response.status_code == 400:
-                api_result = ("success", "Full Access")
+                return ("success", "Full Access")
             elif api_response.status_code == 403:
                 try:
                     error_data = api_response.json()
@@ -838,43 +3800,56 @@ class UnlockChecker:
                         error_msg = error_info.get('message', '').lower()
 
                         if error_code == 'unsupported_country_region_territory':
-                            api_result = ("failed", "Region Restricted")
+                            return ("failed", "Region Restricted")
                         elif any(keyword in error_msg for keyword in ['country', 'region', 'territory']):
-                            api_result = ("failed", "Region Restricted")
+                            return ("failed", "Region Restricted")
                         else:
-                            api_result = ("failed", "Access Denied")
+                            return ("failed", "Access Denied")
                     else:
-                        api_result = ("failed", "Access Denied")
-                except:
+                        return ("failed", "Access Denied")
+                except Exception:
                     # Check if API returned Cloudflare
-                    if "cloudflare" in api_response.text.lower() or "attention required" in api_response.text.lower():
-                        has_cloudflare = True
+                    found = CHATGPT_CLOUDFLARE_KEYWORDS.scan(api_response.content)
+                    if "cloudflare" in found or "attention required" in found:
+                        return "cloudflare"
                     else:
-                        api_result = ("failed", "Region Restricted")
+                        return ("failed", "Region Restricted")
             elif api_response.status_code == 451:
-                api_result = ("failed", "Region Restricted")
-        except:
-            pass
+                return ("failed", "Region Restricted")
+            return None
 
-        # Step 2: Check web endpoint if needed
-        if not has_cloudflare and not (api_result and "Region Restricted" in api_result[1]):
-            try:
-                web_response = self.session.get(
-                    "https://chatgpt.com/",
+        def web_outcome(web_response):
+            """Step 2: classify web endpoint -> "cloudflare" or None"""
+            # Check for Cloudflare challenge
+            if web_response.status_code in [403, 503]:
+                found = CHATGPT_CLOUDFLARE_KEYWORDS.scan(web_response.content)
+                if "just a moment" in found or "checking your browser" in found or "attention required" in found:
+                    return "cloudflare"
+            return None
+
+        # API and web endpoints are raced: an API region restriction or an API success
+        # settles the result on its own, so the web probe is cancelled in that case
+        api_outcome_value, web_outcome_value = yield Race(
+            [
+                Probe(
+                    'GET', "https://api.openai.com/v1/models",
+                    classify=api_outcome,
+                    timeout=TIMEOUT,
+                    headers={'Content-Type': 'application/json'}
+                ),
+                Probe(
+                    'GET', "https://chatgpt.com/",
+                    classify=web_outcome,
                     timeout=TIMEOUT,
                     allow_redirects=True,
                     headers={'Cache-Control': 'no-cache'}
-                )
-
-                content_lower = web_response.text.lower()
-
-                # Check for Cloudflare challenge
-                if web_response.status_code in [403, 503]:
-                    if "just a moment" in content_lower or "checking your browser" in content_lower or "attention required" in content_lower:
-                        has_cloudflare = True
+                ),
+            ],
+            decisive={("failed", "Region Restricted"), ("success", "Full Access")}
+        )
 
-            except:
-                pass
+        has_cloudflare = "cloudflare" in (api_outcome_value, web_outcome_value)
+        api_result = api_outcome_value if isinstance(api_outcome_value, tuple) else None
 
         # Step 3: Intelligent decision based on priority
         # Priority 1: Explicit region restriction from API
@@ -899,6 +3874,7 @@ class UnlockChecker:
         # Fallback
         return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_claude(self) -> Tuple[str, str, str]:
         """
         Check Claude AI accessibility - Web detection first, API as secondary
@@ -907,79 +3883,75 @@ class UnlockChecker:
         """
         self.log("Checking Claude AI...", "debug")
 
-        # Claude unsupported regions (based on official documentation)
-        UNSUPPORTED_REGIONS = ['CN', 'HK', 'RU', 'IR', 'KP', 'SY', 'CU', 'BY']
-
         # Step 0: Check geolocation first
-        country_code = self.ip_info.get('country_code', '').upper()
-        if country_code in UNSUPPORTED_REGIONS:
-            return "failed", "N/A", "Region Restricted"
-
-        api_result = None
-        web_result = None
-        web_accessible = False
-        has_cloudflare = False
-
-        # Step 1: Check web endpoint FIRST (this is what users actually access)
-        try:
-            web_response = self.session.get(
-                "https://claude.ai/",
-                timeout=TIMEOUT,
-                allow_redirects=True,
-                headers={'Cache-Control': 'no-cache'}
-            )
+        gated = self.region_gate('claude')
+        if gated:
+            return gated
 
-            content = web_response.text
-            content_lower = content.lower()
+        def web_outcome(web_response):
+            """
+            Step 1: classify web endpoint (this is what users actually access)
+            Returns: "region_restricted", "cloudflare", "accessible" or None
+            """
+            found = CLAUDE_WEB_KEYWORDS.scan(web_response.content)
 
             # Check for region restriction indicators
-            restriction_keywords = [
-                "unavailable in your country", "unavailable in your region",
-                "<title>claude - unavailable</title>",
-                "not available", "not supported", "access denied"
-            ]
-            if any(kw in content_lower for kw in restriction_keywords):
-                web_result = "region_restricted"
-            elif "應用程式不可用" in content or "僅在特定地區提供服務" in content:
-                web_result = "region_restricted"
+            if any(kw in found for kw in CLAUDE_RESTRICTION_KEYWORDS):
+                return "region_restricted"
 
             # Check for Cloudflare challenge
             if web_response.status_code in [403, 503]:
-                if any(kw in content_lower for kw in ["just a moment", "checking your browser", "cloudflare"]):
-                    has_cloudflare = True
+                if any(kw in found for kw in CLAUDE_CLOUDFLARE_KEYWORDS):
+                    return "cloudflare"
 
             # Positive verification: check if page loads normally
-            if web_response.status_code == 200 and not web_result:
-                if any(kw in content_lower for kw in ["claude", "anthropic", "sign in", "log in", "sign up"]):
-                    web_accessible = True
-
-        except:
-            pass
-
-        # Step 2: Check API endpoint as secondary verification
-        try:
-            api_response = self.session.post(
-                "https://api.anthropic.com/v1/messages",
-                timeout=TIMEOUT,
-                headers={
-                    'Content-Type': 'application/json',
-                    'anthropic-version': '2023-06-01',
-                    'x-api-key': 'invalid'
-                }
-            )
-
+            if web_response.status_code == 200:
+                if any(kw in found for kw in CLAUDE_PAGE_KEYWORDS):
+                    return "accessible"
+            return None
+
+        def api_outcome(api_response):
+            """
+            Step 2: classify API endpoint as secondary verification
+            Returns: "success", "region_restricted", "access_denied" or None
+            """
             if api_response.status_code in [401, 400]:
-                api_result = "success"
+                return "success"
             elif api_response.status_code == 403:
-                error_msg = api_response.text.lower()
-                if any(kw in error_msg for kw in ["request not allowed", "region", "country", "territory", "forbidden"]):
-                    api_result = "region_restricted"
+                if CLAUDE_API_BLOCK_KEYWORDS.search(api_response.content):
+                    return "region_restricted"
                 else:
-                    api_result = "access_denied"
+                    return "access_denied"
             elif api_response.status_code == 451:
-                api_result = "region_restricted"
-        except:
-            pass
+                return "region_restricted"
+            return None
+
+        # Web and API endpoints are raced: a region restriction from either one
+        # is final, so the other probe is cancelled as soon as one reports it
+        web_result, api_result = yield Race(
+            [
+                Probe(
+                    'GET', "https://claude.ai/",
+                    classify=web_outcome,
+                    timeout=TIMEOUT,
+                    allow_redirects=True,
+                    headers={'Cache-Control': 'no-cache'}
+                ),
+                Probe(
+                    'POST', "https://api.anthropic.com/v1/messages",
+                    classify=api_outcome,
+                    timeout=TIMEOUT,
+                    headers={
+                        'Content-Type': 'application/json',
+                        'anthropic-version': '2023-06-01',
+                        'x-api-key': 'invalid'
+                    }
+                ),
+            ],
+            decisive={"region_restricted"}
+        )
+        web_accessible = web_result == "accessible"
+        has_cloudflare = web_result == "cloudflare"
 
         # Step 3: Decision based on BOTH web and API results
 
@@ -1009,6 +3981,7 @@ class UnlockChecker:
         # Cannot determine
         return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_tiktok(self) -> Tuple[str, str, str]:
         """
         Check TikTok region restrictions using IPQuality approach
@@ -1017,37 +3990,41 @@ class UnlockChecker:
         self.log("Checking TikTok...", "debug")
 
         try:
-            # First attempt: Get TikTok homepage
-            response = self.session.get(
-                "https://www.tiktok.com/",
+            # First attempt: Get TikTok homepage (read stops at "region")
+            response = yield Probe(
+                'GET', "https://www.tiktok.com/",
+                until=TIKTOK_REGION_MARKER,
+                max_bytes=TIKTOK_MAX_BYTES,
                 timeout=TIMEOUT,
                 allow_redirects=True
             )
 
             # Check if response is empty
-            if not response.text:
+            if not response.content:
                 return "error", "N/A", "Network Error"
 
             # Try to extract region from response (IPQuality method)
-            import re
-            region_match = re.search(r'"region"\s*:\s*"([^"]+)"', response.text)
-            region = region_match.group(1) if region_match else None
-
-            # If no region found, try with gzip compression
-            if not region:
-                response = self.session.get(
-                    "https://www.tiktok.com/",
+            region_match = TIKTOK_REGION_MARKER.search(response.content)
+            region = region_match.group(1).decode('utf-8', 'replace') if region_match else None
+
+            # If no region found in a body we could not decode (e.g. brotli), try with gzip compression
+            content_encoding = response.headers.get('content-encoding', 'identity').lower()
+            if not region and content_encoding not in ('identity', 'gzip', 'x-gzip', 'deflate'):
+                response = yield Probe(
+                    'GET', "https://www.tiktok.com/",
+                    until=TIKTOK_REGION_MARKER,
+                    max_bytes=TIKTOK_MAX_BYTES,
                     headers={"Accept-Encoding": "gzip"},
                     timeout=TIMEOUT,
                     allow_redirects=True
                 )
-                region_match = re.search(r'"region"\s*:\s*"([^"]+)"', response.text)
-                region = region_match.group(1) if region_match else None
+                region_match = TIKTOK_REGION_MARKER.search(response.content)
+                region = region_match.group(1).decode('utf-8', 'replace') if region_match else None
 
-            content_lower = response.text.lower()
+            found = TIKTOK_KEYWORDS.scan(response.content)
 
             # Check for anti-bot mechanism (Access Denied)
-            if "access denied" in content_lower:
+            if "access denied" in found:
                 # Check if country is known to block TikTok
                 country_code = self.ip_info.get('country_code', 'Unknown')
                 # TikTok is blocked in: China (CN), India (IN)
@@ -1058,9 +4035,9 @@ class UnlockChecker:
                     return "partial", country_code, "Likely Available(Manual Check)"
 
             # Check for explicit region restriction messages
-            if "not available in your region" in content_lower or \
-               "not available in your country" in content_lower or \
-               "region unavailable" in content_lower:
+            if "not available in your region" in found or \
+               "not available in your country" in found or \
+               "region unavailable" in found:
                 return "failed", "N/A", "Region Restricted"
 
             # If region was successfully extracted, TikTok is available
@@ -1068,7 +4045,7 @@ class UnlockChecker:
                 return "success", region, "Full Access"
 
             # Fallback: Check if TikTok content is present
-            if "tiktok" in content_lower or len(response.text) > 1000:
+            if "tiktok" in found or len(response.content) > 1000:
                 region = self.ip_info.get('country_code', 'Unknown')
                 return "success", region, "Full Access"
             else:
@@ -1080,6 +4057,7 @@ class UnlockChecker:
             self.log(f"TikTok check exception: {e}", "debug")
             return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_imgur(self) -> Tuple[str, str, str]:
         """
         Check Imgur accessibility
@@ -1088,20 +4066,22 @@ class UnlockChecker:
         self.log("Checking Imgur...", "debug")
 
         try:
-            # Check Imgur homepage
-            response = self.session.get(
-                "https://imgur.com/",
+            # Check Imgur homepage (read stops at the first blocking keyword)
+            response = yield Probe(
+                'GET', "https://imgur.com/",
+                until=IMGUR_BLOCK_MARKER,
+                max_bytes=IMGUR_MAX_BYTES,
                 timeout=TIMEOUT,
                 allow_redirects=True
             )
 
-            content_lower = response.text.lower()
+            found = IMGUR_KEYWORDS.scan(response.content)
 
             # Check for region restriction messages
-            if "not available in your region" in content_lower or "not available in your country" in content_lower:
+            if "not available in your region" in found or "not available in your country" in found:
                 return "failed", "N/A", "Not Available in This Region"
 
-            if "not available" in content_lower or "blocked" in content_lower:
+            if "not available" in found or "blocked" in found:
                 return "failed", "N/A", "Not Available in This Region"
 
             # 403/451 usually means region blocked
@@ -1114,21 +4094,21 @@ class UnlockChecker:
 
             # Check if Imgur is accessible (200 with Imgur content)
             if response.status_code == 200:
-                if "imgur" in content_lower:
+                if "imgur" in found:
                     return "success", self.ip_info.get('country_code', 'Unknown'), "Full Access"
                 else:
                     return "failed", "N/A", "Service Unavailable"
 
             # If main domain fails, try image domain
             try:
-                alt_response = self.session.get(
-                    "https://i.imgur.com/",
+                alt_response = yield Probe(
+                    'GET', "https://i.imgur.com/",
                     timeout=TIMEOUT,
                     allow_redirects=True
                 )
                 if alt_response.status_code == 200:
                     return "success", self.ip_info.get('country_code', 'Unknown'), "Full Access"
-            except:
+            except Exception:
                 pass
 
             return "error", "N/A", f"Detection Failed ({response.status_code})"
@@ -1141,6 +4121,7 @@ class UnlockChecker:
             self.log(f"Imgur check exception: {e}", "debug")
             return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_reddit(self) -> Tuple[str, str, str]:
         """
         Check Reddit accessibility
@@ -1149,24 +4130,26 @@ class UnlockChecker:
         self.log("Checking Reddit...", "debug")
 
         try:
-            # Check Reddit homepage
-            response = self.session.get(
-                "https://www.reddit.com/",
+            # Check Reddit homepage (read stops at a region restriction message)
+            response = yield Probe(
+                'GET', "https://www.reddit.com/",
+                until=REDDIT_BLOCK_MARKER,
+                max_bytes=REDDIT_MAX_BYTES,
                 timeout=TIMEOUT,
                 allow_redirects=True
             )
 
-            content_lower = response.text.lower()
+            found = REDDIT_KEYWORDS.scan(response.content)
 
             # Check for region restriction messages
-            if "not available in your region" in content_lower or "not available in your country" in content_lower:
+            if "not available in your region" in found or "not available in your country" in found:
                 return "failed", "N/A", "Not Available in This Region"
 
             # Check for blocked/banned messages
-            if "blocked by network security" in content_lower or "blocked by mistake" in content_lower:
+            if "blocked by network security" in found or "blocked by mistake" in found:
                 return "partial", self.ip_info.get('country_code', 'Unknown'), "Limited Access (Login Required)"
 
-            if "blocked" in content_lower or "banned" in content_lower:
+            if "blocked" in found or "banned" in found:
                 return "failed", "N/A", "Not Available in This Region"
 
             # 403/451 usually means region blocked or IP restricted
@@ -1176,9 +4159,9 @@ class UnlockChecker:
 
             # Check if Reddit is accessible (200 with Reddit content)
             if response.status_code == 200:
-                if "reddit" in content_lower:
+                if "reddit" in found:
                     # Check for location-based content restrictions
-                    if "over18" in response.url or "location_blocking" in content_lower:
+                    if "over18" in response.url or "location_blocking" in found:
                         return "partial", self.ip_info.get('country_code', 'Unknown'), "Partially Restricted"
                     return "success", self.ip_info.get('country_code', 'Unknown'), "Full Access"
                 else:
@@ -1192,6 +4175,7 @@ class UnlockChecker:
             self.log(f"Reddit check exception: {e}", "debug")
             return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_gemini(self) -> Tuple[str, str, str]:
         """
         Check Google Gemini AI accessibility
@@ -1201,44 +4185,15 @@ class UnlockChecker:
         """
         self.log("Checking Google Gemini...", "debug")
 
-        # Gemini unsupported regions (based on official documentation)
-        # https://ai.google.dev/gemini-api/docs/available-regions
-        UNSUPPORTED_REGIONS = [
-            'CN',  # China
-            'HK',  # Hong Kong
-            'MO',  # Macau
-            'CU',  # Cuba
-            'IR',  # Iran
-            'KP',  # North Korea
-            'RU',  # Russia
-            'BY',  # Belarus
-            'SY',  # Syria
-            'VE',  # Venezuela
-            # Add more based on official docs
-        ]
-
         # Step 0: Check geolocation first (most reliable for Gemini)
-        country_code = self.ip_info.get('country_code', '').upper()
-
-        if country_code in UNSUPPORTED_REGIONS:
-            self.log(f"Gemini not supported in {country_code} (geolocation check)", "debug")
-            return "failed", "N/A", "Region Restricted"
-
-        api_result = None
-        web_result = None
-        static_result = None
-        studio_result = None
-
-        # Step 1: Check API endpoint
-        try:
-            api_response = self.session.get(
-                "https://generativelanguage.googleapis.com/v1beta/models",
-                timeout=TIMEOUT,
-                headers={'Content-Type': 'application/json'}
-            )
+        gated = self.region_gate('gemini')
+        if gated:
+            return gated
 
+        def api_outcome(api_response):
+            """Step 1: classify API endpoint"""
             if api_response.status_code == 401 or api_response.status_code == 400:
-                api_result = ("success", "Full Access")
+                return ("success", "Full Access")
             elif api_response.status_code == 403:
                 try:
                     error_data = api_response.json()
@@ -1250,89 +4205,88 @@ class UnlockChecker:
                         # PERMISSION_DENIED with API Key = service available
                         if error_status == 'PERMISSION_DENIED':
                             if 'api key' in error_msg or 'unregistered callers' in error_msg or 'established identity' in error_msg:
-                                api_result = ("success", "Full Access")
+                                return ("success", "Full Access")
                             else:
-                                api_result = ("failed", "Access Denied")
+                                return ("failed", "Access Denied")
                         # Check for region restriction
                         elif any(keyword in error_msg for keyword in ['country', 'region', 'territory', 'not available', 'not supported']):
-                            api_result = ("failed", "Region Restricted")
+                            return ("failed", "Region Restricted")
                         else:
-                            api_result = ("failed", "Access Denied")
+                            return ("failed", "Access Denied")
                     else:
-                        api_result = ("failed", "Access Denied")
-                except:
+                        return ("failed", "Access Denied")
+                except Exception:
                     # 403 but not JSON response = likely region restriction
-                    api_result = ("failed", "Region Restricted")
+                    return ("failed", "Region Restricted")
             elif api_response.status_code == 451:
-                api_result = ("failed", "Region Restricted")
-        except:
-            pass
-
-        # Step 2: Check web endpoint
-        try:
-            web_response = self.session.get(
-                "https://gemini.google.com/",
-                timeout=TIMEOUT,
-                allow_redirects=True
-            )
+                return ("failed", "Region Restricted")
+            return None
 
-            content_lower = web_response.text.lower()
+        def web_outcome(web_response):
+            """Step 2: classify web endpoint"""
+            found = GEMINI_WEB_KEYWORDS.scan(web_response.content)
 
             # Check for 403 - region restriction
             if web_response.status_code == 403:
-                if "access denied" in content_lower:
-                    web_result = ("failed", "Region Restricted")
+                if "access denied" in found:
+                    return ("failed", "Region Restricted")
                 else:
-                    web_result = ("failed", "Access Denied")
+                    return ("failed", "Access Denied")
             # Check for explicit region restriction messages
-            elif "supported in your country" in content_lower or "not available in your country" in content_lower:
-                web_result = ("failed", "Region Restricted")
+            elif "supported in your country" in found or "not available in your country" in found:
+                return ("failed", "Region Restricted")
             elif web_response.status_code == 200:
                 # Check if it has actual Gemini app interface (not error page)
-                if any(keyword in content_lower for keyword in ["sign in", "get started", "continue with google", "chat with gemini"]):
-                    web_result = ("success", "Full Access")
-        except:
-            pass
-
-        # Step 3: Check static resources (only skip if already confirmed region restriction)
-        region_confirmed = (
-            (api_result and api_result[0] == "failed" and "Region Restricted" in api_result[1]) or
-            (web_result and web_result[0] == "failed" and "Region Restricted" in web_result[1])
-        )
-
-        if not region_confirmed:
-            try:
-                static_response = self.session.get(
-                    "https://www.gstatic.com/lamda/images/gemini_sparkle_v002_d4735304ff6292a690345.svg",
+                if any(keyword in found for keyword in GEMINI_WEB_PAGE_KEYWORDS):
+                    return ("success", "Full Access")
+            return None
+
+        def static_outcome(static_response):
+            """Step 3: classify static resources"""
+            if static_response.status_code == 403:
+                return ("failed", "Region Restricted")
+            elif static_response.status_code == 200:
+                return ("success", "Full Access")
+            return None
+
+        def studio_outcome(studio_response):
+            """Step 4: classify AI Studio"""
+            if studio_response.status_code == 403:
+                return ("failed", "Region Restricted")
+            elif studio_response.status_code in [200, 302]:
+                return ("success", "Full Access")
+            return None
+
+        # All four endpoints are raced: the first confirmed region restriction
+        # decides the result and cancels the probes still in flight
+        api_result, web_result, static_result, studio_result = yield Race(
+            [
+                Probe(
+                    'GET', "https://generativelanguage.googleapis.com/v1beta/models",
+                    classify=api_outcome,
+                    timeout=TIMEOUT,
+                    headers={'Content-Type': 'application/json'}
+                ),
+                Probe(
+                    'GET', "https://gemini.google.com/",
+                    classify=web_outcome,
+                    timeout=TIMEOUT,
+                    allow_redirects=True
+                ),
+                Probe(
+                    'GET', "https://www.gstatic.com/lamda/images/gemini_sparkle_v002_d4735304ff6292a690345.svg",
+                    classify=static_outcome,
                     timeout=TIMEOUT
-                )
-                if static_response.status_code == 403:
-                    static_result = ("failed", "Region Restricted")
-                elif static_response.status_code == 200:
-                    static_result = ("success", "Full Access")
-            except:
-                pass
-
-        # Step 4: Check AI Studio (only skip if already confirmed region restriction)
-        region_confirmed = (
-            (api_result and api_result[0] == "failed" and "Region Restricted" in api_result[1]) or
-            (web_result and web_result[0] == "failed" and "Region Restricted" in web_result[1]) or
-            (static_result and static_result[0] == "failed" and "Region Restricted" in static_result[1])
-        )
-
-        if not region_confirmed:
-            try:
-                studio_response = self.session.get(
-                    "https://aistudio.google.com/app/prompts/new_chat",
+                ),
+                Probe(
+                    'GET', "https://aistudio.google.com/app/prompts/new_chat",
+                    classify=studio_outcome,
                     timeout=TIMEOUT,
                     allow_redirects=False
-                )
-                if studio_response.status_code == 403:
-                    studio_result = ("failed", "Region Restricted")
-                elif studio_response.status_code in [200, 302]:
-                    studio_result = ("success", "Full Access")
-            except:
-                pass
+                ),
+            ],
+            decisive={("failed", "Region Restricted")}
+        )
 
         # Step 5: Intelligent decision based on priority
         # Priority 1: Any explicit region restriction
@@ -1362,6 +4316,7 @@ class UnlockChecker:
         # Fallback
         return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_spotify(self) -> Tuple[str, str, str]:
         """
         Check Spotify availability using signup API
@@ -1397,19 +4352,19 @@ class UnlockChecker:
                 "Referer": "https://www.spotify.com/"
             }
 
-            response = self.session.post(
-                "https://spclient.wg.spotify.com/signup/public/v1/account",
+            response = yield Probe(
+                'POST', "https://spclient.wg.spotify.com/signup/public/v1/account",
                 data=signup_data,
                 headers=headers,
                 timeout=TIMEOUT
             )
 
             # Check if response is empty
-            if not response.text:
+            if not response.content:
                 return "error", "N/A", "Network Error"
 
             # Check for Access denied (anti-bot)
-            if "access denied" in response.text.lower():
+            if SPOTIFY_BLOCK_KEYWORDS.search(response.content):
                 # Spotify is not available in some regions (e.g., China)
                 # However, due to anti-bot, cannot accurately detect
                 # Show "Likely Available" for all regions
@@ -1419,7 +4374,7 @@ class UnlockChecker:
             # Parse JSON response
             try:
                 data = response.json()
-            except:
+            except Exception:
                 return "error", "N/A", "Detection Failed"
 
             # Extract key fields
@@ -1447,6 +4402,7 @@ class UnlockChecker:
             self.log(f"Spotify check exception: {e}", "debug")
             return "error", "N/A", "Detection Failed"
 
+    @probe_flow
     def check_scholar(self) -> Tuple[str, str, str]:
         """
         Check Google Scholar accessibility
@@ -1456,16 +4412,16 @@ class UnlockChecker:
 
         try:
             # Check Google Scholar homepage
-            response = self.session.get(
-                "https://scholar.google.com/",
+            response = yield Probe(
+                'GET', "https://scholar.google.com/",
                 timeout=TIMEOUT,
                 allow_redirects=True
             )
 
-            content_lower = response.text.lower()
+            found = SCHOLAR_KEYWORDS.scan(response.content)
 
             # Check for region restriction messages
-            if "not available in your region" in content_lower or "not available in your country" in content_lower:
+            if "not available in your region" in found or "not available in your country" in found:
                 return "failed", "N/A", "Not Available in This Region"
 
             # Check if redirected to sorry page (CAPTCHA/verification)
@@ -1473,7 +4429,7 @@ class UnlockChecker:
                 return "partial", self.ip_info.get('country_code', 'Unknown'), "Limited Access (Robot)"
 
             # Check for unusual traffic detection or CAPTCHA
-            if "unusual traffic" in content_lower or "captcha" in content_lower:
+            if "unusual traffic" in found or "captcha" in found:
                 return "partial", self.ip_info.get('country_code', 'Unknown'), "Limited Access (Robot)"
 
             # 403 usually means IP blocked
@@ -1486,7 +4442,7 @@ class UnlockChecker:
 
             # Check if Google Scholar is accessible (200 with Scholar content)
             if response.status_code == 200:
-                if "scholar" in content_lower and "google" in content_lower:
+                if "scholar" in found and "google" in found:
                     return "success", self.ip_info.get('country_code', 'Unknown'), "Full Access"
                 else:
                     return "failed", "N/A", "Service Unavailable"
@@ -1502,9 +4458,7 @@ class UnlockChecker:
     @staticmethod
     def strip_ansi_codes(text: str) -> str:
         """Remove ANSI color codes from text"""
-        import re
-        ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
-        return ansi_escape.sub('', text)
+        return ANSI_ESCAPE.sub('', text)
 
     @staticmethod
     def get_display_width(text: str) -> int:
@@ -1528,7 +4482,8 @@ class UnlockChecker:
             return text + ' ' * (target_width - current_width)
         return text
 
-    def format_result(self, service_name: str, status: str, region: str, detail: str):
+    def format_result(self, service_name: str, status: str, region: str, detail: str, cached: bool = False,
+                      unlock_type: Optional[str] = None):
         """Format output for individual check result with aligned columns using fixed widths
 
         警告：此函数使用固定的列宽常量来确保表格对齐
@@ -1557,15 +4512,16 @@ class UnlockChecker:
         detail_colored = f"{status_color}{detail_padded}{Style.RESET_ALL}"
 
         # Column 4: Unlock type label (使用固定列宽常量)
-        # Note: DNS unlock detection is currently disabled to avoid false positives from CDN services
-        # In the future, this could call check_dns_unlock() for each service domain
+        # unlock_type comes from adns_unlock(); undetermined counts as native
         unlock_type_text = ""
         unlock_type_color = ""
         if status == "success":
-            # Currently always show native unlock
-            # TODO: Implement proper DNS unlock detection by calling check_dns_unlock() for each service
-            unlock_type_text = "原生"
-            unlock_type_color = Fore.GREEN
+            if unlock_type == "dns":
+                unlock_type_text = "DNS"
+                unlock_type_color = Fore.YELLOW
+            else:
+                unlock_type_text = "原生"
+                unlock_type_color = Fore.GREEN
 
         # Pad unlock type to fixed width, then add color
         unlock_type_padded = self.pad_to_width(unlock_type_text, COLUMN_WIDTH_UNLOCK_TYPE)
@@ -1581,42 +4537,188 @@ class UnlockChecker:
             region_colored = self.pad_to_width("", COLUMN_WIDTH_REGION)
 
         # Print aligned columns (always include region column separator for consistent alignment)
-        print(f"{icon} {service_formatted} {detail_colored} : {unlock_type_padded}: {region_colored}")
+        cached_mark = f" {Style.DIM}(cached){Style.RESET_ALL}" if cached else ""
+        print(f"{icon} {service_formatted} {detail_colored} : {unlock_type_padded}: {region_colored}{cached_mark}")
+
+    def _result_key(self, service: str) -> Optional[str]:
+        """
+        Result cache key: exit IP, address family, resolver and service
+        The resolver matters as much as the IP: a DNS unlock answers the same names with
+        other addresses. Through a proxy the proxy resolves them, whatever this host uses
+        """
+        ip = self.ip_info.get('ip')
+        if self.cache is None or not ip or ip == 'N/A':
+            return None
+        family = {socket.AF_INET: 'ipv4', socket.AF_INET6: 'ipv6'}.get(self.family, 'any')
+        resolver = 'proxy' if self.proxy else ','.join(sorted(DNSStub.system_nameservers())) or 'unknown'
+        return f"{ip}|{family}|{resolver}|{service}"
+
+    @staticmethod
+    def result_ttl(status: str, detail: str) -> float:
+        """
+        Seconds a result stays valid: definitive yes/no outcomes long, everything else short
+        A "failed" result is only definitive for the blocks in DEFINITIVE_BLOCKS; rate limits,
+        outages and access-denied pages may be gone on the next try
+        """
+        if status == "success":
+            uncertain = any(word in detail.lower() for word in ('manual', 'verify', 'timeout', 'rate limited'))
+            return RESULT_TTL_UNSTABLE if uncertain else RESULT_TTL_STABLE
+        if status == "failed" and detail in DEFINITIVE_BLOCKS:
+            return RESULT_TTL_STABLE
+        return RESULT_TTL_UNSTABLE
+
+    def cached_result(self, service: str) -> Optional[Tuple[str, str, str]]:
+        """(status, region, detail) of a still valid result for the current exit IP"""
+        key = self._result_key(service)
+        if key is None or self.fresh:
+            return None
+        hit = self.cache.get('result', key)
+        return tuple(hit) if hit else None
+
+    def store_result(self, service: str, status: str, region: str, detail: str):
+        key = self._result_key(service)
+        if key is not None:
+            self.cache.set('result', key, [status, region, detail], self.result_ttl(status, detail))
+
+    def _safe_check(self, service_name: str, check_func) -> Tuple[str, str, str]:
+        """Run one check, turning unexpected exceptions into an error result"""
+        try:
+            return check_func()
+        except Exception as e:
+            self.log(f"{service_name} check exception: {e}", "debug")
+            return "error", "N/A", "Detection Failed"
+
+    def _check_service(self, key: str, name: str, method: str, run_end: Optional[float] = None) -> CheckResult:
+        """One check on the blocking transport, bounded by its service_deadline() and run_end (monotonic)"""
+        started = time.monotonic()
+        sink = []
+        end = self._check_end(started, self.service_deadline(key), run_end)
+        sink_token = _timings_sink.set(sink)
+        deadline_token = _deadline.set(end)
+        try:
+            outcome = self._safe_check(name, getattr(self, method))
+        finally:
+            _deadline.reset(deadline_token)
+            _timings_sink.reset(sink_token)
+        return self._finish_check(key, name, outcome, started, end, sink)
+
+    @staticmethod
+    def _check_end(started: float, limit: float, run_end: Optional[float] = None) -> float:
+        """Deadline of one check: its own limit, or the run's deadline (_deadline) if sooner"""
+        run_end = _deadline.get() if run_end is None else run_end
+        return started + limit if run_end is None else min(run_end, started + limit)
+
+    def _finish_check(self, key: str, name: str, outcome: Tuple[str, str, str], started: float,
+                      end: float, sink: List[Dict]) -> CheckResult:
+        """Store and time a check's outcome; an error past the check's deadline is reported as Timeout"""
+        elapsed = time.monotonic() - started
+        status, region, detail = outcome
+        if status == "error" and time.monotonic() >= end:
+            detail = "Timeout"
+        self.store_result(key, status, region, detail)
+        if status != "error":
+            self.record_latency(key, elapsed)
+        return CheckResult(key, name, status, region, detail, elapsed, timings=tuple(sink))
+
+    def latency_history(self, service: str) -> List[float]:
+        """Durations (seconds) of the service's last conclusive checks, oldest first"""
+        if self.cache is not None:
+            return list(self.cache.get('latency', service) or [])
+        return list(self._latency.get(service, []))
+
+    def record_latency(self, service: str, seconds: float):
+        """Add a conclusive check's duration to the service's history (on disk with a cache)"""
+        with self._latency_lock:
+            history = (self.latency_history(service) + [round(seconds, 3)])[-LATENCY_HISTORY:]
+            if self.cache is not None:
+                self.cache.set('latency', service, history, LATENCY_HISTORY_TTL)
+            else:
+                self._latency[service] = history
+
+    def service_deadline(self, service: str) -> float:
+        """
+        Seconds a check of the service may take: p95 of its latency history x
+        LATENCY_DEADLINE_FACTOR, between SERVICE_DEADLINE_FLOOR and _CEILING
+        (the ceiling until LATENCY_MIN_SAMPLES checks are known)
+        """
+        history = sorted(self.latency_history(service))
+        if len(history) < LATENCY_MIN_SAMPLES:
+            return SERVICE_DEADLINE_CEILING
+        p95 = history[math.ceil(0.95 * len(history)) - 1]
+        return min(SERVICE_DEADLINE_CEILING, max(SERVICE_DEADLINE_FLOOR, p95 * LATENCY_DEADLINE_FACTOR))
+
+    def run_services(self, services: Optional[Iterable[str]] = None,
+                     deadline: Optional[float] = None) -> List[CheckResult]:
+        """
+        Check services (keys, all by default) on the worker pool, in SERVICES order
+        Results still valid in the cache for the current exit IP are reused (cached=True)
+        DNS unlock detection (dns_unlock) runs alongside and fills in unlock_type
+        deadline: seconds allowed for the whole run; each check is also bounded by its
+                  service_deadline(), and checks still running when it passes are "Timeout"
+        """
+        wanted = SERVICE_KEYS if services is None else list(services)
+        results = {}
+        to_check = []
+        for key, name, method in SERVICES:
+            if key in wanted:
+                hit = self.cached_result(key)
+                if hit is not None:
+                    results[key] = CheckResult(key, name, *hit, 0.0, True)
+                else:
+                    to_check.append((key, name, method))
+
+        run_end = None if deadline is None else time.monotonic() + deadline
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='unlockcheck-dns') as dns_pool:
+            unlock_types = dns_pool.submit(self.dns_unlock, wanted)
+            if to_check:
+                pool = self._check_executor()
+                futures = {pool.submit(self._check_service, *spec, run_end): spec for spec in to_check}
+                done, pending = wait(futures, timeout=None if run_end is None
+                                     else max(0.0, run_end - time.monotonic()))
+                for future in done:
+                    result = future.result()
+                    results[result.service] = result
+                # Checks still running are past their deadline too: their requests end shortly
+                for future in pending:
+                    future.cancel()
+                    key, name, _ = futures[future]
+                    self.log(f"{name} check still running at the deadline", "debug")
+                    results[key] = CheckResult(key, name, "error", "N/A", "Timeout", deadline)
+        try:
+            types = unlock_types.result()
+        except Exception as e:
+            self.log(f"DNS unlock detection failed: {e}", "debug")
+            types = {}
+        return [results[key]._replace(unlock_type=types.get(key)) for key in SERVICE_KEYS if key in results]
 
-    def run_all_checks(self):
-        """Run all checks"""
+    def run_all_checks(self, deadline: Optional[float] = None) -> List[CheckResult]:
+        """
+        Run all checks
+        deadline: seconds allowed for the IP lookup and all checks together
+        """
         self.print_header()
 
-        # Get and display IP information
-        self.get_ip_info()
+        # Get and display IP information (service connections are opened meanwhile)
+        end = None if deadline is None else time.monotonic() + deadline
+        token = _deadline.set(end)
+        try:
+            self.prewarm()
+            self.get_ip_info()
+        finally:
+            _deadline.reset(token)
         self.print_ip_info()
 
         # Display detection start
         print(f"{Fore.YELLOW}📺 Service Unlock Detection Results{Style.RESET_ALL}")
         print_separator()
 
-        # Check each service
-        checks = [
-            ("Netflix", self.check_netflix),
-            ("Disney+", self.check_disney),
-            ("YouTube Premium", self.check_youtube_premium),
-            ("ChatGPT", self.check_chatgpt),
-            ("Claude", self.check_claude),
-            ("Gemini", self.check_gemini),
-            ("Google Scholar", self.check_scholar),
-            ("TikTok", self.check_tiktok),
-            ("Imgur", self.check_imgur),
-            ("Reddit", self.check_reddit),
-            ("Spotify", self.check_spotify),
-        ]
-
-        # Collect all results first
-        results = []
-        for service_name, check_func in checks:
-            status, region, detail = check_func()
-            results.append((service_name, status, region, detail))
-            time.sleep(0.5)  # Avoid requests too fast
+        # Collect all results first (checks run concurrently, order is preserved)
+        results = self.run_services(deadline=None if end is None else max(0.0, end - time.monotonic()))
+        self.print_results(results)
+        return results
 
+    def print_results(self, results: List[CheckResult]):
+        """Print the results table and the summary line"""
         # Print table header with fixed widths (使用固定列宽常量)
         # 警告：请勿修改列宽参数，这些值与 format_result 函数保持一致
         print()
@@ -1629,15 +4731,518 @@ class UnlockChecker:
         print_separator()
 
         # Print all results with aligned columns
-        for service_name, status, region, detail in results:
-            self.format_result(service_name, status, region, detail)
+        for result in results:
+            self.format_result(result.name, result.status, result.region, result.detail, result.cached,
+                               result.unlock_type)
 
         # Statistics
-        success_count = sum(1 for _, status, _, _ in results if status == "success")
+        success_count = sum(1 for result in results if result.status == "success")
         total_count = len(results)
 
         print_separator()
+        if any(result.cached for result in results):
+            print(f"{Style.DIM}(cached) = result reused from an earlier run with the same exit IP, --fresh to re-check{Style.RESET_ALL}")
         print(f"Detection Complete! {Fore.GREEN}{success_count}/{total_count}{Style.RESET_ALL} services available\n")
+        if self.show_timings:
+            self.print_timings(results)
+
+    def print_timings(self, results: List[CheckResult]):
+        """Print the DNS/connect/TLS/TTFB breakdown of every request made by the checks"""
+        def ms(seconds):
+            return '-' if seconds is None else f"{seconds * 1000:.0f}"
+
+        print(f"{Fore.YELLOW}⏱  Request Timings (ms){Style.RESET_ALL}")
+        print_separator()
+        print(f"    {'DNS':>5} {'Conn':>5} {'TLS':>5} {'TTFB':>5} {'Total':>6} {'Bytes':>8}  Request")
+        for result in results:
+            if not result.timings:
+                continue
+            print(f"{Fore.CYAN}{result.name}{Style.RESET_ALL}")
+            for record in result.timings:
+                parts = urlsplit(record['url'])
+                target = f"{record['method']} {parts.netloc}{parts.path}"
+                if len(target) > 48:
+                    target = target[:47] + '…'
+                outcome = record.get('error') or record.get('status')
+                color = Fore.RED if record.get('error') else Style.DIM
+                print(f"    {ms(record.get('dns')):>5} {ms(record.get('connect')):>5} {ms(record.get('tls')):>5} "
+                      f"{ms(record.get('ttfb')):>5} {ms(record.get('total')):>6} {record.get('bytes', 0):>8}  "
+                      f"{target} {color}{outcome}{Style.RESET_ALL}")
+        print_separator()
+        print(f"{Style.DIM}- = phase not needed (connection reused) or not reached{Style.RESET_ALL}\n")
+
+
+class MonitorDaemon:
+    """
+    --daemon mode: one warm UnlockChecker re-checking only when something may have changed
+
+    Every `interval` seconds the exit IP is read from ipify (one small request).
+    When it or the system resolver changes the whole suite runs again; otherwise only services whose
+    result outlived UnlockChecker.result_ttl() are re-checked. The latest results
+    are served in Prometheus text format on /metrics (and as JSON on /).
+    """
+
+    def __init__(self, checker: UnlockChecker, interval: float = DAEMON_POLL_INTERVAL,
+                 listen: str = DAEMON_LISTEN):
+        self.checker = checker
+        self.interval = interval
+        host, _, port = listen.rpartition(':')
+        self.address = (host or '127.0.0.1', int(port))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.ip = None
+        self.resolvers = None  # System nameservers the current results were checked with
+        self.results = {}   # service key -> CheckResult
+        self.expires = {}   # service key -> epoch seconds
+        self.checked_at = {}
+        self.sentinel_seconds = None
+        self.counters = {'polls': 0, 'runs': 0, 'ip_changes': 0, 'sentinel_failures': 0}
+
+    def poll(self):
+        """Check the exit IP and re-run whatever is due"""
+        started = time.monotonic()
+        ip = self.checker.get_exit_ip()
+        with self._lock:
+            self.counters['polls'] += 1
+            self.sentinel_seconds = time.monotonic() - started
+            if ip is None:
+                self.counters['sentinel_failures'] += 1
+                return
+
+        now = time.time()
+        resolvers = DNSStub.system_nameservers()
+        if ip != self.ip:
+            if self.ip is not None:
+                self.checker.log(f"Exit IP changed: {self.ip} -> {ip}", "warning")
+                with self._lock:
+                    self.counters['ip_changes'] += 1
+            self.checker.get_ip_info()
+            due = SERVICE_KEYS
+        elif resolvers != self.resolvers and not self.checker.proxy:
+            # Another resolver may answer with other addresses (DNS unlock switched on or off)
+            self.checker.log(f"System resolver changed: {self.resolvers} -> {resolvers}", "warning")
+            due = SERVICE_KEYS
+        else:
+            due = [key for key in SERVICE_KEYS if self.expires.get(key, 0) <= now]
+        if not due:
+            return
+
+        results = self.checker.run_services(due)
+        now = time.time()
+        with self._lock:
+            self.ip = ip
+            self.resolvers = resolvers
+            self.counters['runs'] += 1
+            for result in results:
+                self.results[result.service] = result
+                self.checked_at[result.service] = now
+                self.expires[result.service] = now + UnlockChecker.result_ttl(result.status, result.detail)
+        self.checker.log(f"Checked {len(results)} service(s) for {ip}", "info")
+
+    @staticmethod
+    def _label(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def render_metrics(self) -> str:
+        """Latest state in the Prometheus text exposition format"""
+        status_values = {"success": 1, "partial": 0.5, "failed": 0, "error": -1}
+        with self._lock:
+            ip_info = self.checker.ip_info
+            lines = [
+                "# HELP unlockcheck_exit_ip_info Current exit IP and its geolocation",
+                "# TYPE unlockcheck_exit_ip_info gauge",
+                f'unlockcheck_exit_ip_info{{ip="{self._label(self.ip or "")}",'
+                f'country="{self._label(ip_info.get("country_code", "Unknown"))}",'
+                f'registered="{self._label(ip_info.get("registration_country_code", ""))}"}} 1',
+                "# HELP unlockcheck_service_status 1 unlocked, 0.5 partial, 0 blocked, -1 detection error",
+                "# TYPE unlockcheck_service_status gauge",
+            ]
+            # One series per service whatever the outcome; the changing text goes to the info metric
+            lines += [
+                f'unlockcheck_service_status{{service="{key}",name="{self._label(result.name)}"}} '
+                f'{status_values.get(result.status, -1)}'
+                for key, result in self.results.items()
+            ]
+            lines += [
+                "# HELP unlockcheck_service_info Outcome of the latest check of a service",
+                "# TYPE unlockcheck_service_info gauge",
+            ]
+            lines += [
+                f'unlockcheck_service_info{{service="{key}",status="{result.status}",'
+                f'region="{self._label(result.region)}",detail="{self._label(result.detail)}"}} 1'
+                for key, result in self.results.items()
+            ]
+            lines += [
+                "# HELP unlockcheck_check_duration_seconds Time spent on the latest check of a service",
+                "# TYPE unlockcheck_check_duration_seconds gauge",
+            ]
+            lines += [
+                f'unlockcheck_check_duration_seconds{{service="{key}"}} {result.elapsed:.3f}'
+                for key, result in self.results.items()
+            ]
+            lines += [
+                "# HELP unlockcheck_check_timestamp_seconds When a service was last checked",
+                "# TYPE unlockcheck_check_timestamp_seconds gauge",
+            ]
+            lines += [
+                f'unlockcheck_check_timestamp_seconds{{service="{key}"}} {checked:.0f}'
+                for key, checked in self.checked_at.items()
+            ]
+            if self.sentinel_seconds is not None:
+                lines += [
+                    "# HELP unlockcheck_sentinel_duration_seconds Latency of the latest exit-IP lookup",
+                    "# TYPE unlockcheck_sentinel_duration_seconds gauge",
+                    f"unlockcheck_sentinel_duration_seconds {self.sentinel_seconds:.3f}",
+                ]
+            for name, value in self.counters.items():
+                lines += [
+                    f"# TYPE unlockcheck_{name}_total counter",
+                    f"unlockcheck_{name}_total {value}",
+                ]
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        """Latest state as a JSON-serialisable dict"""
+        with self._lock:
+            return {
+                'ip': self.ip,
+                'ip_info': dict(self.checker.ip_info),
+                'results': [
+                    {**result._asdict(), 'checked_at': self.checked_at.get(key)}
+                    for key, result in self.results.items()
+                ],
+                **self.counters,
+            }
+
+    def _server(self) -> 'ThreadingHTTPServer':
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        daemon = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = daemon.render_metrics().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path in ('/', '/results'):
+                    body = json.dumps(daemon.snapshot(), ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                daemon.checker.log(f"{self.address_string()} {format % args}", "debug")
+
+        server = ThreadingHTTPServer(self.address, MetricsHandler)
+        server.daemon_threads = True
+        return server
+
+    def run(self):
+        """Serve metrics and poll until stop() or KeyboardInterrupt"""
+        server = self._server()
+        threading.Thread(target=server.serve_forever, name='unlockcheck-metrics', daemon=True).start()
+        self.checker.log(f"Metrics on http://{self.address[0]}:{server.server_address[1]}/metrics, "
+                         f"polling every {self.interval:g}s", "info")
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.poll()
+                except Exception as e:
+                    self.checker.log(f"Poll failed: {e}", "error")
+                self._stop.wait(self.interval)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def stop(self):
+        self._stop.set()
+
+
+def run_dual_stack_checks(services: Optional[List[str]] = None, verbose: bool = False,
+                          deadline: Optional[float] = None, **checker_options):
+    """
+    Run the IPv4 and IPv6 passes at the same time and print one merged report
+    Both passes use the async API, so a dual-stack run takes about as long as one pass
+    deadline: seconds allowed for each pass (IP lookup and checks)
+    checker_options: extra UnlockChecker arguments (cache, rir_index, mmdb, fresh, show_timings, record, replay)
+    """
+    # A missing family is reported in the table, not as a warning
+    logger.setLevel(logging.DEBUG if verbose else logging.ERROR)
+    if verbose and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(f"{Fore.BLUE}[DEBUG]{Style.RESET_ALL} %(message)s"))
+        logger.addHandler(handler)
+
+    async def family_pass(family):
+        started = time.monotonic()
+        checker = UnlockChecker(verbose=verbose, family=family, **checker_options)
+        try:
+            checker.aprewarm(services)
+            ip_info = await checker.aget_ip_info(deadline)
+            if 'ip' not in ip_info:
+                return checker, []
+            remaining = None if deadline is None else max(0.0, deadline - (time.monotonic() - started))
+            return checker, await checker.acheck_all(services, deadline=remaining)
+        finally:
+            await checker.aclose()
+
+    async def both():
+        return await asyncio.gather(*(family_pass(family) for _, family in ADDRESS_FAMILIES))
+
+    passes = asyncio.run(both())
+
+    passes[0][0].print_header()
+    for (label, _), (checker, results) in zip(ADDRESS_FAMILIES, passes):
+        print(f"\n{Fore.YELLOW}🌐 {label}{Style.RESET_ALL}")
+        print_separator()
+        if not results:
+            print(f"{Fore.RED}[✗]{Style.RESET_ALL} No {label} connectivity, pass skipped\n")
+            continue
+        checker.print_ip_info()
+        checker.print_results(results)
+
+
+def result_record(result: CheckResult, show_timings: bool = False) -> Dict:
+    """JSON-serialisable form of a check result (timings only with show_timings)"""
+    record = {**result._asdict(), 'elapsed': round(result.elapsed, 3)}
+    if not show_timings:
+        del record['timings']
+    return record
+
+
+def run_machine_checks(services: Optional[List[str]] = None, output_format: str = 'ndjson',
+                       verbose: bool = False, deadline: Optional[float] = None, **checker_options):
+    """
+    --format ndjson/json: run the checks with the async API and print plain JSON, no colors
+
+    ndjson writes the exit IP first ({"type": "ip", ...}), then one line per service
+    ({"type": "result", "ip": ..., ...}) flushed as soon as its check completes, so a
+    consumer can act on early results; {"type": "update", "service": ..., "unlock_type": ...}
+    lines follow for results whose unlock type was only known later (see UnlockTypeUpdate).
+    json prints one document shaped like a --proxies report once every check is done.
+    deadline: seconds allowed for the IP lookup and all checks together
+    checker_options: extra UnlockChecker arguments (family, max_workers, cache, ...)
+    """
+    # stdout carries the data: diagnostics go to stderr, uncolored
+    logger.setLevel(logging.DEBUG if verbose else logging.ERROR)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+        logger.addHandler(handler)
+
+    def emit(record: Dict):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+    async def run():
+        started = time.perf_counter()
+        checker = UnlockChecker(verbose=verbose, **checker_options)
+        try:
+            checker.aprewarm(services)
+            ip_info = await checker.aget_ip_info(deadline)
+            report = {field: ip_info.get(field) for field in IP_REPORT_FIELDS}
+            if output_format == 'ndjson':
+                emit({'type': 'ip', **report})
+            records = {}
+            remaining = None if deadline is None else max(0.0, deadline - (time.perf_counter() - started))
+            async for item in checker.acheck(services, deadline=remaining,
+                                             unlock_updates=output_format == 'ndjson'):
+                if isinstance(item, UnlockTypeUpdate):
+                    records[item.service]['unlock_type'] = item.unlock_type
+                    emit({'type': 'update', 'ip': report['ip'], **item._asdict()})
+                    continue
+                records[item.service] = result_record(item, checker.show_timings)
+                if output_format == 'ndjson':
+                    emit({'type': 'result', 'ip': report['ip'], **records[item.service]})
+            if output_format == 'json':
+                report['results'] = [records[key] for key in SERVICE_KEYS if key in records]
+                report['elapsed'] = round(time.perf_counter() - started, 3)
+                print(json.dumps(report, ensure_ascii=False, indent=2), flush=True)
+        finally:
+            await checker.aclose()
+
+    asyncio.run(run())
+
+
+def iter_proxy_urls(path: str) -> Iterable[str]:
+    """
+    Read proxy URLs, one per line, from a file ('-' for stdin)
+    .gz/.bz2/.xz files are decompressed on the fly; blank lines and # comments are skipped,
+    and lines without a scheme are taken as http://host:port
+    """
+    import bz2
+    import lzma
+
+    openers = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+    if path == '-':
+        stream = sys.stdin
+    else:
+        opener = next((func for suffix, func in openers.items() if path.endswith(suffix)), open)
+        stream = opener(path, 'rt', encoding='utf-8', errors='replace')
+    try:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line if '://' in line else f"http://{line}"
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def redact_proxy(proxy: str) -> str:
+    """Hide the password of a proxy URL"""
+    parts = urlsplit(proxy)
+    if parts.password is None:
+        return proxy
+    netloc = f"{parts.username}:***@{parts.netloc.rpartition('@')[2]}"
+    return parts._replace(netloc=netloc).geturl()
+
+
+async def scan_proxy(proxy: str, services: Optional[Iterable[str]] = None,
+                     deadline: float = FLEET_PROXY_DEADLINE, **checker_options) -> Dict:
+    """
+    Look up the egress IP of one proxy and run the checks through it
+    Returns a JSON-serialisable dict; proxies whose IP cannot be determined are
+    reported as unreachable without running any check
+    checker_options: extra UnlockChecker arguments (cache, rir_index, mmdb, fresh, show_timings, record, replay)
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    report = {'proxy': redact_proxy(proxy), 'reachable': False}
+    checker = None
+    try:
+        checker = UnlockChecker(proxy=proxy, **checker_options)
+        ip_info = await checker.aget_ip_info(deadline=deadline)
+        if 'ip' not in ip_info:
+            return report
+        report['reachable'] = True
+        report.update({field: ip_info.get(field) for field in IP_REPORT_FIELDS})
+        remaining = max(0.0, deadline - (loop.time() - started))
+        results = await checker.acheck_all(services, deadline=remaining)
+        report['results'] = [result_record(result, checker.show_timings) for result in results]
+    except Exception as e:
+        report['error'] = str(e)
+    finally:
+        report['elapsed'] = round(loop.time() - started, 3)
+        if checker is not None:
+            await checker.aclose()
+    return report
+
+
+async def scan_proxies(proxies: Iterable[str], concurrency: int = FLEET_CONCURRENCY,
+                       services: Optional[Iterable[str]] = None,
+                       deadline: float = FLEET_PROXY_DEADLINE, **checker_options) -> AsyncIterator[Dict]:
+    """
+    Scan many proxies in one event loop, yielding each report as soon as it is ready
+
+    At most `concurrency` proxies are in flight and the input is consumed lazily, so
+    memory stays flat however long the proxy list is. Exit IPs are geolocated
+    through one shared IPBatchLookup, and all proxies share the providers'
+    circuit breakers (ProviderHealth).
+    """
+    loop = asyncio.get_running_loop()
+    proxies = iter(proxies)
+    pending = set()
+    exhausted = False
+    # Exit IPs are geolocated in bulk, see IPBatchLookup
+    ip_batch = IPBatchLookup()
+    checker_options.setdefault('provider_health', ProviderHealth(checker_options.get('cache')))
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < concurrency:
+                # The list may be a file or stdin: read it off the event loop
+                proxy = await loop.run_in_executor(None, next, proxies, None)
+                if proxy is None:
+                    exhausted = True
+                else:
+                    pending.add(asyncio.ensure_future(
+                        scan_proxy(proxy, services, deadline, ip_batch=ip_batch, **checker_options)
+                    ))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        ip_batch.close()
+
+
+def run_fleet_scan(path: str, concurrency: int, services: Optional[List[str]] = None,
+                   verbose: bool = False, deadline: float = FLEET_PROXY_DEADLINE, **checker_options):
+    """Scan the proxies listed in `path`, printing one JSON line per proxy"""
+    # Dead proxies are the norm in a fleet; keep per-proxy warnings out of the way
+    # stdout carries the reports: -v diagnostics go to stderr, uncolored
+    logger.setLevel(logging.DEBUG if verbose else logging.ERROR)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+        logger.addHandler(handler)
+
+    async def scan():
+        scanned = reachable = 0
+        started = time.monotonic()
+        async for report in scan_proxies(iter_proxy_urls(path), concurrency, services, deadline,
+                                         **checker_options):
+            scanned += 1
+            reachable += report['reachable']
+            print(json.dumps(report, ensure_ascii=False), flush=True)
+        print(f"Scanned {scanned} proxies ({reachable} reachable) in "
+              f"{time.monotonic() - started:.1f}s", file=sys.stderr)
+
+    asyncio.run(scan())
+
+
+async def replay_session(path: str, services: Optional[Iterable[str]] = None, timing: bool = False,
+                         **checker_options) -> Dict:
+    """
+    Re-run the checks of one recorded session (see TrafficReplay)
+    Returns a JSON-serialisable dict shaped like scan_proxy()'s report
+    checker_options: extra UnlockChecker arguments (cache, rir_index, mmdb, fresh, show_timings)
+    """
+    report = {'session': path}
+    started = time.perf_counter()
+    checker = None
+    try:
+        replay = TrafficReplay(path, timing)
+        report.update({key: replay.meta.get(key) for key in ('recorded_at', 'proxy', 'family')})
+        checker = UnlockChecker(replay=replay, **checker_options)
+        ip_info = await checker.aget_ip_info()
+        report.update({field: ip_info.get(field) for field in IP_REPORT_FIELDS})
+        results = await checker.acheck_all(services)
+        report['results'] = [
+            {key: value for key, value in result._asdict().items() if key not in ('elapsed', 'cached', 'timings')}
+            for result in results
+        ]
+    except (OSError, EOFError, ValueError, KeyError) as e:
+        report['error'] = str(e)
+    finally:
+        report['elapsed'] = round(time.perf_counter() - started, 4)
+        if checker is not None:
+            await checker.aclose()
+    return report
+
+
+def run_replay(paths: List[str], services: Optional[List[str]] = None, timing: bool = False,
+               verbose: bool = False, **checker_options):
+    """Replay recorded sessions one after the other, printing one JSON line per session"""
+    logger.setLevel(logging.DEBUG if verbose else logging.ERROR)
+
+    async def replay_all():
+        started = time.monotonic()
+        for path in paths:
+            report = await replay_session(path, services, timing, **checker_options)
+            print(json.dumps(report, ensure_ascii=False), flush=True)
+        print(f"Replayed {len(paths)} sessions in {time.monotonic() - started:.2f}s", file=sys.stderr)
+
+    asyncio.run(replay_all())
 
 
 def main():
@@ -1650,54 +5255,269 @@ def main():
         action='store_true',
         help='Verbose mode, show debug info'
     )
-    parser.add_argument(
-        '--ipv6',
+    family_group = parser.add_mutually_exclusive_group()
+    family_group.add_argument(
+        '-4', '--ipv4',
+        action='store_true',
+        help='Use IPv4 only for detection'
+    )
+    family_group.add_argument(
+        '-6', '--ipv6',
+        action='store_true',
+        help='Use IPv6 only for detection'
+    )
+    family_group.add_argument(
+        '--dual-stack',
         action='store_true',
-        help='Use IPv6 for detection'
+        help='Check over IPv4 and IPv6 at the same time and merge the results'
+    )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=MAX_WORKERS,
+        help=f'Number of checks to run concurrently (default: {MAX_WORKERS})'
     )
     parser.add_argument(
         '--service', '-s',
         type=str,
-        choices=['netflix', 'disney', 'youtube', 'chatgpt', 'claude', 'gemini', 'scholar', 'tiktok', 'imgur', 'reddit', 'spotify'],
+        choices=SERVICE_KEYS,
         help='Check specific service only'
     )
+    parser.add_argument(
+        '--proxies',
+        type=str,
+        metavar='FILE',
+        help='Check every proxy listed in FILE (one URL per line, "-" for stdin, '
+             '.gz/.bz2/.xz accepted) and print one JSON line per proxy'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=FLEET_CONCURRENCY,
+        help=f'Proxies scanned at the same time with --proxies (default: {FLEET_CONCURRENCY})'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the on-disk cache (IP/ASN information and results)'
+    )
+    parser.add_argument(
+        '--cache-entries',
+        type=int,
+        default=CACHE_MAX_ENTRIES,
+        metavar='N',
+        help=f'Rows the on-disk cache keeps per kind of entry (default: {CACHE_MAX_ENTRIES}); results '
+             'take one row per service and exit IP, so raise it for large --proxies scans'
+    )
+    parser.add_argument(
+        '--fresh',
+        action='store_true',
+        help='Re-check every service even if a recent result for this exit IP is cached'
+    )
+    parser.add_argument(
+        '--record',
+        type=str,
+        metavar='DIR',
+        help='Save every HTTP request and response to DIR (one session file per checked exit IP); '
+             'implies --no-cache, not available with --daemon'
+    )
+    parser.add_argument(
+        '--replay',
+        type=str,
+        metavar='PATH',
+        help='Answer every request from a session recorded with --record instead of the network; '
+             'a DIR with several sessions prints one JSON line per session'
+    )
+    parser.add_argument(
+        '--replay-timing',
+        action='store_true',
+        help='With --replay, wait as long as each recorded request took'
+    )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Show DNS/connect/TLS/TTFB timings of every request made by the checks'
+    )
+    parser.add_argument(
+        '--format',
+        choices=('table', 'ndjson', 'json'),
+        default='table',
+        help='Output format: colored table (default), one JSON line per result as soon as it '
+             'is known (ndjson), or one JSON document (json)'
+    )
+    parser.add_argument(
+        '--deadline',
+        type=float,
+        metavar='SECONDS',
+        help='Time allowed for the IP lookup and all checks; services not done by then are '
+             f'reported as Timeout (with --proxies: per proxy, default {FLEET_PROXY_DEADLINE}). '
+             'Each check is also cut off at about twice its usual duration'
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Keep running: re-check when the exit IP changes or results expire, '
+             'and serve Prometheus metrics'
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=DAEMON_POLL_INTERVAL,
+        help=f'Seconds between exit-IP checks with --daemon (default: {DAEMON_POLL_INTERVAL})'
+    )
+    parser.add_argument(
+        '--listen',
+        type=str,
+        default=DAEMON_LISTEN,
+        metavar='HOST:PORT',
+        help=f'Metrics endpoint address with --daemon (default: {DAEMON_LISTEN})'
+    )
+    parser.add_argument(
+        '--build-rir-index',
+        nargs='*',
+        metavar='FILE',
+        help='Build the offline registration-country index from RIR delegated-*-extended '
+             'files (downloaded from the five RIRs when no FILE is given) and exit'
+    )
+    parser.add_argument(
+        '--rir-index',
+        type=str,
+        metavar='PATH',
+        help=f'Offline registration-country index to use (default: {RIRIndex.default_path()} if built)'
+    )
+    parser.add_argument(
+        '--mmdb',
+        action='append',
+        metavar='PATH',
+        help='Geolocate the exit IP with a local MaxMind DB file instead of online providers '
+             '(repeat for e.g. a Country and an ASN database)'
+    )
 
     args = parser.parse_args()
 
+    if args.build_rir_index is not None:
+        try:
+            path = RIRIndex.build(args.build_rir_index or None, args.rir_index)
+        except (OSError, requests.exceptions.RequestException) as e:
+            print(f"{Fore.RED}Error occurred: {e}{Style.RESET_ALL}", file=sys.stderr)
+            sys.exit(1)
+        print(f"{Fore.GREEN}[✓]{Style.RESET_ALL} RIR index written to {path}")
+        return
+
+    if args.format != 'table' and (args.daemon or args.dual_stack):
+        parser.error("--format ndjson/json cannot be combined with --daemon or --dual-stack")
+    if args.deadline is not None and (args.daemon or args.deadline <= 0):
+        parser.error("--deadline takes a positive number of seconds and cannot be combined with --daemon")
+    if args.cache_entries <= 0:
+        parser.error("--cache-entries takes a positive number of rows")
+    if args.record and args.daemon:
+        # A session is written out when its checker closes: a daemon's would only grow
+        parser.error("--record cannot be combined with --daemon")
+    if args.replay and (args.proxies or args.dual_stack or args.daemon or args.record):
+        parser.error("--replay cannot be combined with --proxies, --dual-stack, --daemon or --record")
+    replay_paths = TrafficReplay.sessions(args.replay) if args.replay else []
+    if args.replay and not replay_paths:
+        parser.error(f"no recorded sessions in {args.replay}")
+
+    # Recording wants every request on the wire, replaying every classification re-run
+    cache = None if args.no_cache or args.record or args.replay else DiskCache(max_entries=args.cache_entries)
+    try:
+        rir_index = RIRIndex(args.rir_index) if args.rir_index else RIRIndex.open_default()
+        mmdb = [MMDBReader(path) for path in args.mmdb or []]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"{Fore.RED}Error occurred: {e}{Style.RESET_ALL}", file=sys.stderr)
+        sys.exit(1)
+    checker_options = {'cache': cache, 'rir_index': rir_index, 'mmdb': mmdb, 'fresh': args.fresh,
+                       'show_timings': args.timings}
+    if args.record:
+        checker_options['record'] = args.record
+
+    if len(replay_paths) > 1:
+        try:
+            run_replay(replay_paths, [args.service] if args.service else None, args.replay_timing,
+                       args.verbose, **checker_options)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        return
+
+    if args.proxies:
+        try:
+            run_fleet_scan(args.proxies, args.concurrency, [args.service] if args.service else None,
+                           args.verbose, args.deadline or FLEET_PROXY_DEADLINE, **checker_options)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        except OSError as e:
+            print(f"{Fore.RED}Error occurred: {e}{Style.RESET_ALL}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    if args.dual_stack:
+        try:
+            run_dual_stack_checks([args.service] if args.service else None, args.verbose, args.deadline,
+                                  **checker_options)
+        except KeyboardInterrupt:
+            print(f"\n\n{Fore.YELLOW}Detection cancelled{Style.RESET_ALL}")
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
     # Create checker instance
-    checker = UnlockChecker(verbose=args.verbose, ipv6=args.ipv6)
+    family = socket.AF_INET if args.ipv4 else socket.AF_INET6 if args.ipv6 else None
+    if replay_paths:
+        try:
+            checker_options['replay'] = TrafficReplay(replay_paths[0], args.replay_timing)
+        except (OSError, EOFError, ValueError, KeyError) as e:
+            print(f"{Fore.RED}Error occurred: {e}{Style.RESET_ALL}", file=sys.stderr)
+            sys.exit(1)
+    if args.format != 'table':
+        try:
+            run_machine_checks([args.service] if args.service else None, args.format, args.verbose,
+                               args.deadline, family=family, max_workers=args.workers, **checker_options)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        except Exception as e:
+            print(f"Error occurred: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    checker = UnlockChecker(verbose=args.verbose, family=family, max_workers=args.workers, **checker_options)
 
     try:
-        if args.service:
+        if args.daemon:
+            MonitorDaemon(checker, args.interval, args.listen).run()
+        elif args.service:
             # Check single service
             checker.print_header()
-            checker.get_ip_info()
+            end = None if args.deadline is None else time.monotonic() + args.deadline
+            token = _deadline.set(end)
+            try:
+                checker.prewarm([args.service])
+                checker.get_ip_info()
+            finally:
+                _deadline.reset(token)
             checker.print_ip_info()
 
             print(f"{Fore.YELLOW}📺 Streaming Media Detection Results{Style.RESET_ALL}")
             print(f"{Fore.CYAN}{'─'*60}{Style.RESET_ALL}")
 
-            service_map = {
-                'netflix': ('Netflix', checker.check_netflix),
-                'disney': ('Disney+', checker.check_disney),
-                'youtube': ('YouTube Premium', checker.check_youtube_premium),
-                'chatgpt': ('ChatGPT', checker.check_chatgpt),
-                'claude': ('Claude', checker.check_claude),
-                'gemini': ('Gemini', checker.check_gemini),
-                'scholar': ('Google Scholar', checker.check_scholar),
-                'tiktok': ('TikTok', checker.check_tiktok),
-                'imgur': ('Imgur', checker.check_imgur),
-                'reddit': ('Reddit', checker.check_reddit),
-                'spotify': ('Spotify', checker.check_spotify),
-            }
-
-            service_name, check_func = service_map[args.service]
-            status, region, detail = check_func()
-            checker.format_result(service_name, status, region, detail)
+            results = checker.run_services([args.service], None if end is None else max(0.0, end - time.monotonic()))
+            for result in results:
+                checker.format_result(result.name, result.status, result.region, result.detail, result.cached,
+                                      result.unlock_type)
             print()
+            if args.timings:
+                checker.print_timings(results)
         else:
             # Check all services
-            checker.run_all_checks()
+            checker.run_all_checks(args.deadline)
 
     except KeyboardInterrupt:
         print(f"\n\n{Fore.YELLOW}Detection cancelled{Style.RESET_ALL}")
@@ -1708,6 +5528,10 @@ def main():
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        checker.close()
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == "__main__":